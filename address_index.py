@@ -0,0 +1,117 @@
+"""
+Tracked address index
+Bloom filter prefilter in front of an exact set, for testing every address a
+block touches against a large tracked address set. Nearly all addresses in a
+block are untracked and are rejected by the filter's packed bit array; only
+the few that pass are confirmed against the exact set.
+"""
+
+import hashlib
+import math
+import threading
+
+import numpy as np
+
+
+class BloomFilter:
+    """Packed-bit Bloom filter over strings, sized for ``capacity`` items at ``error_rate``
+
+    Positions come from one blake2b digest per item (double hashing), and
+    lookups for a whole batch of items are done with NumPy at once.
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.num_bits = max(64, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.bits = np.zeros((self.num_bits + 7) // 8, dtype=np.uint8)
+        self.count = 0
+
+    def _positions(self, items):
+        """(len(items) x num_hashes) bit positions"""
+        digests = b''.join(hashlib.blake2b(item.encode(), digest_size=16).digest() for item in items)
+        pairs = np.frombuffer(digests, dtype='<u8').reshape(-1, 2)
+        h1, h2 = pairs[:, :1], pairs[:, 1:] | np.uint64(1)
+        steps = np.arange(self.num_hashes, dtype=np.uint64)
+        return (h1 + steps * h2) % np.uint64(self.num_bits)  # wraps modulo 2**64
+
+    def add_many(self, items):
+        items = list(items)
+        if not items:
+            return
+        positions = self._positions(items).ravel()
+        np.bitwise_or.at(self.bits, (positions >> np.uint64(3)).astype(np.intp),
+                         (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)))
+        self.count += len(items)
+
+    def add(self, item):
+        self.add_many([item])
+
+    def contains_many(self, items):
+        """Boolean array: False means definitely absent, True probably present"""
+        items = list(items)
+        if not items:
+            return np.zeros(0, dtype=bool)
+        positions = self._positions(items)
+        bytes_ = self.bits[(positions >> np.uint64(3)).astype(np.intp)]
+        return ((bytes_ >> (positions & np.uint64(7)).astype(np.uint8)) & 1).all(axis=1)
+
+    def __contains__(self, item):
+        return bool(self.contains_many([item])[0])
+
+
+class AddressIndex:
+    """Set of tracked addresses with a Bloom prefilter for batch matching
+
+    The filter is rebuilt at twice the size whenever it fills up, so its
+    false-positive rate stays near ``error_rate`` as addresses are added.
+    """
+
+    def __init__(self, capacity=1024, error_rate=0.001):
+        self.error_rate = error_rate
+        self.addresses = set()
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.checked = 0          # addresses tested by match()
+        self.false_positives = 0  # passed the filter but not tracked
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def __contains__(self, address):
+        return address in self.addresses
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self.addresses))
+
+    def add_many(self, addresses):
+        """Track addresses, returning the ones that were new"""
+        with self._lock:
+            new = [address for address in dict.fromkeys(addresses) if address not in self.addresses]
+            if not new:
+                return []
+            self.addresses.update(new)
+            if len(self.addresses) > self.bloom.capacity:
+                self.bloom = BloomFilter(len(self.addresses) * 2, self.error_rate)
+                self.bloom.add_many(self.addresses)
+            else:
+                self.bloom.add_many(new)
+            return new
+
+    def add(self, address):
+        """Track an address, returning False if it was already tracked"""
+        return bool(self.add_many([address]))
+
+    def match(self, addresses):
+        """The tracked addresses among ``addresses``"""
+        addresses = list(dict.fromkeys(addresses))
+        if not addresses:
+            return []
+        with self._lock:
+            passed = np.flatnonzero(self.bloom.contains_many(addresses))
+            matched = [addresses[i] for i in passed if addresses[i] in self.addresses]
+            self.checked += len(addresses)
+            self.false_positives += len(passed) - len(matched)
+        return matched
@@ -0,0 +1,129 @@
+"""
+Address file loaders
+Streams tracked addresses from CSV, JSON or JSON Lines files one entry at a time
+"""
+
+import csv
+import json
+import os
+
+from json_stream import JSONStreamReader
+
+CHAINS = ('bitcoin', 'ethereum')
+
+# Column / field names accepted for the address and its chain
+ADDRESS_FIELDS = ('address', 'addr')
+CHAIN_FIELDS = ('chain', 'type', 'crypto', 'network')
+
+
+def detect_chain(address):
+    """Guess the chain of an address from its format"""
+    return 'ethereum' if address.lower().startswith('0x') else 'bitcoin'
+
+
+def normalize_chain(value, address):
+    """Map a user-supplied chain label to 'bitcoin' or 'ethereum'"""
+    if value:
+        value = value.strip().lower()
+        if value in ('btc', 'bitcoin'):
+            return 'bitcoin'
+        if value in ('eth', 'ethereum'):
+            return 'ethereum'
+    return detect_chain(address)
+
+
+def parse_address_list(value):
+    """Split a comma separated address list (as used in .env)"""
+    if not value:
+        return []
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def _entry(item, chain=None):
+    """Turn a JSON item (string or object) into a (chain, address) tuple"""
+    if isinstance(item, str):
+        address, label = item, None
+    elif isinstance(item, dict):
+        address = next((item[f] for f in ADDRESS_FIELDS if item.get(f)), None)
+        label = next((item[f] for f in CHAIN_FIELDS if item.get(f)), None)
+    else:
+        return None
+
+    if not address:
+        return None
+    address = address.strip()
+    return normalize_chain(chain or label, address), address
+
+
+def iter_csv_addresses(path, chain=None):
+    """Yield (chain, address) from a CSV file, with or without a header row"""
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        address_col, chain_col = 0, None
+        first = True
+
+        for row in reader:
+            if not row or row[0].startswith('#'):
+                continue
+
+            # The header, if any, is the first row after leading comments
+            if first:
+                first = False
+                header = [cell.strip().lower() for cell in row]
+                if any(h in ADDRESS_FIELDS for h in header):
+                    address_col = next(i for i, h in enumerate(header) if h in ADDRESS_FIELDS)
+                    chain_col = next((i for i, h in enumerate(header) if h in CHAIN_FIELDS), None)
+                    continue
+
+            if address_col >= len(row) or not row[address_col].strip():
+                continue
+            address = row[address_col].strip()
+            label = row[chain_col] if chain_col is not None and chain_col < len(row) else None
+            yield normalize_chain(chain or label, address), address
+
+
+def iter_jsonl_addresses(path, chain=None):
+    """Yield (chain, address) from a JSON Lines file"""
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = _entry(json.loads(line), chain)
+            if entry:
+                yield entry
+
+
+def iter_json_addresses(path, chain=None):
+    """Yield (chain, address) from a JSON file without parsing it in one go
+
+    Accepts either a list of addresses / address objects, or an object keyed
+    by chain name ({"bitcoin": [...], "ethereum": [...]}).
+    """
+    with open(path, 'rb') as f:
+        reader = JSONStreamReader.from_file(f)
+
+        if reader.peek() == '{':
+            for key in reader.iter_object():
+                if reader.peek() != '[':
+                    reader.read_value()
+                    continue
+                for item in reader.iter_array():
+                    entry = _entry(item, chain or key)
+                    if entry:
+                        yield entry
+        else:
+            for item in reader.iter_array():
+                entry = _entry(item, chain)
+                if entry:
+                    yield entry
+
+
+def iter_addresses(path, chain=None):
+    """Yield (chain, address) tuples from an address file, picking the parser by extension"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.json':
+        return iter_json_addresses(path, chain)
+    if ext in ('.jsonl', '.ndjson'):
+        return iter_jsonl_addresses(path, chain)
+    return iter_csv_addresses(path, chain)
@@ -0,0 +1,159 @@
+"""
+Address table queries
+Server-side filtering, sorting and paging of tracked balances for the
+dashboard's address DataTable, so each update only ships one page of rows
+"""
+
+import math
+import threading
+
+import numpy as np
+
+from metrics import record_cache
+
+COLUMNS = [
+    {'name': 'Chain', 'id': 'chain'},
+    {'name': 'Address', 'id': 'address'},
+    {'name': 'Balance', 'id': 'balance', 'type': 'numeric'},
+    {'name': 'Value (USD)', 'id': 'value_usd', 'type': 'numeric'},
+    {'name': 'Transactions', 'id': 'n_tx', 'type': 'numeric'},
+    {'name': 'Updated', 'id': 'updated'}
+]
+
+# DataTable filter operators, longest first so 'ge' is not read as 'eq' etc.
+FILTER_OPERATORS = [
+    ['ge ', '>='],
+    ['le ', '<='],
+    ['lt ', '<'],
+    ['gt ', '>'],
+    ['ne ', '!='],
+    ['eq ', '='],
+    ['contains '],
+    ['datestartswith ']
+]
+
+
+def split_filter_part(filter_part):
+    """Parse one '{column} op value' clause of a DataTable filter_query"""
+    for operator_type in FILTER_OPERATORS:
+        for operator in operator_type:
+            if operator in filter_part:
+                name_part, value_part = filter_part.split(operator, 1)
+                name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+
+                value_part = value_part.strip()
+                if value_part and value_part[0] == value_part[-1] and value_part[0] in ("'", '"', '`'):
+                    value = value_part[1:-1].replace('\\' + value_part[0], value_part[0])
+                else:
+                    try:
+                        value = float(value_part)
+                    except ValueError:
+                        value = value_part
+
+                return name, operator_type[0].strip(), value
+
+    return [None] * 3
+
+
+def apply_filter(df, filter_query):
+    """Filter a frame with a DataTable filter_query string"""
+    if not filter_query:
+        return df
+
+    for filter_part in filter_query.split(' && '):
+        col_name, operator, value = split_filter_part(filter_part)
+        if col_name not in df.columns:
+            continue
+        column = df[col_name]
+        if operator in ('eq', 'ne', 'lt', 'le', 'gt', 'ge'):
+            if isinstance(value, str) and column.dtype != object:
+                continue
+            df = df.loc[getattr(column, operator)(value)]
+        elif operator in ('contains', 'datestartswith'):
+            # Text operators: undo the numeric parse of values like 99 or 2024
+            if isinstance(value, float):
+                value = str(int(value)) if value.is_integer() else str(value)
+            text = column.astype(str)
+            if operator == 'contains':
+                df = df.loc[text.str.contains(value, case=False, regex=False)]
+            else:
+                df = df.loc[text.str.startswith(value)]
+    return df
+
+
+def apply_sort(df, sort_by):
+    """Sort a frame by the DataTable sort_by list"""
+    if not sort_by:
+        return df
+    return df.sort_values(
+        [col['column_id'] for col in sort_by],
+        ascending=[col['direction'] == 'asc' for col in sort_by],
+        kind='mergesort'
+    )
+
+
+class AddressTableSource:
+    """Columnar view of every tracked balance, rebuilt only when balances or prices change"""
+
+    def __init__(self, stores):
+        self.stores = stores
+        self._key = None
+        self._frame = None
+        self._lock = threading.Lock()
+
+    def frame(self, prices):
+        """DataFrame of all balances valued at ``prices`` ({chain: usd_price})"""
+        key = (tuple(store.version for store in self.stores.values()),
+               tuple(sorted(prices.items())))
+        with self._lock:
+            hit = key == self._key
+            if not hit:
+                self._frame = self._build(prices)
+                self._key = key
+            record_cache('address_table', hit)
+            return self._frame
+
+    def _build(self, prices):
+        import pandas as pd  # deferred so importing the dashboard stays fast
+        
+        parts = []
+        for chain, store in self.stores.items():
+            # One consistent read: refreshes may add rows while the table is built
+            addresses, balances, n_tx, updated = store.snapshot()
+            if not addresses:
+                continue
+            n_tx = n_tx.astype(np.float64)
+            n_tx[n_tx < 0] = np.nan
+            price = prices.get(chain)
+            parts.append(pd.DataFrame({
+                'chain': chain.capitalize(),
+                'address': addresses,
+                'balance': balances,
+                'value_usd': balances * price if price is not None else np.nan,
+                'n_tx': n_tx,
+                'updated': pd.to_datetime(updated, unit='s')
+            }))
+        if not parts:
+            return pd.DataFrame({col['id']: [] for col in COLUMNS})
+        return pd.concat(parts, ignore_index=True)
+
+    def page(self, prices, page_current=0, page_size=20, sort_by=None, filter_query='',
+             addresses=None):
+        """Return (records for one page, page count), limited to ``addresses`` if given"""
+        import pandas as pd
+        
+        df = self.frame(prices)
+        if addresses is not None:
+            df = df.loc[df['address'].isin(addresses)]
+        df = apply_sort(apply_filter(df, filter_query), sort_by)
+        page_count = max(1, math.ceil(len(df) / page_size))
+        start = page_current * page_size
+        page = df.iloc[start:start + page_size].copy()
+
+        # Round / format only the rows actually sent to the browser
+        page['balance'] = page['balance'].round(8)
+        page['value_usd'] = page['value_usd'].round(2)
+        page['n_tx'] = page['n_tx'].astype('Int64')
+        page['updated'] = pd.to_datetime(page['updated']).dt.strftime('%Y-%m-%d %H:%M:%S')
+        page = page.astype(object).where(page.notna(), None)
+        return page.to_dict('records'), page_count
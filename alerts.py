@@ -0,0 +1,372 @@
+"""
+Price and balance alerts
+Threshold rules kept in sorted per-asset indexes, so each new price snapshot
+only visits the rules whose thresholds lie between the previous and the
+current price, and each balance change only the rules of that address.
+Fired alerts go to sinks: an in-process queue and / or a local webhook.
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, deque
+from decimal import Decimal
+import itertools
+import json
+import queue
+import threading
+import time
+
+from config import Config
+from metrics import REGISTRY, InstrumentedSession
+
+DIRECTIONS = ('above', 'below', 'cross')
+RISING = ('above', 'cross')
+FALLING = ('below', 'cross')
+BALANCE_DECIMALS = {'bitcoin': 8, 'ethereum': 18}
+
+ALERTS_FIRED = REGISTRY.counter('alerts_fired_total', "Alerts fired by rule type", ('type',))
+ALERTS_DROPPED = REGISTRY.counter('alerts_dropped_total', "Alerts dropped by a full sink", ('sink',))
+
+
+class Rule:
+    """One alert rule
+
+    ``type`` is 'price' (``asset`` / ``currency`` price crossing ``threshold``)
+    or 'balance' (``address`` balance on ``asset``'s chain crossing
+    ``threshold`` in whole coins, or any change with direction 'change').
+    'above' fires on an upward crossing, 'below' on a downward one and
+    'cross' on both. ``once`` rules are removed after firing.
+    """
+
+    __slots__ = ('id', 'user', 'type', 'asset', 'currency', 'address', 'direction',
+                 'threshold', 'once', 'note')
+
+    def __init__(self, id, type, direction, asset, threshold=None, currency='usd', address=None,
+                 user=None, once=False, note=None):
+        if type not in ('price', 'balance'):
+            raise ValueError(f"Unknown alert rule type {type!r}")
+        allowed = DIRECTIONS + (('change',) if type == 'balance' else ())
+        if direction not in allowed:
+            raise ValueError(f"Unknown alert direction {direction!r} for a {type} rule")
+        if direction != 'change' and threshold is None:
+            raise ValueError(f"Alert rule {id} needs a threshold")
+        if type == 'balance' and not address:
+            raise ValueError(f"Balance alert rule {id} needs an address")
+        self.id = str(id)
+        self.user = user
+        self.type = type
+        self.asset = asset
+        self.currency = currency.lower()
+        self.address = address
+        self.direction = direction
+        self.threshold = threshold
+        self.once = once
+        self.note = note
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{key: value for key, value in data.items() if key in cls.__slots__})
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.__slots__ if getattr(self, key) is not None}
+
+
+class ThresholdIndex:
+    """Rules sorted by threshold, for one asset / currency or address
+
+    ``rising`` holds 'above' and 'cross' rules, ``falling`` 'below' and
+    'cross' rules, each as parallel (threshold, rule) lists.
+    """
+
+    def __init__(self):
+        self.rising = ([], [])
+        self.falling = ([], [])
+
+    def __len__(self):
+        return len(self.rising[0]) + len(self.falling[0])
+
+    def _sides(self, rule):
+        if rule.direction in RISING:
+            yield self.rising
+        if rule.direction in FALLING:
+            yield self.falling
+
+    def add(self, rule, key):
+        for thresholds, rules in self._sides(rule):
+            position = bisect_right(thresholds, key)
+            thresholds.insert(position, key)
+            rules.insert(position, rule)
+
+    def add_many(self, pairs):
+        """Add (rule, key) pairs with one sort per side instead of one insert per rule"""
+        for side, directions in ((self.rising, RISING), (self.falling, FALLING)):
+            new = [(key, rule) for rule, key in pairs if rule.direction in directions]
+            if not new:
+                continue
+            merged = list(zip(*side)) + new
+            merged.sort(key=lambda item: item[0])
+            side[0][:] = [key for key, _ in merged]
+            side[1][:] = [rule for _, rule in merged]
+
+    def remove(self, rule, key):
+        for thresholds, rules in self._sides(rule):
+            position = bisect_left(thresholds, key)
+            while position < len(thresholds) and thresholds[position] == key:
+                if rules[position] is rule:
+                    del thresholds[position], rules[position]
+                    break
+                position += 1
+
+    def crossed(self, previous, current):
+        """Rules whose threshold lies in (previous, current] going up or [current, previous) going down"""
+        if current > previous:
+            thresholds, rules = self.rising
+            return rules[bisect_right(thresholds, previous):bisect_right(thresholds, current)]
+        if current < previous:
+            thresholds, rules = self.falling
+            return rules[bisect_left(thresholds, current):bisect_left(thresholds, previous)]
+        return []
+
+
+class QueueSink:
+    """Bounded in-process log of fired alerts for local consumers
+
+    Each alert gets a sequence number, and readers ask for the alerts after
+    the last one they saw, so one reader never consumes another's alerts.
+    The oldest alerts are dropped once ``maxsize`` are held.
+    """
+
+    name = 'queue'
+
+    def __init__(self, maxsize=None):
+        self.alerts = deque(maxlen=maxsize or Config.ALERT_QUEUE_SIZE)
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def send(self, alerts):
+        with self._lock:
+            for alert in alerts:
+                if len(self.alerts) == self.alerts.maxlen:
+                    ALERTS_DROPPED.inc(self.name)
+                self.alerts.append(dict(alert, seq=next(self._seq)))
+
+    def since(self, seq=0, user=None, limit=None):
+        """Up to ``limit`` alerts after sequence number ``seq`` for one user
+
+        ``user=None`` returns the alerts of rules without a user.
+        """
+        with self._lock:
+            alerts = list(self.alerts)
+        # Sequence numbers are consecutive, so skip straight past the ones already seen
+        start = max(0, seq - alerts[0]['seq'] + 1) if alerts else 0
+        matching = [alert for alert in itertools.islice(alerts, start, None) if alert['user'] == user]
+        return matching[:limit] if limit is not None else matching
+
+
+class WebhookSink:
+    """POSTs fired alerts as a JSON list to a URL from a background thread
+
+    Alerts are batched per request so a tick that fires many rules costs one
+    POST, and a slow webhook never delays the tick that fired them.
+    """
+
+    name = 'webhook'
+
+    def __init__(self, url, timeout=5, maxsize=None, batch_size=500):
+        self.url = url
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.pending = queue.Queue(maxsize=maxsize or Config.ALERT_QUEUE_SIZE)
+        self.session = InstrumentedSession('webhook')
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def send(self, alerts):
+        for alert in alerts:
+            try:
+                self.pending.put_nowait(alert)
+            except queue.Full:
+                ALERTS_DROPPED.inc(self.name)
+
+    def _run(self):
+        while True:
+            batch = [self.pending.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                response = self.session.post(self.url, json=batch, timeout=self.timeout)
+                if response.status_code >= 400:
+                    print(f"Alert webhook returned HTTP {response.status_code} for {len(batch)} alerts")
+            except Exception as e:
+                print(f"Error posting {len(batch)} alerts to {self.url}: {e}")
+
+
+class AlertEngine:
+    """Evaluates price and balance rules against new snapshots and dispatches fired alerts"""
+
+    def __init__(self, sinks=()):
+        self.sinks = list(sinks)
+        # The in-process sink /api/alerts reads from, if there is one
+        self.queue = next((sink for sink in self.sinks if isinstance(sink, QueueSink)), None)
+        self.rules = {}
+        self.price_index = defaultdict(ThresholdIndex)    # (asset, currency) -> index
+        self.balance_index = defaultdict(ThresholdIndex)  # address -> index
+        self.change_rules = defaultdict(list)             # address -> 'change' rules
+        self.last_prices = {}                             # (asset, currency) -> price
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.rules)
+
+    def price_pairs(self):
+        """(asset, currency) pairs that price rules watch, so they can be fetched"""
+        with self._lock:
+            return [key for key, index in self.price_index.items() if len(index)]
+    
+    @staticmethod
+    def _key(rule):
+        """Index key: the price, or the balance threshold in exact base units"""
+        if rule.type == 'balance':
+            decimals = BALANCE_DECIMALS.get(rule.asset, 8)
+            return int(Decimal(str(rule.threshold)) * 10 ** decimals)
+        return float(rule.threshold)
+
+    def _index_for(self, rule):
+        if rule.type == 'price':
+            return self.price_index[(rule.asset, rule.currency)]
+        return self.balance_index[rule.address]
+
+    def add_rule(self, rule):
+        """Add a Rule (or rule dict), returning the Rule"""
+        if isinstance(rule, dict):
+            rule = Rule.from_dict(dict({'id': f"rule-{next(self._ids)}"}, **rule))
+        with self._lock:
+            if rule.id in self.rules:
+                self._remove(self.rules[rule.id])
+            self.rules[rule.id] = rule
+            if rule.direction == 'change':
+                self.change_rules[rule.address].append(rule)
+            else:
+                self._index_for(rule).add(rule, self._key(rule))
+        return rule
+
+    def add_rules(self, rules):
+        """Bulk-load rules (Rule objects or dicts), sorting each index once"""
+        grouped = defaultdict(list)
+        with self._lock:
+            for rule in rules:
+                if isinstance(rule, dict):
+                    rule = Rule.from_dict(dict({'id': f"rule-{next(self._ids)}"}, **rule))
+                if rule.id in self.rules:
+                    self._remove(self.rules[rule.id])
+                self.rules[rule.id] = rule
+                if rule.direction == 'change':
+                    self.change_rules[rule.address].append(rule)
+                else:
+                    grouped[id(self._index_for(rule))].append((rule, self._key(rule)))
+            for pairs in grouped.values():
+                self._index_for(pairs[0][0]).add_many(pairs)
+        return len(self.rules)
+
+    def load_file(self, path):
+        """Load rules from a JSON list or JSON Lines file, returning how many were added"""
+        with open(path) as f:
+            text = f.read()
+        if text.lstrip().startswith('['):
+            rules = json.loads(text)
+        else:
+            rules = [json.loads(line) for line in text.splitlines() if line.strip()]
+        before = len(self.rules)
+        self.add_rules(rules)
+        return len(self.rules) - before
+
+    def _remove(self, rule):
+        if rule.direction == 'change':
+            self.change_rules[rule.address].remove(rule)
+        else:
+            self._index_for(rule).remove(rule, self._key(rule))
+
+    def remove_rule(self, rule_id):
+        with self._lock:
+            rule = self.rules.pop(str(rule_id), None)
+            if rule is not None:
+                self._remove(rule)
+            return rule
+
+    def _fire(self, rules, alert):
+        """Build alerts for the rules that fired, drop the ``once`` ones and dispatch"""
+        if not rules:
+            return []
+        alerts = []
+        for rule in rules:
+            alerts.append(dict(alert, rule=rule.id, user=rule.user, direction=rule.direction,
+                               threshold=rule.threshold, note=rule.note))
+            if rule.once and self.rules.get(rule.id) is rule:
+                del self.rules[rule.id]
+                self._remove(rule)
+            ALERTS_FIRED.inc(rule.type)
+        for sink in self.sinks:
+            try:
+                sink.send(alerts)
+            except Exception as e:
+                print(f"Error sending {len(alerts)} alerts to the {sink.name} sink: {e}")
+        return alerts
+
+    def on_prices(self, table, ts=None):
+        """Evaluate price rules against a PriceTable; returns the fired alerts
+
+        Only (asset, currency) pairs that have rules are looked at, and for
+        each only the rules between the previous and the new price.
+        """
+        ts = table.timestamp if ts is None else ts
+        fired = []
+        with self._lock:
+            for key, index in list(self.price_index.items()):
+                price = table.get(*key)
+                if price is None:
+                    continue
+                previous = self.last_prices.get(key)
+                self.last_prices[key] = price
+                if previous is None or not len(index):
+                    continue
+                crossed = index.crossed(previous, price)
+                fired += self._fire(crossed, {
+                    'type': 'price', 'asset': key[0], 'currency': key[1],
+                    'previous': previous, 'value': price, 'time': ts
+                })
+        return fired
+
+    def on_balance(self, chain, address, previous, current, ts=None):
+        """Evaluate the rules of one address after its balance changed (base units)"""
+        if previous is None or previous == current:
+            return []
+        index = self.balance_index.get(address)
+        changes = self.change_rules.get(address)
+        if index is None and not changes:
+            return []
+        decimals = BALANCE_DECIMALS.get(chain, 8)
+        with self._lock:
+            crossed = list(changes or ()) + (index.crossed(previous, current) if index else [])
+            return self._fire(crossed, {
+                'type': 'balance', 'asset': chain, 'address': address,
+                'previous': previous / 10 ** decimals, 'value': current / 10 ** decimals,
+                'time': time.time() if ts is None else ts
+            })
+
+
+def build_alert_engine():
+    """AlertEngine with the configured sinks and rules file"""
+    sinks = [QueueSink()]
+    if Config.ALERT_WEBHOOK_URL:
+        sinks.append(WebhookSink(Config.ALERT_WEBHOOK_URL))
+    engine = AlertEngine(sinks)
+    if Config.ALERT_RULES_FILE:
+        try:
+            added = engine.load_file(Config.ALERT_RULES_FILE)
+            print(f"Loaded {added} alert rules from {Config.ALERT_RULES_FILE}")
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Error loading alert rules from {Config.ALERT_RULES_FILE}: {e}")
+    return engine
@@ -0,0 +1,207 @@
+"""
+Streaming market analytics
+Rolling returns, volatility, drawdown, moving averages and correlation kept up
+to date with O(1) work per price tick
+"""
+
+from collections import deque
+import heapq
+import math
+import threading
+
+SECONDS_PER_YEAR = 365 * 86400
+
+
+class RollingStats:
+    """Mean and standard deviation over the last ``window`` values"""
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def __len__(self):
+        return len(self.values)
+
+    def update(self, value):
+        self.values.append(value)
+        self.total += value
+        self.total_sq += value * value
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            self.total -= old
+            self.total_sq -= old * old
+
+    @property
+    def mean(self):
+        return self.total / len(self.values) if self.values else None
+
+    @property
+    def std(self):
+        n = len(self.values)
+        if n < 2:
+            return None
+        variance = (self.total_sq - self.total * self.total / n) / (n - 1)
+        return math.sqrt(max(variance, 0.0))
+
+
+class RollingCorrelation:
+    """Pearson correlation of paired values over the last ``window`` pairs"""
+
+    def __init__(self, window):
+        self.window = window
+        self.pairs = deque()
+        self.sx = self.sy = self.sxx = self.syy = self.sxy = 0.0
+
+    def _add(self, x, y, sign):
+        self.sx += sign * x
+        self.sy += sign * y
+        self.sxx += sign * x * x
+        self.syy += sign * y * y
+        self.sxy += sign * x * y
+
+    def update(self, x, y):
+        self.pairs.append((x, y))
+        self._add(x, y, 1)
+        if len(self.pairs) > self.window:
+            self._add(*self.pairs.popleft(), -1)
+
+    @property
+    def value(self):
+        n = len(self.pairs)
+        if n < 3:
+            return None
+        cov = self.sxy - self.sx * self.sy / n
+        var_x = self.sxx - self.sx * self.sx / n
+        var_y = self.syy - self.sy * self.sy / n
+        if var_x <= 0 or var_y <= 0:
+            return None
+        return max(-1.0, min(1.0, cov / math.sqrt(var_x * var_y)))
+
+
+class AssetAnalytics:
+    """Online analytics for one price series"""
+
+    def __init__(self, window=2880, short_ma=20, long_ma=120):
+        self.window = window
+        self.prices = deque(maxlen=window + 1)  # for the rolling return
+        self.returns = RollingStats(window)
+        self.spacing = RollingStats(window)     # seconds between ticks
+        self.short_ma = RollingStats(short_ma)
+        self.long_ma = RollingStats(long_ma)
+        self.last_price = None
+        self.last_ts = None
+
+    def update(self, price, ts):
+        """Feed one tick, returning its log return (None for the first tick)"""
+        if price is None or price <= 0:
+            return None
+        log_return = None
+        if self.last_price is not None:
+            log_return = math.log(price / self.last_price)
+            self.returns.update(log_return)
+            self.spacing.update(ts - self.last_ts)
+
+        self.prices.append(price)
+        self.short_ma.update(price)
+        self.long_ma.update(price)
+
+        self.last_price, self.last_ts = price, ts
+        return log_return
+
+    def drawdowns(self):
+        """(current, maximum) drawdown as fractions over the rolling window
+
+        Walks the window once, so it runs on snapshot rather than per tick; the
+        analytics panel only takes a snapshot after new ticks arrive.
+        """
+        peak = max_drawdown = 0.0
+        for price in self.prices:
+            peak = max(peak, price)
+            max_drawdown = max(max_drawdown, 1 - price / peak)
+        return 1 - self.prices[-1] / peak, max_drawdown
+
+    def snapshot(self):
+        """Current values of every metric"""
+        drawdown = max_drawdown = None
+        if self.prices:
+            drawdown, max_drawdown = self.drawdowns()
+
+        rolling_return = None
+        if len(self.prices) > 1:
+            rolling_return = (self.prices[-1] / self.prices[0] - 1) * 100
+
+        volatility = None
+        std, spacing = self.returns.std, self.spacing.mean
+        if std is not None and spacing:
+            # Annualize per-tick volatility using the average tick spacing
+            volatility = std * math.sqrt(SECONDS_PER_YEAR / spacing) * 100
+
+        return {
+            'price': self.last_price,
+            'return_pct': rolling_return,
+            'volatility_pct': volatility,
+            'max_drawdown_pct': max_drawdown * 100 if max_drawdown is not None else None,
+            'drawdown_pct': drawdown * 100 if drawdown is not None else None,
+            'sma_short': self.short_ma.mean,
+            'sma_long': self.long_ma.mean,
+            'ticks': len(self.prices)
+        }
+
+
+class MarketAnalytics:
+    """Analytics for several assets plus the BTC/ETH return correlation
+
+    ``sync`` pulls only ticks newer than the last one seen from a TickStore,
+    so callbacks read precomputed values instead of scanning history.
+    """
+
+    def __init__(self, assets, window=2880, pair=('bitcoin', 'ethereum')):
+        self.assets = {asset: AssetAnalytics(window) for asset in assets}
+        self.pair = pair
+        self.correlation = RollingCorrelation(window)
+        self._pending = {}  # ts -> {asset: log return} until both sides of the pair arrive
+        self._lock = threading.Lock()
+
+    def update(self, asset, price, ts):
+        """Feed one tick for one asset"""
+        analytics = self.assets.get(asset)
+        if analytics is None or (analytics.last_ts is not None and ts <= analytics.last_ts):
+            return
+        log_return = analytics.update(price, ts)
+        if log_return is None or asset not in self.pair:
+            return
+
+        returns = self._pending.setdefault(ts, {})
+        returns[asset] = log_return
+        if len(returns) == len(self.pair):
+            self.correlation.update(*(returns[a] for a in self.pair))
+            del self._pending[ts]
+        # Drop unmatched returns that can no longer be paired
+        while len(self._pending) > 16:
+            del self._pending[min(self._pending)]
+
+    def sync(self, tick_store):
+        """Consume ticks recorded since the last sync"""
+        with self._lock:
+            series = []
+            for asset, analytics in self.assets.items():
+                buffer = tick_store.buffer(asset)
+                if buffer is None:
+                    continue
+                start = None if analytics.last_ts is None else math.nextafter(analytics.last_ts, math.inf)
+                ticks = buffer.window(start=start)
+                series.append([(ts, asset, price) for ts, price in
+                               zip(ticks['ts'].tolist(), ticks['price'].tolist())])
+
+            # Replay in time order so both sides of the correlation pair line up
+            for ts, asset, price in heapq.merge(*series):
+                self.update(asset, price, ts)
+
+    def snapshot(self):
+        """{asset: metrics} plus 'correlation'"""
+        with self._lock:
+            result = {asset: analytics.snapshot() for asset, analytics in self.assets.items()}
+            result['correlation'] = self.correlation.value
+            return result
@@ -1,15 +1,12 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, jsonify
 import dash
-from dash import dcc, html, Input, Output, callback
+from dash import dcc, html, Input, Output
 import dash_bootstrap_components as dbc
 import plotly.graph_objs as go
-import plotly.express as px
-import pandas as pd
-import requests
-import json
-from datetime import datetime, timedelta
+from datetime import datetime
 import os
 from dotenv import load_dotenv
+from price_feed import get_price_feed
 
 # Load environment variables
 load_dotenv()
@@ -22,26 +19,21 @@ app = dash.Dash(__name__, server=server, external_stylesheets=[dbc.themes.DARKLY
 def get_crypto_data():
     """Get crypto price data from CoinGecko API"""
     try:
-        # Bitcoin data
-        btc_url = "https://api.coingecko.com/api/v3/simple/price?ids=bitcoin&vs_currencies=usd&include_24hr_change=true&include_market_cap=true"
-        btc_response = requests.get(btc_url)
-        btc_data = btc_response.json()
-        
-        # Ethereum data
-        eth_url = "https://api.coingecko.com/api/v3/simple/price?ids=ethereum&vs_currencies=usd&include_24hr_change=true&include_market_cap=true"
-        eth_response = requests.get(eth_url)
-        eth_data = eth_response.json()
+        # Bitcoin and Ethereum in a single request
+        table = get_price_feed().fetch(['bitcoin', 'ethereum'], ['usd'])
+        if table is None or 'bitcoin' not in table or 'ethereum' not in table:
+            raise ValueError("no price data returned")
         
         return {
             'bitcoin': {
-                'price': btc_data['bitcoin']['usd'],
-                'change_24h': btc_data['bitcoin']['usd_24h_change'],
-                'market_cap': btc_data['bitcoin']['usd_market_cap']
+                'price': table.get('bitcoin', 'usd'),
+                'change_24h': table.get('bitcoin', 'usd', 'change_24h'),
+                'market_cap': table.get('bitcoin', 'usd', 'market_cap')
             },
             'ethereum': {
-                'price': eth_data['ethereum']['usd'],
-                'change_24h': eth_data['ethereum']['usd_24h_change'],
-                'market_cap': eth_data['ethereum']['usd_market_cap']
+                'price': table.get('ethereum', 'usd'),
+                'change_24h': table.get('ethereum', 'usd', 'change_24h'),
+                'market_cap': table.get('ethereum', 'usd', 'market_cap')
             }
         }
     except Exception as e:
@@ -53,6 +45,8 @@ def get_crypto_data():
 
 def generate_portfolio_data():
     """Generate sample portfolio data"""
+    import pandas as pd  # deferred: pandas adds ~0.25 s to startup
+    
     dates = pd.date_range(start='2024-01-01', end=datetime.now(), freq='D')
     
     # Sample portfolio values
@@ -100,10 +94,9 @@ app.layout = dbc.Container([
             dbc.Card([
                 dbc.CardBody([
                     html.H4("Bitcoin", className="card-title"),
-                    html.H2(f"${get_crypto_data()['bitcoin']['price']:,.2f}", 
-                           className="text-success"),
-                    html.P(f"24h: {get_crypto_data()['bitcoin']['change_24h']:+.2f}%",
-                           className="text-muted")
+                    # Filled by update_price_cards so the layout needs no API calls
+                    html.H2("Loading...", id="btc-price", className="text-success"),
+                    html.P("24h: --", id="btc-change", className="text-muted")
                 ])
             ], className="mb-3")
         ], width=6),
@@ -111,10 +104,8 @@ app.layout = dbc.Container([
             dbc.Card([
                 dbc.CardBody([
                     html.H4("Ethereum", className="card-title"),
-                    html.H2(f"${get_crypto_data()['ethereum']['price']:,.2f}", 
-                           className="text-info"),
-                    html.P(f"24h: {get_crypto_data()['ethereum']['change_24h']:+.2f}%",
-                           className="text-muted")
+                    html.H2("Loading...", id="eth-price", className="text-info"),
+                    html.P("24h: --", id="eth-change", className="text-muted")
                 ])
             ], className="mb-3")
         ], width=6)
@@ -160,6 +151,22 @@ app.layout = dbc.Container([
     )
 ], fluid=True, className="p-4")
 
+# Callback for price cards (runs on page load and every interval)
+@app.callback(
+    [Output('btc-price', 'children'),
+     Output('btc-change', 'children'),
+     Output('eth-price', 'children'),
+     Output('eth-change', 'children')],
+    Input('interval-component', 'n_intervals')
+)
+def update_price_cards(n):
+    crypto_data = get_crypto_data()
+    
+    return (f"${crypto_data['bitcoin']['price']:,.2f}",
+            f"24h: {crypto_data['bitcoin']['change_24h']:+.2f}%",
+            f"${crypto_data['ethereum']['price']:,.2f}",
+            f"24h: {crypto_data['ethereum']['change_24h']:+.2f}%")
+
 # Callback for portfolio chart
 @app.callback(
     Output('portfolio-chart', 'figure'),
@@ -1,16 +1,28 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, jsonify, request
 import dash
-from dash import dcc, html, Input, Output, callback, dash_table
+from dash import dcc, html, Input, Output, dash_table
 import dash_bootstrap_components as dbc
 import plotly.graph_objs as go
-import plotly.express as px
-import pandas as pd
-import requests
-import json
-from datetime import datetime, timedelta
+from datetime import date, datetime
 import os
+import threading
+import time
+from urllib.parse import parse_qs
 from dotenv import load_dotenv
 from crypto_tracker import CryptoTracker
+from config import Config
+from scheduler import build_refresh_scheduler
+from price_feed import get_price_feed
+from tick_buffer import TickStore
+from analytics import MarketAnalytics
+from address_table import AddressTableSource, COLUMNS as ADDRESS_COLUMNS
+from change_detection import ChangeDetector
+from alerts import build_alert_engine
+from portfolios import DEFAULT_PORTFOLIO, build_portfolio_registry
+from fast_json import install_fast_json
+from metrics import REGISTRY, instrument_dash
+from response_cache import get_response_cache
+from profiling import install_profiling
 import numpy as np
 
 # Load environment variables
@@ -20,59 +32,194 @@ load_dotenv()
 server = Flask(__name__)
 app = dash.Dash(__name__, server=server, external_stylesheets=[dbc.themes.DARKLY])
 
-# Initialize crypto tracker
-tracker = CryptoTracker()
+# Per-callback timing and payload sizes for /metrics
+instrument_dash(server)
 
-# Sample addresses (replace with your real addresses)
+# Interval callbacks below answer no_update when their data did not change
+changes = ChangeDetector(app)
+
+# orjson for callback responses, the layout and jsonify (JSON_ENGINE)
+install_fast_json(server)
+
+# Initialize crypto tracker (balances and transaction pages persisted in the response cache)
+tracker = CryptoTracker(cache=get_response_cache())
+
+# Price / balance alert rules, evaluated on every price snapshot and stored balance
+alert_engine = build_alert_engine()
+tracker.balance_listeners.append(alert_engine.on_balance)
+
+# Per-user portfolios over the shared balance stores; a balance change only
+# marks the portfolios holding that address for recomputation
+portfolios = build_portfolio_registry(tracker.balances)
+tracker.balance_listeners.append(portfolios.on_balance)
+
+# Coins shown on the price cards and charts
+DASHBOARD_COINS = ['bitcoin', 'ethereum']
+# Shown in place of quote fields CoinGecko did not report
+MISSING_FIELD = "—"
+
+# Addresses from config / .env (sample addresses by default)
 SAMPLE_ADDRESSES = {
-    'bitcoin': [
-        '1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa',  # Genesis block address
-        '3J98t1WpEZ73CNmQviecrnyiWrnqRhWNLy'   # Another sample address
-    ],
-    'ethereum': [
-        '0x742d35Cc6634C0532925a3b8D4C9db96C4b4d8b6',
-        '0x1234567890123456789012345678901234567890'
-    ]
+    'bitcoin': Config.BITCOIN_ADDRESSES,
+    'ethereum': Config.ETHEREUM_ADDRESSES
 }
 
-def get_crypto_data():
-    """Get crypto price data from CoinGecko API"""
-    try:
-        url = "https://api.coingecko.com/api/v3/simple/price"
-        params = {
-            'ids': 'bitcoin,ethereum',
-            'vs_currencies': 'usd',
-            'include_24hr_change': 'true',
-            'include_market_cap': 'true',
-            'include_24hr_vol': 'true'
-        }
-        
-        response = requests.get(url, params=params, timeout=10)
+# Local intraday price history, shared with other worker processes via mmap
+tick_store = TickStore()
+
+# Rolling analytics, updated incrementally from new ticks only
+ANALYTICS_ASSETS = DASHBOARD_COINS + ['portfolio']
+market_analytics = MarketAnalytics(ANALYTICS_ASSETS)
+
+# Columnar view over the tracker's balance stores for the address table
+address_source = AddressTableSource(tracker.balances)
+
+def snapshot_ages():
+    """Seconds since prices, ticks and balances were last refreshed"""
+    now = time.time()
+    ages = {}
+    last_prices = get_price_feed().last_success
+    if last_prices:
+        ages[('prices',)] = now - last_prices
+    for asset, buffer in list(tick_store.buffers.items()):
+        latest = buffer.latest()
+        if latest is not None:
+            ages[(f"ticks_{asset}",)] = now - float(latest['ts'])
+    for chain, store in tracker.balances.items():
+        if len(store):
+            ages[(f"balances_{chain}",)] = now - float(store.rows['updated'][:len(store)].max())
+    return ages
+
+REGISTRY.gauge('snapshot_age_seconds', "Seconds since each data snapshot was refreshed",
+               ('snapshot',), function=snapshot_ages)
+
+# Background balance refresh, spread over the update interval in shards.
+# Built when the refresh starts so large address files are not read on import.
+refresh_scheduler = None
+
+# Stop event of the periodic HD wallet rescans (HD_WALLETS)
+hd_watch = None
+
+# Stop event of the background price poll; callbacks read tracker.price_table
+price_watch = None
+
+def preload_deferred_imports():
+    """Import modules deferred off the import path before serving requests
+    
+    Otherwise the first concurrent callbacks race on the pandas import and
+    plotly can see a partially initialized module in another thread.
+    """
+    import pandas  # noqa: F401
+
+def warm_start(entries):
+    """Load the last cached prices and balances so the first requests serve real data"""
+    began = time.perf_counter()
+    table = get_price_feed().cached_table(*price_request())
+    if table is not None:
+        tracker.price_table = table
+    loaded = tracker.warm_start([address for _, address in entries])
+    if table is not None or loaded:
+        print(f"Warm start: {loaded} cached balances{' and prices' if table is not None else ''} "
+              f"loaded in {time.perf_counter() - began:.2f}s")
+
+def start_background_refresh(debug=False):
+    """Prepare the serving process and start refreshing tracked address balances"""
+    global refresh_scheduler, hd_watch, price_watch
+    
+    # With the debug reloader only the serving child process should refresh
+    if debug and os.environ.get('WERKZEUG_RUN_MAIN') != 'true':
+        return
+    preload_deferred_imports()
+    if refresh_scheduler is None:
+        refresh_scheduler = build_refresh_scheduler(portfolios, tracker.get_ethereum_block_number,
+                                                    tracker.bitcoin_backend)
+        warm_start(refresh_scheduler.entries())
+    refresh_scheduler.start(tracker.refresh_addresses)
+    
+    # Prices, ticks and price alerts are updated whether or not a dashboard is open
+    if price_watch is None:
+        price_watch = watch_prices()
+    
+    if Config.HD_WALLETS and hd_watch is None:
+        from hd_wallet import load_wallets, watch_hd_wallets
         
-        if response.status_code == 200:
-            data = response.json()
-            return {
-                'bitcoin': {
-                    'price': data['bitcoin']['usd'],
-                    'change_24h': data['bitcoin']['usd_24h_change'],
-                    'market_cap': data['bitcoin']['usd_market_cap'],
-                    'volume_24h': data['bitcoin']['usd_24h_vol']
-                },
-                'ethereum': {
-                    'price': data['ethereum']['usd'],
-                    'change_24h': data['ethereum']['usd_24h_change'],
-                    'market_cap': data['ethereum']['usd_market_cap'],
-                    'volume_24h': data['ethereum']['usd_24h_vol']
-                }
-            }
-        else:
-            return None
+        # Newly used HD wallet addresses join the balance refresh
+        hd_watch = watch_hd_wallets(
+            tracker.hd_scanner, load_wallets(),
+            lambda addresses: refresh_scheduler.load(('bitcoin', address) for address in addresses))
+
+def price_request():
+    """Dashboard coins plus any configured extras, and the currencies to price them in"""
+    pairs = alert_engine.price_pairs()
+    coins = list(dict.fromkeys(DASHBOARD_COINS + Config.TRACKED_COINS + [coin for coin, _ in pairs]))
+    currencies = list(dict.fromkeys(['usd'] + Config.VS_CURRENCIES + [currency for _, currency in pairs]))
+    return coins, currencies
+
+def poll_prices():
+    """Fetch prices (or the response cache within its TTL), record ticks and check price alerts"""
+    # Batched into as few requests as possible
+    table = get_price_feed().fetch(*price_request())
+    if table is None:
+        return None
+    
+    tracker.price_table = table
+    try:
+        tick_store.record(table.to_dict('usd'), table.timestamp)
     except Exception as e:
-        print(f"Error fetching crypto data: {e}")
+        print(f"Error recording price ticks: {e}")
+    alert_engine.on_prices(table)
+    return table
+
+def watch_prices(interval=None, stop_event=None):
+    """Poll prices every ``interval`` seconds (the update interval) in a daemon thread"""
+    interval = interval or Config.UPDATE_INTERVAL / 1000.0
+    stop_event = stop_event or threading.Event()
+    
+    def run():
+        while not stop_event.is_set():
+            try:
+                poll_prices()
+            except Exception as e:
+                print(f"Error polling prices: {e}")
+            stop_event.wait(interval)
+    
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return stop_event
+
+def latest_price_table(poll=True):
+    """Latest polled PriceTable, polling now if this process runs no background poll"""
+    if poll and price_watch is None:
+        poll_prices()  # start_background_refresh not called in this process
+    return tracker.price_table
+
+def get_crypto_data(poll=True):
+    """Latest prices of the tracked coins, or None until every dashboard coin has one
+    
+    Callbacks pass ``poll=False``: their ``version`` has already polled.
+    """
+    table = latest_price_table(poll)
+    if table is None or not all(coin in table for coin in DASHBOARD_COINS):
         return None
+    return table.to_dict('usd')
+
+def market_snapshot():
+    """Timestamp of the latest price table, the version of price-driven callbacks"""
+    table = latest_price_table()
+    return table.timestamp if table is not None else None
+
+def tick_counts(assets):
+    """Ticks appended so far per asset, the version of tick-driven callbacks"""
+    counts = []
+    for asset in assets:
+        buffer = tick_store.buffer(asset)
+        counts.append(buffer.count if buffer is not None else 0)
+    return counts
 
 def generate_portfolio_data():
     """Generate realistic portfolio data"""
+    import pandas as pd  # deferred: pandas adds ~0.25 s to startup
+    
     dates = pd.date_range(start='2024-01-01', end=datetime.now(), freq='D')
     
     # Generate realistic portfolio values with crypto-like volatility
@@ -97,6 +244,8 @@ def generate_portfolio_data():
 
 def generate_price_history():
     """Generate historical price data for charts"""
+    import pandas as pd  # deferred: pandas adds ~0.25 s to startup
+    
     dates = pd.date_range(start='2024-01-01', end=datetime.now(), freq='D')
     
     # Bitcoin price simulation
@@ -125,8 +274,20 @@ def generate_price_history():
         'Ethereum': eth_prices
     })
 
+def portfolio_id(search):
+    """Portfolio named by the page's ?portfolio= query parameter"""
+    values = parse_qs((search or '').lstrip('?')).get('portfolio')
+    return values[0] if values else DEFAULT_PORTFOLIO
+
+def portfolio_version(search):
+    """Version of the selected portfolio's totals (None if unknown)"""
+    portfolio = portfolios.get(portfolio_id(search))
+    return portfolio.version if portfolio is not None else None
+
 # Dashboard layout
 app.layout = dbc.Container([
+    dcc.Location(id='url', refresh=False),
+    
     # Header
     dbc.Row([
         dbc.Col([
@@ -145,7 +306,10 @@ app.layout = dbc.Container([
                     html.H4("Bitcoin", className="card-title"),
                     html.H2(id="btc-price", className="text-success"),
                     html.P(id="btc-change", className="text-muted"),
-                    html.Small(id="btc-market-cap", className="text-muted")
+                    html.Small(id="btc-market-cap", className="text-muted"),
+                    dcc.Graph(id="btc-sparkline", config={'displayModeBar': False},
+                              style={"height": "60px"}),
+                    html.Small(id="btc-local-stats", className="text-muted")
                 ])
             ], className="mb-3", style={"border": "1px solid #00ff88"})
         ], width=6),
@@ -155,7 +319,10 @@ app.layout = dbc.Container([
                     html.H4("Ethereum", className="card-title"),
                     html.H2(id="eth-price", className="text-info"),
                     html.P(id="eth-change", className="text-muted"),
-                    html.Small(id="eth-market-cap", className="text-muted")
+                    html.Small(id="eth-market-cap", className="text-muted"),
+                    dcc.Graph(id="eth-sparkline", config={'displayModeBar': False},
+                              style={"height": "60px"}),
+                    html.Small(id="eth-local-stats", className="text-muted")
                 ])
             ], className="mb-3", style={"border": "1px solid #627eea"})
         ], width=6)
@@ -224,13 +391,45 @@ app.layout = dbc.Container([
         ], width=6)
     ], className="mb-4"),
     
+    # Streaming analytics (precomputed from local price ticks)
+    dbc.Row([
+        dbc.Col([
+            dbc.Card([
+                dbc.CardHeader("Market Analytics"),
+                dbc.CardBody([
+                    html.Div(id='analytics-panel'),
+                    html.Small(id='correlation-value', className="text-muted")
+                ])
+            ])
+        ])
+    ], className="mb-4"),
+    
     # Address Tracking
     dbc.Row([
         dbc.Col([
             dbc.Card([
                 dbc.CardHeader("Address Balances"),
                 dbc.CardBody([
-                    html.Div(id='address-table')
+                    dash_table.DataTable(
+                        id='address-table',
+                        columns=ADDRESS_COLUMNS,
+                        data=[],
+                        page_current=0,
+                        page_size=20,
+                        page_action='custom',
+                        sort_action='custom',
+                        sort_mode='single',
+                        sort_by=[],
+                        filter_action='custom',
+                        filter_query='',
+                        style_table={'overflowX': 'auto'},
+                        style_header={'backgroundColor': '#303030', 'color': 'white',
+                                      'fontWeight': 'bold', 'border': '1px solid #444'},
+                        style_cell={'backgroundColor': '#222', 'color': 'white',
+                                    'border': '1px solid #333', 'fontFamily': 'monospace',
+                                    'textAlign': 'left'},
+                        style_filter={'backgroundColor': '#2a2a2a', 'color': 'white'}
+                    )
                 ])
             ])
         ])
@@ -244,27 +443,33 @@ app.layout = dbc.Container([
     )
 ], fluid=True, className="p-4")
 
+def format_field(value, spec, prefix='', suffix=''):
+    """Format a quote field, or a dash when CoinGecko did not report it"""
+    return MISSING_FIELD if value is None else f"{prefix}{format(value, spec)}{suffix}"
+
 # Callbacks for real-time data updates
-@app.callback(
+@changes.callback(
     [Output('btc-price', 'children'),
      Output('btc-change', 'children'),
      Output('btc-market-cap', 'children'),
      Output('eth-price', 'children'),
      Output('eth-change', 'children'),
      Output('eth-market-cap', 'children')],
-    Input('interval-component', 'n_intervals')
+    Input('interval-component', 'n_intervals'),
+    version=lambda n: market_snapshot()
 )
 def update_price_cards(n):
-    crypto_data = get_crypto_data()
+    crypto_data = get_crypto_data(poll=False)
     
     if crypto_data:
-        btc_price = f"${crypto_data['bitcoin']['price']:,.2f}"
-        btc_change = f"24h: {crypto_data['bitcoin']['change_24h']:+.2f}%"
-        btc_market_cap = f"Market Cap: ${crypto_data['bitcoin']['market_cap']:,.0f}"
+        btc, eth = crypto_data.get('bitcoin', {}), crypto_data.get('ethereum', {})
+        btc_price = format_field(btc.get('price'), ',.2f', prefix='$')
+        btc_change = f"24h: {format_field(btc.get('change_24h'), '+.2f', suffix='%')}"
+        btc_market_cap = f"Market Cap: {format_field(btc.get('market_cap'), ',.0f', prefix='$')}"
         
-        eth_price = f"${crypto_data['ethereum']['price']:,.2f}"
-        eth_change = f"24h: {crypto_data['ethereum']['change_24h']:+.2f}%"
-        eth_market_cap = f"Market Cap: ${crypto_data['ethereum']['market_cap']:,.0f}"
+        eth_price = format_field(eth.get('price'), ',.2f', prefix='$')
+        eth_change = f"24h: {format_field(eth.get('change_24h'), '+.2f', suffix='%')}"
+        eth_market_cap = f"Market Cap: {format_field(eth.get('market_cap'), ',.0f', prefix='$')}"
     else:
         btc_price = "$45,000.00"
         btc_change = "24h: +2.50%"
@@ -276,23 +481,79 @@ def update_price_cards(n):
     
     return btc_price, btc_change, btc_market_cap, eth_price, eth_change, eth_market_cap
 
-@app.callback(
+def make_sparkline(ticks, color):
+    """Minimal 24h line chart from local price ticks"""
+    fig = go.Figure(go.Scatter(
+        x=ticks['ts'].astype('datetime64[s]'),
+        y=ticks['price'],
+        mode='lines',
+        line=dict(color=color, width=2),
+        hoverinfo='skip'
+    ))
+    fig.update_layout(
+        margin=dict(l=0, r=0, t=0, b=0),
+        height=60,
+        xaxis=dict(visible=False),
+        yaxis=dict(visible=False),
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        showlegend=False
+    )
+    return fig
+
+def format_local_stats(stats):
+    """One-line summary of local 24h tick stats"""
+    if not stats or stats['ticks'] < 2:
+        return "Collecting 24h history..."
+    text = f"Local 24h: {stats['change_pct']:+.2f}% | H ${stats['high']:,.2f} / L ${stats['low']:,.2f}"
+    if stats['volume'] is not None:
+        text += f" | Vol ${stats['volume']:,.0f}"
+    return text
+
+# Callback for 24h sparklines from the local tick buffer (no history API calls)
+@changes.callback(
+    [Output('btc-sparkline', 'figure'),
+     Output('btc-local-stats', 'children'),
+     Output('eth-sparkline', 'figure'),
+     Output('eth-local-stats', 'children')],
+    Input('interval-component', 'n_intervals'),
+    version=lambda n: tick_counts(DASHBOARD_COINS)
+)
+def update_sparklines(n):
+    return (make_sparkline(tick_store.last('bitcoin'), '#f7931a'),
+            format_local_stats(tick_store.stats('bitcoin')),
+            make_sparkline(tick_store.last('ethereum'), '#627eea'),
+            format_local_stats(tick_store.stats('ethereum')))
+
+@changes.callback(
     [Output('total-portfolio-value', 'children'),
      Output('btc-portfolio-value', 'children'),
      Output('eth-portfolio-value', 'children')],
-    Input('interval-component', 'n_intervals')
+    [Input('interval-component', 'n_intervals'),
+     Input('url', 'search')],
+    version=lambda n, search: [market_snapshot(), portfolio_version(search)]
 )
-def update_portfolio_summary(n):
-    crypto_data = get_crypto_data()
-    
+def update_portfolio_summary(n, search):
+    selected = portfolio_id(search)
+    if selected not in portfolios:
+        return "Unknown portfolio", "—", "—"
+    crypto_data = get_crypto_data(poll=False)
+    summary = None
     if crypto_data:
-        # Calculate portfolio values (sample data)
-        btc_holdings = 0.5  # Sample BTC holdings
-        eth_holdings = 2.5  # Sample ETH holdings
+        summary = portfolios.summary(selected, {chain: crypto_data.get(chain, {}).get('price')
+                                                for chain in DASHBOARD_COINS})
+    
+    if summary:
+        btc_value = summary['breakdown']['bitcoin']['value']
+        eth_value = summary['breakdown']['ethereum']['value']
+        total_value = summary['total_value']
         
-        btc_value = btc_holdings * crypto_data['bitcoin']['price']
-        eth_value = eth_holdings * crypto_data['ethereum']['price']
-        total_value = btc_value + eth_value
+        # Portfolio value series feeds the analytics panel
+        if selected == DEFAULT_PORTFOLIO:
+            try:
+                tick_store.record({'portfolio': {'price': total_value}})
+            except Exception as e:
+                print(f"Error recording portfolio tick: {e}")
         
         return (f"${total_value:,.2f}", 
                 f"${btc_value:,.2f}", 
@@ -300,10 +561,48 @@ def update_portfolio_summary(n):
     else:
         return "$29,500.00", "$22,500.00", "$7,000.00"
 
+def format_metric(value, fmt):
+    """Format an analytics value, or a dash while there is not enough history"""
+    return "—" if value is None else fmt.format(value)
+
+# Callback for the analytics panel (reads precomputed rolling values)
+@changes.callback(
+    [Output('analytics-panel', 'children'),
+     Output('correlation-value', 'children')],
+    Input('interval-component', 'n_intervals'),
+    version=lambda n: tick_counts(ANALYTICS_ASSETS)
+)
+def update_analytics_panel(n):
+    market_analytics.sync(tick_store)
+    snapshot = market_analytics.snapshot()
+    
+    header = html.Thead(html.Tr([
+        html.Th(label) for label in
+        ["", "Return", "Volatility (ann.)", "Drawdown", "Max Drawdown", "MA 20", "MA 120"]
+    ]))
+    rows = []
+    for asset in ANALYTICS_ASSETS:
+        metrics = snapshot[asset]
+        rows.append(html.Tr([
+            html.Td(asset.capitalize()),
+            html.Td(format_metric(metrics['return_pct'], "{:+.2f}%")),
+            html.Td(format_metric(metrics['volatility_pct'], "{:.1f}%")),
+            html.Td(format_metric(metrics['drawdown_pct'], "{:.2f}%")),
+            html.Td(format_metric(metrics['max_drawdown_pct'], "{:.2f}%")),
+            html.Td(format_metric(metrics['sma_short'], "${:,.2f}")),
+            html.Td(format_metric(metrics['sma_long'], "${:,.2f}"))
+        ]))
+    
+    table = dbc.Table([header, html.Tbody(rows)], bordered=False, hover=True,
+                      size="sm", className="text-light mb-2")
+    correlation = f"BTC/ETH return correlation: {format_metric(snapshot['correlation'], '{:+.2f}')}"
+    return table, correlation
+
 # Callback for portfolio chart
-@app.callback(
+@changes.callback(
     Output('portfolio-chart', 'figure'),
-    Input('interval-component', 'n_intervals')
+    Input('interval-component', 'n_intervals'),
+    version=lambda n: date.today().isoformat()  # daily history
 )
 def update_portfolio_chart(n):
     df = generate_portfolio_data()
@@ -333,9 +632,10 @@ def update_portfolio_chart(n):
     return fig
 
 # Callback for price history chart
-@app.callback(
+@changes.callback(
     Output('price-history-chart', 'figure'),
-    Input('interval-component', 'n_intervals')
+    Input('interval-component', 'n_intervals'),
+    version=lambda n: date.today().isoformat()  # daily history
 )
 def update_price_history_chart(n):
     df = generate_price_history()
@@ -372,16 +672,17 @@ def update_price_history_chart(n):
     return fig
 
 # Callback for market cap pie chart
-@app.callback(
+@changes.callback(
     Output('market-cap-pie', 'figure'),
-    Input('interval-component', 'n_intervals')
+    Input('interval-component', 'n_intervals'),
+    version=lambda n: market_snapshot()
 )
 def update_market_cap_pie(n):
-    crypto_data = get_crypto_data()
+    crypto_data = get_crypto_data(poll=False)
     
     if crypto_data:
         labels = ['Bitcoin', 'Ethereum']
-        values = [crypto_data['bitcoin']['market_cap'], crypto_data['ethereum']['market_cap']]
+        values = [crypto_data.get(coin, {}).get('market_cap') for coin in ('bitcoin', 'ethereum')]
     else:
         labels = ['Bitcoin', 'Ethereum']
         values = [850000000000, 350000000000]
@@ -406,16 +707,17 @@ def update_market_cap_pie(n):
     return fig
 
 # Callback for volume chart
-@app.callback(
+@changes.callback(
     Output('volume-chart', 'figure'),
-    Input('interval-component', 'n_intervals')
+    Input('interval-component', 'n_intervals'),
+    version=lambda n: market_snapshot()
 )
 def update_volume_chart(n):
-    crypto_data = get_crypto_data()
+    crypto_data = get_crypto_data(poll=False)
     
     if crypto_data:
         labels = ['Bitcoin', 'Ethereum']
-        values = [crypto_data['bitcoin']['volume_24h'], crypto_data['ethereum']['volume_24h']]
+        values = [crypto_data.get(coin, {}).get('volume_24h') for coin in ('bitcoin', 'ethereum')]
     else:
         labels = ['Bitcoin', 'Ethereum']
         values = [25000000000, 15000000000]
@@ -438,47 +740,42 @@ def update_volume_chart(n):
     
     return fig
 
-# Callback for address table
-@app.callback(
-    Output('address-table', 'children'),
-    Input('interval-component', 'n_intervals')
+def latest_prices():
+    """Latest USD price per chain from the local tick buffer (no API call)"""
+    prices = {}
+    for chain in DASHBOARD_COINS:
+        buffer = tick_store.buffer(chain)
+        tick = buffer.latest() if buffer else None
+        if tick is not None:
+            prices[chain] = float(tick['price'])
+    return prices
+
+# Callback for address table (server-side paging, sorting and filtering)
+@changes.callback(
+    [Output('address-table', 'data'),
+     Output('address-table', 'page_count')],
+    [Input('interval-component', 'n_intervals'),
+     Input('address-table', 'page_current'),
+     Input('address-table', 'page_size'),
+     Input('address-table', 'sort_by'),
+     Input('address-table', 'filter_query'),
+     Input('url', 'search')],
+    version=lambda *args: [[store.version for store in tracker.balances.values()], latest_prices()]
 )
-def update_address_table(n):
-    table_rows = []
-    
-    # Bitcoin addresses
-    for i, addr in enumerate(SAMPLE_ADDRESSES['bitcoin']):
-        table_rows.append(
-            dbc.Row([
-                dbc.Col([
-                    html.I(className="fab fa-bitcoin text-warning me-2"),
-                    "Bitcoin"
-                ], width=2),
-                dbc.Col([
-                    html.Code(addr[:20] + "...", className="text-light")
-                ], width=6),
-                dbc.Col("0.5 BTC", width=2, className="text-success"),
-                dbc.Col("$22,500", width=2, className="text-warning")
-            ], className="mb-2 p-2", style={"border": "1px solid #333", "border-radius": "5px"})
-        )
-    
-    # Ethereum addresses
-    for i, addr in enumerate(SAMPLE_ADDRESSES['ethereum']):
-        table_rows.append(
-            dbc.Row([
-                dbc.Col([
-                    html.I(className="fab fa-ethereum text-info me-2"),
-                    "Ethereum"
-                ], width=2),
-                dbc.Col([
-                    html.Code(addr[:20] + "...", className="text-light")
-                ], width=6),
-                dbc.Col("2.5 ETH", width=2, className="text-info"),
-                dbc.Col("$7,000", width=2, className="text-warning")
-            ], className="mb-2 p-2", style={"border": "1px solid #333", "border-radius": "5px"})
-        )
-    
-    return table_rows
+def update_address_table(n, page_current, page_size, sort_by, filter_query, search):
+    # Only the selected portfolio's addresses (every tracked one without PORTFOLIOS_FILE)
+    addresses = None
+    if Config.PORTFOLIOS_FILE:
+        portfolio = portfolios.get(portfolio_id(search))
+        addresses = [address for _, address in portfolio.addresses] if portfolio else []
+    return address_source.page(latest_prices(), page_current or 0, page_size or 20,
+                               sort_by, filter_query, addresses)
+
+# Per-client last-render fingerprints of the change-detected callbacks above
+app.layout.children.extend(changes.stores())
+
+# Opt-in profiling of every callback above and every tracker method (PROFILING=true)
+profiler = install_profiling(app, server, [tracker])
 
 # Flask routes
 @server.route('/')
@@ -493,5 +790,26 @@ def api_crypto_data():
 def api_addresses():
     return jsonify(SAMPLE_ADDRESSES)
 
+@server.route('/api/portfolios/<portfolio_id>')
+def api_portfolio(portfolio_id):
+    summary = portfolios.summary(portfolio_id, latest_prices())
+    if summary is None:
+        return jsonify({'error': f"Unknown portfolio {portfolio_id}"}), 404
+    return jsonify(summary)
+
+@server.route('/api/alerts')
+def api_alerts():
+    # Alerts of one user's rules after the last ``seq`` the caller has seen; nothing is consumed
+    if alert_engine.queue is None:
+        return jsonify({'error': "No in-process alert queue"}), 404
+    user = request.args.get('user')
+    since = request.args.get('since', 0, type=int)
+    return jsonify(alert_engine.queue.since(since, user))
+
+@server.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
+    start_background_refresh(debug=True)
     app.run_server(debug=True, host='0.0.0.0', port=8050)
@@ -0,0 +1,193 @@
+"""
+Compact balance store
+Per-address balances for one asset kept in a NumPy structured array as exact
+integers (satoshis, wei), with an address -> row index and vectorized totals
+"""
+
+import threading
+import time
+
+import numpy as np
+
+# Amounts are unsigned 128-bit integers split into four 32-bit limbs. Summing
+# each limb column in uint64 stays exact for up to 2**32 rows, and 128 bits
+# comfortably holds any wei amount.
+LIMB_BITS = 32
+LIMBS = 4
+LIMB_MASK = (1 << LIMB_BITS) - 1
+MAX_AMOUNT = (1 << (LIMB_BITS * LIMBS)) - 1
+
+BALANCE_DTYPE = np.dtype([
+    ('amount', np.uint32, (LIMBS,)),  # base units (satoshis / wei), little-endian limbs
+    ('n_tx', np.int64),               # -1 when the backend does not report it
+    ('updated', np.float64)           # unix timestamp of the last refresh
+])
+
+LIMB_WEIGHTS = [1 << (LIMB_BITS * i) for i in range(LIMBS)]
+
+
+def split_amount(amount):
+    """Split a non-negative integer amount into 32-bit limbs"""
+    amount = int(amount)
+    if amount < 0 or amount > MAX_AMOUNT:
+        raise ValueError(f"Amount out of range for balance store: {amount}")
+    return [(amount >> (LIMB_BITS * i)) & LIMB_MASK for i in range(LIMBS)]
+
+
+def join_limbs(limbs):
+    """Combine limb values (possibly summed) back into one Python int"""
+    return sum(int(limb) * weight for limb, weight in zip(limbs, LIMB_WEIGHTS))
+
+
+class BalanceStore:
+    """Exact integer balances for every tracked address of one asset
+
+    One row costs 32 bytes, so a million balances take 32 MB of array memory
+    (plus the address index), and totals are exact however many rows there are.
+    """
+
+    def __init__(self, asset, decimals, capacity=1024):
+        self.asset = asset
+        self.decimals = decimals
+        self.index = {}
+        self.rows = np.zeros(capacity, dtype=BALANCE_DTYPE)
+        self.rows['n_tx'] = -1
+        self._addresses = []
+        self._lock = threading.Lock()
+        self._dirty = set()  # rows whose amount changed since the last take_dirty()
+        # Bumped on every write so readers can cache derived views
+        self.version = 0
+
+    def __len__(self):
+        return len(self._addresses)
+
+    def __contains__(self, address):
+        return address in self.index
+
+    @property
+    def nbytes(self):
+        """Bytes used by the live rows"""
+        return len(self) * BALANCE_DTYPE.itemsize
+
+    @property
+    def addresses(self):
+        """Addresses in row order"""
+        return self._addresses
+
+    def _grow(self, needed):
+        """Grow the backing array geometrically to hold ``needed`` rows"""
+        capacity = len(self.rows)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        rows = np.zeros(capacity, dtype=BALANCE_DTYPE)
+        rows['n_tx'] = -1
+        rows[:len(self.rows)] = self.rows
+        self.rows = rows
+
+    def _add_row(self, address):
+        """Row of an address, adding it if new; the caller holds the lock"""
+        row = self.index.get(address)
+        if row is None:
+            row = len(self._addresses)
+            self._grow(row + 1)
+            self.index[address] = row
+            self._addresses.append(address)
+        return row
+
+    def row_for(self, address, create=True):
+        """Row index of an address, adding it if ``create`` is set"""
+        row = self.index.get(address)
+        if row is None and create:
+            with self._lock:
+                row = self._add_row(address)
+        return row
+
+    def set(self, address, amount, n_tx=None, updated=None):
+        """Store an address balance in base units, returning True if it changed"""
+        limbs = split_amount(amount)
+        # Under the lock so a concurrent _grow cannot swap the array mid-write
+        with self._lock:
+            row = self._add_row(address)
+            record = self.rows[row]
+            changed = list(record['amount']) != limbs
+            record['amount'] = limbs
+            if changed:
+                self._dirty.add(row)
+            if n_tx is not None:
+                changed = changed or record['n_tx'] != n_tx
+                record['n_tx'] = n_tx
+            record['updated'] = time.time() if updated is None else updated
+            self.version += 1
+        return changed
+
+    def set_many(self, addresses, amounts, updated=None):
+        """Store many balances at once"""
+        amounts = list(amounts)
+        if amounts and min(amounts) < 0:
+            raise ValueError("Balances cannot be negative")
+        try:
+            # Fast path: everything fits in 64 bits (all satoshi and most wei amounts)
+            small = np.array(amounts, dtype=np.uint64)
+            limbs = np.zeros((len(small), LIMBS), dtype=np.uint32)
+            limbs[:, 0] = small & LIMB_MASK
+            limbs[:, 1] = small >> LIMB_BITS
+        except OverflowError:
+            limbs = np.array([split_amount(amount) for amount in amounts], dtype=np.uint32)
+        with self._lock:
+            rows = np.fromiter((self._add_row(a) for a in addresses), dtype=np.int64)
+            limbs = limbs.reshape(len(rows), LIMBS)
+            changed = (self.rows['amount'][rows] != limbs).any(axis=1)
+            self._dirty.update(rows[changed].tolist())
+            self.rows['amount'][rows] = limbs
+            self.rows['updated'][rows] = time.time() if updated is None else updated
+            self.version += 1
+        return rows
+
+    def get(self, address):
+        """Balance of an address in base units, or None if unknown"""
+        row = self.index.get(address)
+        if row is None:
+            return None
+        return join_limbs(self.rows['amount'][row])
+
+    def n_tx(self, address):
+        """Transaction count of an address, or None if unknown"""
+        row = self.index.get(address)
+        if row is None or self.rows['n_tx'][row] < 0:
+            return None
+        return int(self.rows['n_tx'][row])
+
+    def total(self, rows=None):
+        """Exact sum of balances in base units, over all rows or a subset"""
+        amounts = self.rows['amount'][:len(self)]
+        if rows is not None:
+            amounts = amounts[rows]
+        return join_limbs(amounts.sum(axis=0, dtype=np.uint64))
+
+    def to_units(self, amount):
+        """Convert a base-unit integer to a float in whole coins"""
+        return amount / 10 ** self.decimals
+
+    def amounts(self, rows=None):
+        """Balances in whole coins as a float64 array, over all rows (row order) or a subset"""
+        limbs = self.rows['amount'][:len(self)]
+        if rows is not None:
+            limbs = limbs[rows]
+        weights = np.array(LIMB_WEIGHTS, dtype=np.float64) / 10 ** self.decimals
+        return limbs.astype(np.float64) @ weights
+
+    def snapshot(self):
+        """(addresses, amounts in whole coins, n_tx, updated) of every row, read under one lock"""
+        with self._lock:
+            n = len(self._addresses)
+            return (self._addresses[:n], self.amounts(), self.rows['n_tx'][:n].copy(),
+                    self.rows['updated'][:n].copy())
+
+    def take_dirty(self):
+        """(addresses, amounts in whole coins) of the rows changed since the last call"""
+        with self._lock:
+            rows, self._dirty = self._dirty, set()
+            rows = np.fromiter(sorted(rows), dtype=np.int64, count=len(rows))
+            return [self._addresses[row] for row in rows], self.amounts(rows)
@@ -0,0 +1,354 @@
+"""
+Headless balance snapshots
+Resolves balances (and recent Bitcoin transactions) for every address in an
+address file with bounded parallelism and writes one timestamped columnar
+snapshot. Work is checkpointed per chunk so an interrupted run resumes where
+it stopped.
+
+    python crypto_tracker.py snapshot addresses.csv --workers 32 --txs 5
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import itertools
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from address_loader import iter_addresses
+from node_backends import btc_to_satoshis
+
+SNAPSHOT_DIR = os.path.join('data', 'snapshots')
+
+# Column order of the two snapshot tables
+ADDRESS_COLUMNS = ('chain', 'address', 'ok', 'balance', 'balance_units', 'n_tx',
+                   'total_received_sat', 'total_sent_sat', 'balance_usdt', 'updated')
+TX_COLUMNS = ('tx_address', 'tx_hash', 'tx_time', 'tx_block_height', 'tx_result_sat', 'tx_fee_sat')
+
+
+def _int_or(value, default=-1):
+    return default if value is None else int(value)
+
+
+def address_row(chain, address, data, updated):
+    """Snapshot row for one address (``data`` None when it could not be resolved)"""
+    row = {'chain': chain, 'address': address, 'ok': data is not None, 'balance': '',
+           'balance_units': np.nan, 'n_tx': -1, 'total_received_sat': -1,
+           'total_sent_sat': -1, 'balance_usdt': np.nan, 'updated': updated}
+    if data is None:
+        return row
+    if chain == 'bitcoin':
+        row.update(balance=str(data['final_balance']),
+                   balance_units=data['final_balance'] / 1e8,
+                   n_tx=_int_or(data.get('n_tx')),
+                   total_received_sat=_int_or(data.get('total_received')),
+                   total_sent_sat=_int_or(data.get('total_sent')))
+    else:
+        row.update(balance=str(data['balance_wei']),
+                   balance_units=data['balance_eth'],
+                   balance_usdt=data.get('balance_usdt', np.nan))
+    return row
+
+
+def transaction_rows(address, txs):
+    """Normalize rawaddr (blockchain.info) or listtransactions (Bitcoin Core) entries"""
+    rows = []
+    for tx in txs or []:
+        if 'result' in tx:
+            result = tx['result']
+        else:
+            result = btc_to_satoshis(tx.get('amount', 0))
+        fee = tx.get('fee')
+        if fee is not None and 'result' not in tx:
+            fee = -btc_to_satoshis(fee)  # Bitcoin Core reports fees as negative BTC
+        rows.append({
+            'tx_address': address,
+            'tx_hash': tx.get('hash') or tx.get('txid') or '',
+            'tx_time': _int_or(tx.get('time')),
+            'tx_block_height': _int_or(tx.get('block_height', tx.get('blockheight'))),
+            'tx_result_sat': int(result),
+            'tx_fee_sat': _int_or(fee)
+        })
+    return rows
+
+
+def to_columns(rows, names):
+    """List of row dicts -> {column: numpy array} (strings as fixed-width unicode)"""
+    columns = {}
+    for name in names:
+        values = [row[name] for row in rows]
+        if values and isinstance(values[0], str):
+            columns[name] = np.array(values, dtype=str)
+        else:
+            columns[name] = np.array(values)
+    return columns
+
+
+def concat_columns(parts, names):
+    columns = {}
+    for name in names:
+        arrays = [part[name] for part in parts if name in part and len(part[name])]
+        columns[name] = np.concatenate(arrays) if arrays else np.array([])
+    return columns
+
+
+class SnapshotJob:
+    """One (possibly resumed) snapshot run
+
+    Progress lives in ``<out_dir>/snapshot_<stamp>.partial/``: a manifest
+    plus one .npz file per finished chunk. Chunks are contiguous slices of
+    the address file, so a rerun with the same file skips finished chunks and
+    redoes chunks that had failures. The chunks are merged into
+    ``snapshot_<stamp>.npz`` (or .parquet) at the end.
+    """
+
+    def __init__(self, tracker, path, out_dir=None, workers=16, chunk_size=2000, tx_limit=0,
+                 retries=2, fmt='npz', resume=True):
+        self.tracker = tracker
+        self.path = path
+        self.out_dir = out_dir or SNAPSHOT_DIR
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.tx_limit = tx_limit
+        self.retries = retries
+        self.fmt = fmt
+        self.manifest = {
+            'input': os.path.abspath(path),
+            'input_size': os.path.getsize(path),
+            'input_mtime': os.path.getmtime(path),
+            'chunk_size': chunk_size,
+            'tx_limit': tx_limit
+        }
+        self.work_dir = self._find_partial() if resume else None
+        if self.work_dir is None:
+            stamp = time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())
+            self.work_dir = os.path.join(self.out_dir, f"snapshot_{stamp}.partial")
+            os.makedirs(self.work_dir, exist_ok=True)
+            with open(os.path.join(self.work_dir, 'manifest.json'), 'w') as f:
+                json.dump(dict(self.manifest, started=time.time()), f, indent=2)
+            self.resumed = False
+        else:
+            self.resumed = True
+
+    def _find_partial(self):
+        """Newest unfinished run over the same input with the same settings"""
+        if not os.path.isdir(self.out_dir):
+            return None
+        for name in sorted(os.listdir(self.out_dir), reverse=True):
+            manifest_path = os.path.join(self.out_dir, name, 'manifest.json')
+            if not name.endswith('.partial') or not os.path.exists(manifest_path):
+                continue
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            if all(manifest.get(key) == value for key, value in self.manifest.items()):
+                return os.path.join(self.out_dir, name)
+        return None
+
+    def _chunk_path(self, index):
+        return os.path.join(self.work_dir, f"chunk_{index:06d}.npz")
+
+    def _load_chunk(self, index):
+        """Columns of a finished chunk, or None"""
+        path = self._chunk_path(index)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as chunk:
+            return {key: chunk[key] for key in chunk.files}
+
+    @staticmethod
+    def _rows(columns, names, keep):
+        """Row dicts of a chunk table for rows where ``keep`` is true"""
+        if not len(columns.get(names[0], ())):
+            return []
+        return [{name: columns[name][i].item() for name in names}
+                for i in np.flatnonzero(keep)]
+
+    def _retry(self, fn, *args):
+        """Call fn until it returns something other than None"""
+        for attempt in range(self.retries + 1):
+            result = fn(*args)
+            if result is not None:
+                return result
+            if attempt < self.retries:
+                time.sleep(0.5 * 2 ** attempt)
+        return None
+
+    # --- resolvers (run in the thread pool) -----------------------------------
+
+    def _bitcoin_batch(self, addresses):
+        """Balances for a batch of addresses via the backend's batched lookup"""
+        def fetch():
+            try:
+                return self.tracker.bitcoin_backend.get_addresses(addresses) or None
+            except Exception as e:
+                print(f"Error getting Bitcoin balances for {len(addresses)} addresses: {e}")
+                return None
+
+        found = self._retry(fetch) or {}
+        return [(address, found.get(address), []) for address in addresses]
+
+    def _bitcoin_with_txs(self, address):
+        """Balance and recent transactions, from a single rawaddr call where possible"""
+        backend = self.tracker.bitcoin_backend
+
+        def fetch():
+            try:
+                return backend.get_address(address, tx_limit=self.tx_limit)
+            except Exception as e:
+                print(f"Error getting Bitcoin data for {address}: {e}")
+                return None
+
+        data = self._retry(fetch)
+        if data is None:
+            return [(address, None, [])]
+        txs = data.get('txs')
+        if txs is None:
+            try:
+                txs = backend.get_transactions(address, limit=self.tx_limit)
+            except Exception as e:
+                print(f"Error getting Bitcoin transactions for {address}: {e}")
+                txs = []
+        return [(address, data, txs[:self.tx_limit])]
+
+    def _ethereum(self, address):
+        return [(address, self._retry(self.tracker.get_ethereum_balance, address), [])]
+
+    def _resolve_chunk(self, pool, entries):
+        bitcoin = [address for chain, address in entries if chain == 'bitcoin']
+        ethereum = [address for chain, address in entries if chain == 'ethereum']
+        batch_size = getattr(self.tracker.bitcoin_backend, 'batch_size', 50)
+
+        futures = [pool.submit(self._ethereum, address) for address in ethereum]
+        if self.tx_limit:
+            futures += [pool.submit(self._bitcoin_with_txs, address) for address in bitcoin]
+        else:
+            futures += [pool.submit(self._bitcoin_batch, bitcoin[i:i + batch_size])
+                        for i in range(0, len(bitcoin), batch_size)]
+
+        resolved = {}
+        txs = {}
+        for future in futures:
+            for address, data, address_txs in future.result():
+                resolved[address] = data
+                txs[address] = address_txs
+
+        updated = time.time()
+        rows = [address_row(chain, address, resolved.get(address), updated) for chain, address in entries]
+        tx_rows = [row for chain, address in entries for row in transaction_rows(address, txs.get(address))]
+        return rows, tx_rows
+
+    # --- driver ---------------------------------------------------------------
+
+    def run(self):
+        """Process every unfinished chunk, then merge; returns the snapshot path"""
+        entries = iter_addresses(self.path)
+        began = time.perf_counter()
+        processed = skipped = failed = 0
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for index in itertools.count():
+                chunk = list(itertools.islice(entries, self.chunk_size))
+                if not chunk:
+                    break
+                existing = self._load_chunk(index)
+                if existing is not None and existing['ok'].all():
+                    skipped += len(chunk)
+                    continue
+
+                chunk_began = time.perf_counter()
+                if existing is None:
+                    rows, tx_rows = self._resolve_chunk(pool, chunk)
+                else:
+                    # Only retry the addresses that failed last time
+                    ok = existing['ok']
+                    todo = [entry for entry, done in zip(chunk, ok) if not done]
+                    retried, tx_rows = self._resolve_chunk(pool, todo)
+                    retried = iter(retried)
+                    kept = iter(self._rows(existing, ADDRESS_COLUMNS, ok))
+                    rows = [next(kept) if done else next(retried) for done in ok]
+                    done_addresses = set(existing['address'][ok].tolist())
+                    tx_rows = self._rows(existing, TX_COLUMNS, [a in done_addresses for a in
+                                                                existing.get('tx_address', [])]) + tx_rows
+                    skipped += len(chunk) - len(todo)
+                    chunk = todo
+                errors = sum(not row['ok'] for row in rows)
+                columns = to_columns(rows, ADDRESS_COLUMNS)
+                columns.update(to_columns(tx_rows, TX_COLUMNS))
+                temp = self._chunk_path(index) + '.tmp.npz'
+                np.savez(temp, **columns)
+                os.replace(temp, self._chunk_path(index))  # a chunk is either complete or absent
+
+                processed += len(chunk)
+                failed += errors
+                rate = len(chunk) / (time.perf_counter() - chunk_began)
+                print(f"chunk {index}: {len(chunk)} addresses, {errors} failed, {rate:.0f} addr/s")
+
+        elapsed = time.perf_counter() - began
+        print(f"Resolved {processed} addresses in {elapsed:.1f}s"
+              + (f", {skipped} already done from {self.work_dir}" if skipped else "")
+              + (f", {failed} failed" if failed else ""))
+        return self.finish()
+
+    def finish(self):
+        """Merge chunk files into the final snapshot and remove the work directory"""
+        chunks = sorted(f for f in os.listdir(self.work_dir) if f.startswith('chunk_') and f.endswith('.npz'))
+        parts = []
+        for name in chunks:
+            with np.load(os.path.join(self.work_dir, name)) as chunk:
+                parts.append({key: chunk[key] for key in chunk.files})
+        addresses = concat_columns(parts, ADDRESS_COLUMNS)
+        transactions = concat_columns(parts, TX_COLUMNS)
+
+        base = self.work_dir[:-len('.partial')]
+        if self.fmt == 'parquet':
+            import pandas as pd  # needs pyarrow or fastparquet
+
+            path = f"{base}.parquet"
+            pd.DataFrame(addresses).to_parquet(path, index=False)
+            pd.DataFrame(transactions).to_parquet(f"{base}.transactions.parquet", index=False)
+        else:
+            path = f"{base}.npz"
+            np.savez_compressed(path, **addresses, **transactions)
+
+        shutil.rmtree(self.work_dir)
+        failed = int((~addresses['ok'].astype(bool)).sum()) if len(addresses['ok']) else 0
+        print(f"Snapshot of {len(addresses['address'])} addresses and {len(transactions['tx_hash'])} "
+              f"transactions written to {path}" + (f" ({failed} unresolved)" if failed else ""))
+        return path
+
+
+def load_snapshot(path):
+    """Read an .npz snapshot back as (address columns, transaction columns)"""
+    with np.load(path) as data:
+        addresses = {name: data[name] for name in ADDRESS_COLUMNS if name in data.files}
+        transactions = {name: data[name] for name in TX_COLUMNS if name in data.files}
+    return addresses, transactions
+
+
+def main(argv=None, tracker=None):
+    parser = argparse.ArgumentParser(prog='crypto_tracker.py snapshot',
+                                     description="Write a balance snapshot for an address file")
+    parser.add_argument('path', help="CSV, JSON or JSON Lines address file")
+    parser.add_argument('--out', default=SNAPSHOT_DIR, help="output directory")
+    parser.add_argument('--workers', type=int, default=16, help="concurrent upstream requests")
+    parser.add_argument('--chunk-size', type=int, default=2000, help="addresses per checkpoint")
+    parser.add_argument('--txs', type=int, default=0,
+                        help="recent Bitcoin transactions to include per address (one request per address)")
+    parser.add_argument('--retries', type=int, default=2)
+    parser.add_argument('--format', choices=['npz', 'parquet'], default='npz')
+    parser.add_argument('--no-resume', action='store_true', help="start over even if an unfinished run exists")
+    args = parser.parse_args(argv)
+
+    if tracker is None:
+        from crypto_tracker import CryptoTracker
+        tracker = CryptoTracker()
+
+    job = SnapshotJob(tracker, args.path, args.out, args.workers, args.chunk_size, args.txs,
+                      args.retries, args.format, resume=not args.no_resume)
+    if job.resumed:
+        print(f"Resuming {job.work_dir}")
+    job.run()
+    return 0
@@ -0,0 +1,381 @@
+"""
+Concurrent-viewer load test
+Simulates browser sessions against the dashboard by replaying Dash's
+_dash-update-component protocol for every interval-triggered callback, and
+reports throughput, latency percentiles and server CPU / memory
+
+    python -m benchmarks.load_test --viewers 50 --duration 60
+    python -m benchmarks.load_test --viewers 200 --interval 30 --upstream-latency 0.2
+    python -m benchmarks.load_test --url http://dashboard:8050 --pid 1234   # existing server
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor, wait
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+INTERVAL_INPUT = ('interval-component', 'n_intervals')
+BROWSER_CONNECTIONS = 6  # parallel requests a browser makes to one host
+
+
+# --- server under test -------------------------------------------------------
+
+def serve(port, addresses, upstream_latency, threaded=True):
+    """Run app_enhanced against mock upstreams (used by the spawned server process)"""
+    from benchmarks.mock_upstreams import MockUpstreams
+    from benchmarks.run_benchmarks import bitcoin_addresses
+
+    os.environ.setdefault('TICK_DIR', tempfile.mkdtemp(prefix='load_ticks_'))
+    os.environ.setdefault('RESPONSE_CACHE_PATH',
+                          os.path.join(tempfile.mkdtemp(prefix='load_cache_'), 'responses.sqlite'))
+    upstreams = MockUpstreams(latency=upstream_latency).start()
+
+    from config import Config
+    Config.COINGECKO_BASE_URL = upstreams.coingecko_url
+    Config.BLOCKCHAIN_INFO_URL = upstreams.blockchain_info_url
+    Config.ETHEREUM_PROVIDER = upstreams.ethereum_url
+
+    import app_enhanced
+
+    # Realistic address table contents without refreshing them upstream
+    store = app_enhanced.tracker.balances['bitcoin']
+    store.set_many(bitcoin_addresses(addresses), [i * 1000 for i in range(addresses)])
+
+    app_enhanced.preload_deferred_imports()
+    app_enhanced.server.run(host='127.0.0.1', port=port, threaded=threaded, debug=False)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def spawn_server(addresses, upstream_latency):
+    port = free_port()
+    # The request log goes to a file: an unread pipe would fill up and stall the server
+    log = tempfile.NamedTemporaryFile(prefix='load_server_', suffix='.log', delete=False)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.load_test', '--serve', '--port', str(port),
+         '--addresses', str(addresses), '--upstream-latency', str(upstream_latency)],
+        cwd=ROOT, stdout=log, stderr=subprocess.STDOUT
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited, see {log.name}: {Path(log.name).read_text()[-2000:]}")
+        try:
+            requests.get(f"{url}/_dash-dependencies", timeout=1)
+            return process, url, log.name
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("server did not start within 60s")
+
+
+class ProcessSampler:
+    """CPU time and resident memory of a process, sampled in the background"""
+
+    def __init__(self, pid, period=0.5):
+        self.pid = pid
+        self.period = period
+        self.peak_rss_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._cpu_start = None
+        self._wall_start = None
+
+    def cpu_seconds(self):
+        try:
+            import psutil
+            times = psutil.Process(self.pid).cpu_times()
+            return times.user + times.system
+        except ImportError:
+            pass
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+    def rss_mb(self):
+        try:
+            import psutil
+            return psutil.Process(self.pid).memory_info().rss / 1e6
+        except ImportError:
+            pass
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1e3
+        return 0.0
+
+    def _run(self):
+        while not self._stop.wait(self.period):
+            try:
+                self.peak_rss_mb = max(self.peak_rss_mb, self.rss_mb())
+            except OSError:
+                return
+
+    def start(self):
+        self._cpu_start, self._wall_start = self.cpu_seconds(), time.perf_counter()
+        self.peak_rss_mb = self.rss_mb()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Return (average CPU %, peak RSS MB, final RSS MB)"""
+        self._stop.set()
+        cpu = self.cpu_seconds() - self._cpu_start
+        wall = time.perf_counter() - self._wall_start
+        final = self.rss_mb()
+        return cpu / wall * 100, max(self.peak_rss_mb, final), final
+
+
+# --- Dash protocol -----------------------------------------------------------
+
+def initial_props(layout):
+    """{(id, prop): value} for every component in a /_dash-layout tree"""
+    props = {}
+    stack = [layout]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict) and 'props' in node:
+            node_props = node['props']
+            if 'id' in node_props:
+                for prop, value in node_props.items():
+                    props[(node_props['id'], prop)] = value
+            for value in node_props.values():
+                if isinstance(value, (list, dict)):
+                    stack.append(value)
+    return props
+
+
+def interval_callbacks(dependencies):
+    """Callbacks fired by the refresh interval"""
+    return [dep for dep in dependencies
+            if any((i['id'], i['property']) == INTERVAL_INPUT for i in dep['inputs'])
+            and not dep.get('clientside_function')]
+
+
+def callback_payload(dep, props, n_intervals, initial):
+    """Request body a browser sends for one callback"""
+    def with_value(item):
+        key = (item['id'], item['property'])
+        value = n_intervals if key == INTERVAL_INPUT else props.get(key)
+        return {'id': item['id'], 'property': item['property'], 'value': value}
+
+    outputs = [{'id': part.rsplit('.', 1)[0], 'property': part.rsplit('.', 1)[1]}
+               for part in dep['output'].strip('.').split('...')]
+    return {
+        'output': dep['output'],
+        'outputs': outputs if dep['output'].startswith('..') else outputs[0],
+        'inputs': [with_value(i) for i in dep['inputs']],
+        'state': [with_value(s) for s in dep.get('state', [])],
+        'changedPropIds': [] if initial else ['.'.join(INTERVAL_INPUT)]
+    }
+
+
+class Results:
+    def __init__(self):
+        self.latencies = {}  # callback -> [seconds]
+        self.errors = {}
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds, ok, size):
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+            self.bytes += size
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+
+class Viewer:
+    """One simulated browser tab"""
+
+    def __init__(self, url, pool, results):
+        self.url = url
+        self.pool = pool
+        self.results = results
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=BROWSER_CONNECTIONS)
+        self.session.mount('http://', adapter)
+        self.n_intervals = 0
+
+    def open(self):
+        """Page load: index, layout, dependencies, then every callback's initial call"""
+        self.session.get(f"{self.url}/", timeout=30)
+        self.props = initial_props(self.session.get(f"{self.url}/_dash-layout", timeout=30).json())
+        self.callbacks = interval_callbacks(self.session.get(f"{self.url}/_dash-dependencies", timeout=30).json())
+        self.fire(initial=True)
+
+    def _call(self, dep, initial):
+        body = callback_payload(dep, self.props, self.n_intervals, initial)
+        began = time.perf_counter()
+        try:
+            response = self.session.post(f"{self.url}/_dash-update-component", json=body, timeout=60)
+            ok, size = response.status_code in (200, 204), len(response.content)
+            if response.status_code == 200:
+                # Like the browser: later calls send the updated props (e.g. render stores)
+                for component_id, values in response.json().get('response', {}).items():
+                    for prop, value in values.items():
+                        self.props[(component_id, prop)] = value
+        except requests.RequestException:
+            ok, size = False, 0
+        self.results.add(dep['output'], time.perf_counter() - began, ok, size)
+
+    def fire(self, initial=False):
+        """Send every interval callback in parallel, like the browser does"""
+        futures = [self.pool.submit(self._call, dep, initial) for dep in self.callbacks]
+        wait(futures)
+
+    def tick(self):
+        self.n_intervals += 1
+        self.fire()
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def run_load(url, viewers, duration, interval, ramp_up):
+    results = Results()
+    pool = ThreadPoolExecutor(max_workers=viewers * BROWSER_CONNECTIONS)
+    stop = threading.Event()
+
+    def session(index):
+        time.sleep(ramp_up * index / max(viewers, 1))
+        viewer = Viewer(url, pool, results)
+        try:
+            viewer.open()
+        except requests.RequestException as e:
+            results.add('page_load', 0.0, False, 0)
+            print(f"viewer {index} failed to load: {e}")
+            return
+        # Browsers start their interval timers at different moments
+        next_tick = time.perf_counter() + random.uniform(0, interval)
+        while not stop.wait(max(0.0, next_tick - time.perf_counter())):
+            viewer.tick()
+            next_tick += interval
+
+    began = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(i,), daemon=True) for i in range(viewers)]
+    for thread in threads:
+        thread.start()
+    stop.wait(duration)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=60)
+    pool.shutdown(wait=True)
+    return results, time.perf_counter() - began
+
+
+def report(results, elapsed, usage, viewers, interval):
+    all_latencies = [s for values in results.latencies.values() for s in values]
+    total = len(all_latencies)
+    errors = sum(results.errors.values())
+
+    def line(name, values, errs):
+        p = [percentile(values, q) for q in (50, 90, 95, 99)]
+        return (f"{name[:60]:<60}{len(values):>8}{errs:>7}" +
+                ''.join(f"{v * 1000:>9.1f}" for v in p) + f"{max(values) * 1000:>9.1f}")
+
+    print(f"\n{viewers} viewers, {interval:g}s interval, {elapsed:.1f}s")
+    print(f"{'callback':<60}{'calls':>8}{'errors':>7}{'p50 ms':>9}{'p90 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for name, values in sorted(results.latencies.items()):
+        print(line(name, values, results.errors.get(name, 0)))
+    if all_latencies:
+        print(line('ALL', all_latencies, errors))
+
+    summary = {
+        'viewers': viewers,
+        'requests': total,
+        'errors': errors,
+        'requests_per_s': total / elapsed if elapsed else 0.0,
+        'kb_per_s': results.bytes / 1e3 / elapsed if elapsed else 0.0,
+        'p50_ms': (percentile(all_latencies, 50) or 0) * 1000,
+        'p95_ms': (percentile(all_latencies, 95) or 0) * 1000,
+        'p99_ms': (percentile(all_latencies, 99) or 0) * 1000,
+    }
+    if usage:
+        summary['server_cpu_pct'], summary['server_peak_rss_mb'], summary['server_rss_mb'] = usage
+    print(f"\nthroughput {summary['requests_per_s']:.1f} req/s, {summary['kb_per_s']:.1f} kB/s, "
+          f"error rate {errors / total if total else 0:.2%}")
+    # Each viewer sends every interval callback once per tick
+    callbacks = len([name for name in results.latencies if name != 'page_load'])
+    summary['offered_per_s'] = viewers * callbacks / interval
+    print(f"offered {summary['offered_per_s']:.1f} req/s by {viewers} viewers x {callbacks} callbacks"
+          + (" -> server saturated, add workers" if summary['requests_per_s'] < 0.9 * summary['offered_per_s'] else ""))
+    if usage:
+        print(f"server CPU {usage[0]:.0f}% of one core, peak RSS {usage[1]:.0f} MB")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate concurrent dashboard viewers")
+    parser.add_argument('--viewers', type=int, default=20, help="concurrent browser sessions")
+    parser.add_argument('--duration', type=float, default=30, help="seconds to run after starting")
+    parser.add_argument('--interval', type=float, default=None,
+                        help="seconds between interval ticks (default UPDATE_INTERVAL)")
+    parser.add_argument('--ramp-up', type=float, default=5, help="seconds over which viewers open the page")
+    parser.add_argument('--url', help="test an already running server instead of spawning one")
+    parser.add_argument('--pid', type=int, help="process to sample CPU / memory of with --url")
+    parser.add_argument('--addresses', type=int, default=1000, help="rows in the spawned server's address table")
+    parser.add_argument('--upstream-latency', type=float, default=0.0, help="mock upstream latency in seconds")
+    parser.add_argument('--json', help="also write the summary to this file")
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, default=8050, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve(args.port, args.addresses, args.upstream_latency)
+        return 0
+
+    if args.interval is None:
+        from config import Config
+        args.interval = Config.UPDATE_INTERVAL / 1000
+
+    process = None
+    if args.url:
+        url, pid = args.url.rstrip('/'), args.pid
+    else:
+        process, url, log_path = spawn_server(args.addresses, args.upstream_latency)
+        pid = process.pid
+        print(f"Dashboard with mock upstreams at {url} (pid {pid}, log {log_path})")
+
+    try:
+        sampler = ProcessSampler(pid).start() if pid else None
+        results, elapsed = run_load(url, args.viewers, args.duration, args.interval, args.ramp_up)
+        usage = sampler.stop() if sampler else None
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+    summary = report(results, elapsed, usage, args.viewers, args.interval)
+    if args.json:
+        Path(args.json).write_text(json.dumps(summary, indent=2) + '\n')
+    return 1 if summary['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,298 @@
+"""
+Local stand-ins for the upstream APIs
+CoinGecko simple/price, blockchain.info rawaddr / multiaddr and an Ethereum
+JSON-RPC node, with configurable latency, error rate and payload size
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import json
+import random
+import threading
+import time
+import zlib
+
+
+def address_seed(address):
+    """Deterministic per-address number so balances are stable across runs"""
+    return zlib.crc32(address.lower().encode())
+
+
+def make_transaction(address, index):
+    """A rawaddr-shaped transaction (roughly 600 bytes of JSON)"""
+    seed = address_seed(address) + index
+    return {
+        'hash': f"{seed:064x}",
+        'ver': 1,
+        'vin_sz': 1,
+        'vout_sz': 2,
+        'size': 225,
+        'weight': 900,
+        'fee': 1000 + index,
+        'time': 1700000000 - index * 600,
+        'block_height': 800000 - index,
+        'result': (seed % 200000) - 100000,
+        'balance': seed % 10 ** 9,
+        'inputs': [{'prev_out': {'addr': f"1Input{seed % 99991}", 'value': seed % 10 ** 8,
+                                 'spent': True, 'n': 0}}],
+        'out': [
+            {'addr': address, 'value': seed % 10 ** 7, 'spent': False, 'n': 0},
+            {'addr': f"1Change{seed % 99991}", 'value': seed % 10 ** 6, 'spent': False, 'n': 1}
+        ]
+    }
+
+
+class MockState:
+    """Knobs shared by every handler, adjustable while the server runs"""
+
+    def __init__(self, latency=0.0, error_rate=0.0, txs_per_address=10, seed=42):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.txs_per_address = txs_per_address
+        # Send every transaction whatever ?limit= asks, like a heavy address behind
+        # a server or proxy that does not honour it
+        self.ignore_limit = False
+        self.bodies = {}  # memoized heavy rawaddr responses
+        self.random = random.Random(seed)
+        self.block_number = 19000000
+        self.btc_height = 800000
+        self.btc_blocks = {}  # height -> (addresses paid, filler transactions)
+        self.requests = {}
+        self._lock = threading.Lock()
+
+    def count(self, provider):
+        with self._lock:
+            self.requests[provider] = self.requests.get(provider, 0) + 1
+
+    def mine_block(self, addresses=(), txs=2000):
+        """Add a Bitcoin block paying ``addresses`` among ``txs`` other transactions"""
+        with self._lock:
+            self.btc_height += 1
+            self.btc_blocks[self.btc_height] = (list(addresses), txs)
+            return self.btc_height
+
+    def should_fail(self):
+        with self._lock:
+            return self.random.random() < self.error_rate
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # headers and body are separate writes on keep-alive sockets
+    state = None  # set on the per-server subclass
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle(self):
+        try:
+            super().handle()
+        except (ConnectionResetError, BrokenPipeError):
+            pass  # streaming clients drop the connection once they have read enough
+
+    def _send(self, status, payload):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _prelude(self, provider):
+        """Apply latency / errors; returns False if an error was sent"""
+        self.state.count(provider)
+        if self.state.latency:
+            time.sleep(self.state.latency)
+        if self.state.should_fail():
+            self._send(500, {'error': 'injected failure'})
+            return False
+        return True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        if url.path.endswith('/simple/price'):
+            if self._prelude('coingecko'):
+                self._send(200, self.simple_price(query))
+        elif '/rawaddr/' in url.path:
+            if self._prelude('blockchain.info'):
+                address = url.path.rsplit('/', 1)[1]
+                limit = int(query.get('limit', [50])[0])
+                offset = int(query.get('offset', [0])[0])
+                self._send(200, self.rawaddr_body(address, limit, offset))
+        elif url.path.endswith('/latestblock'):
+            if self._prelude('blockchain.info'):
+                height = self.state.btc_height
+                self._send(200, {'hash': f"{height:064x}", 'height': height, 'time': int(time.time())})
+        elif '/rawblock/' in url.path:
+            if self._prelude('blockchain.info'):
+                self._send(200, self.rawblock(int(url.path.rsplit('/', 1)[1], 16)))
+        elif url.path.endswith('/multiaddr'):
+            if self._prelude('blockchain.info'):
+                addresses = query.get('active', [''])[0].split('|')
+                self._send(200, {'addresses': [self.summary(a) for a in addresses if a]})
+        else:
+            self._send(404, {'error': 'not found'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        if not self._prelude('ethereum'):
+            return
+        if isinstance(request, list):
+            self._send(200, [self.rpc(item) for item in request])
+        else:
+            self._send(200, self.rpc(request))
+
+    # --- CoinGecko -------------------------------------------------------
+
+    def simple_price(self, query):
+        ids = query.get('ids', [''])[0].split(',')
+        currencies = query.get('vs_currencies', ['usd'])[0].split(',')
+        result = {}
+        for coin in ids:
+            base = 1 + address_seed(coin) % 50000
+            quote = {}
+            for i, currency in enumerate(currencies):
+                price = base * (1 + 0.1 * i) * (1 + self.state.random.uniform(-0.001, 0.001))
+                quote[currency] = price
+                quote[f"{currency}_24h_change"] = self.state.random.uniform(-5, 5)
+                quote[f"{currency}_market_cap"] = price * 19e6
+                quote[f"{currency}_24h_vol"] = price * 1e5
+            result[coin] = quote
+        return result
+
+    # --- blockchain.info -------------------------------------------------
+
+    def summary(self, address):
+        seed = address_seed(address)
+        received = seed * 1000
+        sent = received // 3
+        return {
+            'address': address,
+            'n_tx': self.state.txs_per_address,
+            'total_received': received,
+            'total_sent': sent,
+            'final_balance': received - sent
+        }
+
+    def rawaddr_body(self, address, limit, offset):
+        """Encoded rawaddr response; heavy ones are memoized so only the first costs the server"""
+        key = (address, limit, offset, self.state.txs_per_address, self.state.ignore_limit)
+        body = self.state.bodies.get(key)
+        if body is None:
+            body = json.dumps(self.rawaddr(address, limit, offset)).encode()
+            if len(body) > 64 * 1024:
+                self.state.bodies[key] = body
+        return body
+
+    def rawaddr(self, address, limit, offset):
+        data = self.summary(address)
+        data['hash160'] = f"{address_seed(address):040x}"
+        data['n_unredeemed'] = 1
+        if self.state.ignore_limit:
+            limit = self.state.txs_per_address
+        count = max(0, min(limit, self.state.txs_per_address - offset))
+        data['txs'] = [make_transaction(address, offset + i) for i in range(count)]
+        return data
+
+    def rawblock(self, height):
+        addresses, txs = self.state.btc_blocks.get(height, ((), 0))
+        return {
+            'hash': f"{height:064x}",
+            'prev_block': f"{height - 1:064x}",
+            'height': height,
+            'n_tx': len(addresses) + txs,
+            'tx': [make_transaction(address, height) for address in addresses] +
+                  [make_transaction(f"1Mock{height}x{i}", 0) for i in range(txs)]
+        }
+
+    # --- Ethereum JSON-RPC -----------------------------------------------
+
+    def rpc(self, request):
+        method = request.get('method')
+        params = request.get('params', [])
+        result = None
+        if method == 'eth_chainId' or method == 'net_version':
+            result = '0x1' if method == 'eth_chainId' else '1'
+        elif method == 'eth_blockNumber':
+            result = hex(self.state.block_number)
+        elif method == 'eth_getBalance':
+            result = hex(address_seed(params[0]) * 10 ** 12)
+        elif method == 'eth_call':
+            result = '0x' + f"{address_seed(params[0].get('data', '')[-40:]) * 10 ** 6:064x}"
+        elif method == 'eth_getBlockByNumber':
+            result = {'number': hex(self.state.block_number), 'hash': '0x' + '00' * 32,
+                      'timestamp': hex(int(time.time())), 'transactions': []}
+        else:
+            return {'jsonrpc': '2.0', 'id': request.get('id'),
+                    'error': {'code': -32601, 'message': f"method {method} not supported"}}
+        return {'jsonrpc': '2.0', 'id': request.get('id'), 'result': result}
+
+
+class MockUpstreams:
+    """Runs the mock server in a background thread
+
+    Use as a context manager; ``coingecko_url``, ``blockchain_info_url`` and
+    ``ethereum_url`` point the tracker and price feed at it.
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, txs_per_address=10, host='127.0.0.1', port=0):
+        self.state = MockState(latency, error_rate, txs_per_address)
+        handler = type('BoundMockHandler', (MockHandler,), {'state': self.state})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def coingecko_url(self):
+        return f"{self.base_url}/api/v3"
+
+    @property
+    def blockchain_info_url(self):
+        return f"{self.base_url}/rawaddr/"
+
+    @property
+    def ethereum_url(self):
+        return f"{self.base_url}/eth"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve mock CoinGecko / blockchain.info / Ethereum RPC")
+    parser.add_argument('--port', type=int, default=8545)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with HTTP 500")
+    parser.add_argument('--txs', type=int, default=10, help="transactions per address in rawaddr payloads")
+    args = parser.parse_args()
+
+    upstreams = MockUpstreams(args.latency, args.error_rate, args.txs, port=args.port).start()
+    print(f"CoinGecko:        COINGECKO_BASE_URL={upstreams.coingecko_url}")
+    print(f"blockchain.info:  BLOCKCHAIN_INFO_URL={upstreams.blockchain_info_url}")
+    print(f"Ethereum RPC:     ETHEREUM_PROVIDER={upstreams.ethereum_url}")
+    try:
+        upstreams.thread.join()
+    except KeyboardInterrupt:
+        upstreams.stop()
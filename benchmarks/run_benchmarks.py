@@ -0,0 +1,340 @@
+"""
+Offline benchmark suite
+Runs the tracker, price feed and address table against local mock upstreams
+and compares the results with stored baselines
+
+    python -m benchmarks.run_benchmarks                      # compare with baseline.json
+    python -m benchmarks.run_benchmarks --save-baseline      # record new baselines
+    python -m benchmarks.run_benchmarks --sizes 10,1000,100000 --latency 0.02
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Keep benchmark ticks out of the real data directory
+os.environ.setdefault('TICK_DIR', tempfile.mkdtemp(prefix='bench_ticks_'))
+os.environ.setdefault('RESPONSE_CACHE_PATH',
+                      os.path.join(tempfile.mkdtemp(prefix='bench_cache_'), 'responses.sqlite'))
+
+from benchmarks.mock_upstreams import MockUpstreams  # noqa: E402
+
+BASELINE_FILE = Path(__file__).with_name('baseline.json')
+IMPORT_BUDGET_S = 1.5
+# Stock-library paths measured only for comparison: reported, never baselined or gated
+REFERENCE_METRICS = ('rawaddr_full_', 'serialize_figure_json_', 'serialize_api_json_')
+
+
+def bitcoin_addresses(n):
+    return [f"1Bench{i:028d}" for i in range(n)]
+
+
+def ethereum_addresses(n):
+    from web3 import Web3  # web3 6 only accepts checksummed addresses
+    return [Web3.to_checksum_address(f"0x{i + 1:040x}") for i in range(n)]
+
+
+def measure(fn):
+    """Run fn once, returning (result, seconds, peak traced MB)"""
+    tracemalloc.start()
+    began = time.perf_counter()
+    try:
+        result = fn()
+    finally:
+        elapsed = time.perf_counter() - began
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return result, elapsed, peak / 1e6
+
+
+def bench_price_feed(upstreams, coins=300, currencies=5):
+    from price_feed import PriceFeed
+
+    feed = PriceFeed(base_url=upstreams.coingecko_url)
+    coin_ids = [f"coin-{i}" for i in range(coins)]
+    fiats = ['usd', 'eur', 'gbp', 'jpy', 'chf'][:currencies]
+    before = upstreams.state.requests.get('coingecko', 0)
+    table, seconds, peak = measure(lambda: feed.fetch(coin_ids, fiats))
+    # Counted rather than asserted: with --error-rate some chunks fail
+    fetched = len(table.coins) if table is not None else 0
+    return {
+        'price_fetch_s': seconds,
+        'price_fetch_mb': peak,
+        'price_fetch_requests': upstreams.state.requests.get('coingecko', 0) - before,
+        'price_fetch_coins': fetched,
+        'price_fetch_missing': coins - fetched
+    }
+
+
+def bench_refresh(upstreams, size, eth_fraction=0.1):
+    """Refresh ``size`` addresses (mostly BTC, batched) through CryptoTracker"""
+    from crypto_tracker import CryptoTracker
+    from node_backends import BlockchainInfoBackend
+
+    n_eth = int(size * eth_fraction) if size >= 10 else 0
+    entries = ([('bitcoin', a) for a in bitcoin_addresses(size - n_eth)] +
+               [('ethereum', a) for a in ethereum_addresses(n_eth)])
+
+    tracker = CryptoTracker(
+        bitcoin_backend=BlockchainInfoBackend(base_url=upstreams.blockchain_info_url),
+        web3_provider=upstreams.ethereum_url
+    )
+    tracker.w3  # connect outside the timed section
+
+    results, seconds, peak = measure(lambda: tracker.refresh_addresses(entries))
+    # Counted rather than asserted: with --error-rate some addresses fail to refresh
+    return {
+        f"refresh_{size}_s": seconds,
+        f"refresh_{size}_per_s": size / seconds,
+        f"refresh_{size}_mb": peak,
+        f"refresh_{size}_ok": len(results),
+        f"refresh_{size}_errors": size - len(results),
+        f"store_{size}_mb": sum(store.nbytes for store in tracker.balances.values()) / 1e6
+    }
+
+
+def bench_rawaddr(upstreams, txs=2000, limit=10, runs=3):
+    """Recent transactions of a heavy address: full response.json() against the streaming parser"""
+    import requests
+
+    from node_backends import BlockchainInfoBackend
+
+    backend = BlockchainInfoBackend(base_url=upstreams.blockchain_info_url)
+    address = bitcoin_addresses(1)[0]
+    url = f"{upstreams.blockchain_info_url}{address}"
+    session = requests.Session()
+
+    def full():
+        response = session.get(url, params={'limit': limit}, timeout=30)
+        return response.json()['txs'][:limit] if response.ok else None
+
+    def stream():
+        # The backend returns [] when the request failed
+        return backend.get_transactions(address, limit=limit) or None
+
+    state = upstreams.state
+    saved = state.txs_per_address, state.ignore_limit
+    state.txs_per_address, state.ignore_limit = txs, True
+    try:
+        full()  # let the mock encode the heavy body once, outside the measurements
+        full_runs = [measure(full) for _ in range(runs)]
+        stream_runs = [measure(stream) for _ in range(runs)]
+    finally:
+        state.txs_per_address, state.ignore_limit = saved
+
+    # Only successful runs are timed and compared; with --error-rate some fail
+    full_ok = [run for run in full_runs if run[0] is not None]
+    stream_ok = [run for run in stream_runs if run[0] is not None]
+    for (full_txs, _, _), (stream_txs, _, _) in zip(full_ok, stream_ok):
+        assert [tx['hash'] for tx in full_txs] == [tx['hash'] for tx in stream_txs]
+    results = {'rawaddr_errors': 2 * runs - len(full_ok) - len(stream_ok)}
+    if full_ok:
+        results['rawaddr_full_s'] = min(run[1] for run in full_ok)
+        results['rawaddr_full_mb'] = min(run[2] for run in full_ok)
+    if stream_ok:
+        results['rawaddr_stream_s'] = min(run[1] for run in stream_ok)
+        results['rawaddr_stream_mb'] = min(run[2] for run in stream_ok)
+    return results
+
+
+def bench_address_table(size):
+    """Cold (frame build) and warm (cached frame) page queries over ``size`` rows"""
+    import pandas  # noqa: F401  imported up front so the cold run times the frame build only
+
+    from address_table import AddressTableSource
+    from balance_store import BalanceStore
+
+    store = BalanceStore('bitcoin', decimals=8, capacity=size)
+    store.set_many(bitcoin_addresses(size), [i * 1000 for i in range(size)])
+    source = AddressTableSource({'bitcoin': store})
+    prices = {'bitcoin': 50000.0}
+    query = dict(page_current=3, page_size=20,
+                 sort_by=[{'column_id': 'balance', 'direction': 'desc'}],
+                 filter_query='{balance} > 0.001')
+
+    def cold():
+        source._key = None  # force the frame to be rebuilt
+        return source.page(prices, **query)
+
+    # Best of several runs: single page queries are only a few milliseconds
+    cold_s = min(measure(cold)[1] for _ in range(5))
+    warm_s = min(measure(lambda: source.page(prices, **query))[1] for _ in range(5))
+    return {f"table_{size}_cold_s": cold_s, f"table_{size}_warm_s": warm_s}
+
+
+def bench_serialization(points=5000, coins=300, runs=5):
+    """Stock plotly / Flask JSON encoders against fast_json for a chart response and an API body"""
+    import numpy as np
+    import pandas as pd
+    import plotly.graph_objs as go
+    from dash import dcc
+    from flask import Flask
+    import plotly.io.json as plotly_json
+
+    import fast_json
+
+    dates = pd.date_range('2024-01-01', periods=points, freq='h')
+    rng = np.random.default_rng(0)
+    figure = go.Figure([go.Scatter(x=dates, y=rng.random(points).cumsum(), name=name)
+                        for name in ('bitcoin', 'ethereum', 'portfolio')])
+    # Callbacks return figures on their own or inside components
+    response = {'response': {'chart': {'figure': figure, 'children': dcc.Graph(figure=figure)}}}
+    body = {f"coin-{i}": {'price': float(i), 'change_24h': -1.5, 'market_cap': 1e9 * i,
+                          'volume_24h': None} for i in range(coins)}
+
+    def best(fn):
+        # Timed without tracemalloc, which would dominate allocation-heavy encoding
+        timings = []
+        for _ in range(runs):
+            began = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - began)
+        return min(timings)
+
+    stock_app = Flask('bench_stock')
+    results = {
+        'serialize_figure_json_s': best(lambda: plotly_json.to_json_plotly(response, engine='json')),
+        'serialize_api_json_s': best(lambda: stock_app.json.dumps(body))
+    }
+    if fast_json.orjson is not None:
+        fast_app = Flask('bench_fast')
+        fast_app.json = fast_json.OrjsonProvider(fast_app)
+        results['serialize_figure_fast_s'] = best(lambda: fast_json.dumps(response, html_safe=True))
+        results['serialize_api_fast_s'] = best(lambda: fast_app.json.dumps(body))
+    return results
+
+
+def bench_import_time(module='app_enhanced', runs=3):
+    """Best-of-N import time of the dashboard in a fresh interpreter"""
+    code = (f"import time; t = time.perf_counter(); import {module}; "
+            f"print(time.perf_counter() - t)")
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True,
+                                text=True, check=True, env=os.environ.copy())
+        timings.append(float(output.stdout.strip().splitlines()[-1]))
+    return {f"import_{module}_s": min(timings)}
+
+
+def run_suite(sizes, latency=0.0, error_rate=0.0, txs=10):
+    results = {}
+    with MockUpstreams(latency=latency, error_rate=error_rate, txs_per_address=txs) as upstreams:
+        print(f"Mock upstreams at {upstreams.base_url}")
+        results.update(bench_price_feed(upstreams))
+        for size in sizes:
+            print(f"  refreshing {size} addresses...")
+            results.update(bench_refresh(upstreams, size))
+        results.update(bench_rawaddr(upstreams))
+        results['upstream_requests'] = dict(upstreams.state.requests)
+    for size in sizes:
+        results.update(bench_address_table(size))
+    results.update(bench_serialization())
+    results.update(bench_import_time())
+    return results
+
+
+def is_reference(metric):
+    return metric.startswith(REFERENCE_METRICS)
+
+
+def lower_is_better(metric):
+    return metric.endswith('_s') or metric.endswith('_mb')
+
+
+def compare(results, baseline, tolerance, min_delta=0.005):
+    """Return the metrics that regressed by more than ``tolerance`` (a fraction)
+
+    Timings that moved by less than ``min_delta`` seconds are treated as noise.
+    """
+    regressions = []
+    for metric, value in results.items():
+        if is_reference(metric):
+            continue
+        old = baseline.get(metric)
+        if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+            continue
+        if metric.endswith('_per_s'):
+            worse = value < old * (1 - tolerance)
+        elif lower_is_better(metric):
+            worse = value > old * (1 + tolerance)
+            if metric.endswith('_s') and value - old < min_delta:
+                worse = False
+        else:
+            continue
+        if worse:
+            regressions.append((metric, old, value))
+    return regressions
+
+
+def print_results(results, baseline):
+    print(f"\n{'metric':<32}{'value':>14}{'baseline':>14}{'change':>10}")
+    for metric, value in results.items():
+        if not isinstance(value, (int, float)):
+            continue
+        old = baseline.get(metric)
+        change = f"{(value - old) / old * 100:+.1f}%" if isinstance(old, (int, float)) and old else ''
+        old_text = f"{old:.4f}" if isinstance(old, (int, float)) else '-'
+        print(f"{metric:<32}{value:>14.4f}{old_text:>14}{change:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline CryptoTracker benchmarks")
+    parser.add_argument('--sizes', default='10,100,1000',
+                        help="comma-separated address counts (up to 100000)")
+    parser.add_argument('--latency', type=float, default=0.0, help="mock upstream latency in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of upstream requests that fail")
+    parser.add_argument('--txs', type=int, default=10, help="transactions per rawaddr payload")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed slowdown before a metric counts as a regression")
+    parser.add_argument('--baseline', default=str(BASELINE_FILE))
+    parser.add_argument('--save-baseline', action='store_true', help="write results as the new baseline")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    results = run_suite(sizes, args.latency, args.error_rate, args.txs)
+
+    baseline_path = Path(args.baseline)
+    baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+    print_results(results, baseline)
+
+    failed = False
+    import_time = results['import_app_enhanced_s']
+    if import_time > IMPORT_BUDGET_S:
+        print(f"\n❌ app_enhanced import took {import_time:.2f}s (budget {IMPORT_BUDGET_S}s)")
+        failed = True
+
+    # Without injected errors every upstream request should succeed
+    failures = {metric: value for metric, value in results.items()
+                if metric.endswith(('_errors', '_missing')) and value}
+    if failures and not args.error_rate:
+        for metric, value in failures.items():
+            print(f"❌ {metric}: {value} with no injected errors")
+        failed = True
+
+    if args.save_baseline:
+        # Merge so runs with different --sizes keep each other's baselines
+        baseline.update((metric, value) for metric, value in results.items() if not is_reference(metric))
+        baseline_path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+        print(f"\n💾 Baseline written to {baseline_path}")
+    elif baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        for metric, old, new in regressions:
+            print(f"❌ {metric} regressed: {old:.4f} -> {new:.4f}")
+        failed = failed or bool(regressions)
+        if not regressions:
+            print(f"\n✅ No regressions beyond {args.tolerance:.0%}")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Change detection for Dash callbacks
+Each change-detected callback keeps the fingerprint of its last render in a
+per-client dcc.Store. On an interval tick it first compares a cheap snapshot
+version of its inputs (e.g. the prices or balance store versions it reads)
+and skips the work entirely if nothing changed, then compares a content hash
+of what it rendered, so identical figures and rows are never resent. When
+every output is ``dash.no_update`` Dash answers with an empty 204 response
+and the browser does not re-render.
+"""
+
+import functools
+import hashlib
+
+from dash import Output, State, dcc, no_update
+import plotly.io.json as plotly_json
+
+from metrics import REGISTRY
+
+RENDERS_SKIPPED = REGISTRY.counter(
+    'dash_renders_skipped_total', "Callback renders skipped because nothing changed",
+    ('callback', 'reason'))
+
+
+def fingerprint(value):
+    """Short content hash of anything a callback can return (figures, components, numpy)"""
+    # Looked up at call time so the orjson encoder is used once installed
+    text = plotly_json.to_json_plotly(value)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class ChangeDetector:
+    """Registers Dash callbacks that return ``no_update`` when their render would not change
+
+    Callback inputs other than the interval's ``n_intervals`` (page, sort,
+    selected portfolio, ...) are always part of the snapshot key.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.store_ids = []
+
+    def callback(self, outputs, inputs, version=None):
+        """Decorator like ``app.callback(outputs, inputs)``
+
+        ``version`` is an optional callable, called with the callback's
+        arguments, returning a snapshot of the data the callback renders;
+        while it (and the non-interval inputs) are unchanged since the
+        client's last render the callback body is not run at all.
+        """
+        single = not isinstance(outputs, (list, tuple))
+        outputs = [outputs] if single else list(outputs)
+        inputs = list(inputs) if isinstance(inputs, (list, tuple)) else [inputs]
+        keyed = [i for i, dep in enumerate(inputs) if dep.component_property != 'n_intervals']
+        skipped = [no_update] * len(outputs)
+
+        def decorator(func):
+            name = func.__name__
+            store_id = f"{name.replace('_', '-')}-rendered"
+            self.store_ids.append(store_id)
+
+            @functools.wraps(func)
+            def wrapper(*args):
+                *args, rendered = args
+                rendered = rendered or {}
+                key = None
+                if version is not None:
+                    key = fingerprint([[args[i] for i in keyed], version(*args)])
+                    if key == rendered.get('key'):
+                        RENDERS_SKIPPED.inc(name, 'snapshot')
+                        return skipped + [no_update]
+
+                result = func(*args)
+                values = [result] if single else list(result)
+                digest = fingerprint(values)
+                state = {'key': key, 'hash': digest}
+                if digest == rendered.get('hash'):
+                    RENDERS_SKIPPED.inc(name, 'content')
+                    return skipped + [state]
+                return values + [state]
+
+            self.app.callback(outputs + [Output(store_id, 'data')], inputs,
+                              [State(store_id, 'data')])(wrapper)
+            return func
+
+        return decorator
+
+    def stores(self):
+        """dcc.Store components holding each client's last render fingerprints"""
+        return [dcc.Store(id=store_id) for store_id in self.store_ids]
@@ -1,6 +1,8 @@
 import os
 from dotenv import load_dotenv
 
+from address_loader import parse_address_list
+
 load_dotenv()
 
 class Config:
@@ -12,29 +14,123 @@ class Config:
     ETHERSCAN_API_KEY = os.getenv('ETHERSCAN_API_KEY', 'YourEtherscanAPIKey')
     INFURA_PROJECT_ID = os.getenv('INFURA_PROJECT_ID', '9aa3d95b3bc440fa88ea12eaa4456161')
     
-    # Crypto addresses to track (replace with your real addresses)
-    BITCOIN_ADDRESSES = [
+    # Crypto addresses to track (comma separated in .env, samples otherwise)
+    BITCOIN_ADDRESSES = parse_address_list(os.getenv('BITCOIN_ADDRESSES')) or [
         '1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa',  # Genesis block address (sample)
         '3J98t1WpEZ73CNmQviecrnyiWrnqRhWNLy'   # Another sample address
     ]
     
-    ETHEREUM_ADDRESSES = [
+    ETHEREUM_ADDRESSES = parse_address_list(os.getenv('ETHEREUM_ADDRESSES')) or [
         '0x742d35Cc6634C0532925a3b8D4C9db96C4b4d8b6',  # Sample address
         '0x1234567890123456789012345678901234567890'     # Another sample address
     ]
     
+    # Large address sets are streamed from CSV / JSON / JSON Lines files
+    # (comma separated list of paths, chain detected per row or by address format)
+    ADDRESS_FILES = parse_address_list(os.getenv('ADDRESS_FILES'))
+    
+    # HD wallets: account-level xpub / ypub / zpub keys (comma separated) whose
+    # receive and change addresses are discovered up to the gap limit
+    HD_WALLETS = parse_address_list(os.getenv('HD_WALLETS'))
+    HD_GAP_LIMIT = int(os.getenv('HD_GAP_LIMIT', '20'))
+    HD_SCAN_WORKERS = int(os.getenv('HD_SCAN_WORKERS', '4'))
+    HD_RESCAN_INTERVAL = float(os.getenv('HD_RESCAN_INTERVAL', '600'))  # seconds
+    HD_STATE_PATH = os.getenv('HD_STATE_PATH', os.path.join('data', 'hd_wallets.json'))
+    
+    # Portfolios of many users (JSON file); the dashboard shows the one named by
+    # ?portfolio=<id>, or the 'default' portfolio of the addresses above
+    PORTFOLIOS_FILE = os.getenv('PORTFOLIOS_FILE', '')
+    
     # Dashboard settings
-    UPDATE_INTERVAL = 30000  # 30 seconds
-    CHART_DAYS = 365  # Number of days for historical charts
+    UPDATE_INTERVAL = int(os.getenv('UPDATE_INTERVAL', '30000'))  # 30 seconds
+    CHART_DAYS = int(os.getenv('CHART_DAYS', '365'))  # Number of days for historical charts
+    
+    # Local price tick history (memory-mapped ring buffers, one file per asset)
+    TICK_DIR = os.getenv('TICK_DIR', os.path.join('data', 'ticks'))
+    TICK_CAPACITY = int(os.getenv('TICK_CAPACITY', '8640'))  # 3 days of 30 s ticks
+    TICK_MIN_SPACING = float(os.getenv('TICK_MIN_SPACING', '10'))  # seconds between stored ticks
+    
+    # JSON encoder for Dash callback responses and /api routes: 'auto' uses
+    # orjson when installed, 'json' keeps the stock plotly / Flask encoders
+    JSON_ENGINE = os.getenv('JSON_ENGINE', 'auto').lower()
+    
+    # Persistent response cache (SQLite, WAL mode) read at startup so a restart
+    # serves the last known prices and balances without an upstream burst.
+    # TTLs are how long a cached response is served instead of calling upstream;
+    # the price TTL stays below UPDATE_INTERVAL so each tick fetches once and
+    # the other callbacks of that tick share the result.
+    RESPONSE_CACHE = os.getenv('RESPONSE_CACHE', 'True').lower() == 'true'
+    RESPONSE_CACHE_PATH = os.getenv('RESPONSE_CACHE_PATH', os.path.join('data', 'cache', 'responses.sqlite'))
+    CACHE_TTL_PRICES = float(os.getenv('CACHE_TTL_PRICES', '20'))  # seconds
+    CACHE_TTL_BALANCES = float(os.getenv('CACHE_TTL_BALANCES', '25'))
+    CACHE_TTL_TRANSACTIONS = float(os.getenv('CACHE_TTL_TRANSACTIONS', '300'))
+    CACHE_MAX_AGE = float(os.getenv('CACHE_MAX_AGE', '604800'))  # entries purged after 7 days
+    
+    # Addresses are split into shards refreshed one after another across UPDATE_INTERVAL
+    REFRESH_SHARDS = int(os.getenv('REFRESH_SHARDS', '10'))
+    
+    # 'sharded' refreshes every address once per interval, 'activity' polls
+    # active addresses often and backs off exponentially on dormant ones
+    REFRESH_MODE = os.getenv('REFRESH_MODE', 'sharded').lower()
+    REFRESH_MIN_INTERVAL = float(os.getenv('REFRESH_MIN_INTERVAL', '30'))  # seconds
+    REFRESH_MAX_INTERVAL = float(os.getenv('REFRESH_MAX_INTERVAL', '21600'))  # 6 hours
+    REFRESH_BACKOFF = float(os.getenv('REFRESH_BACKOFF', '2'))
+    
+    # 'block' refreshes Ethereum balances only when a new block lands, all read at
+    # that block number; the head is polled with eth_blockNumber every few seconds
+    ETH_REFRESH_MODE = os.getenv('ETH_REFRESH_MODE', 'interval').lower()
+    ETH_BLOCK_POLL_INTERVAL = float(os.getenv('ETH_BLOCK_POLL_INTERVAL', '3'))  # seconds
+    
+    # 'block' downloads each new Bitcoin block once and refreshes only the tracked
+    # addresses it touches; after an outage longer than BTC_SCAN_MAX_BLOCKS
+    # blocks (or a deeper reorg) every address is refreshed instead
+    BTC_REFRESH_MODE = os.getenv('BTC_REFRESH_MODE', 'interval').lower()
+    BTC_BLOCK_POLL_INTERVAL = float(os.getenv('BTC_BLOCK_POLL_INTERVAL', '30'))  # seconds
+    BTC_SCAN_MAX_BLOCKS = int(os.getenv('BTC_SCAN_MAX_BLOCKS', '6'))
+    
+    # Alerts: rules file (JSON list or JSON Lines) and an optional local webhook
+    # that receives fired alerts as a JSON list; the last ALERT_QUEUE_SIZE are kept in process
+    ALERT_RULES_FILE = os.getenv('ALERT_RULES_FILE', '')
+    ALERT_WEBHOOK_URL = os.getenv('ALERT_WEBHOOK_URL', '')
+    ALERT_QUEUE_SIZE = int(os.getenv('ALERT_QUEUE_SIZE', '10000'))
+    
+    # Opt-in profiling: time every callback / tracker call, cProfile a sample of
+    # them into rotating .prof files and list the slowest at /admin/profiles
+    PROFILING = os.getenv('PROFILING', 'False').lower() == 'true'
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0.05'))  # fraction of calls
+    PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join('data', 'profiles'))
+    PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', '100'))
+    PROFILE_TOP_N = int(os.getenv('PROFILE_TOP_N', '25'))
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')  # required by admin routes; unset: localhost only
     
     # API endpoints
     COINGECKO_BASE_URL = "https://api.coingecko.com/api/v3"
+    
+    # Coins (CoinGecko ids) and fiat currencies to price; ids are packed into as
+    # few simple/price requests as the per-request limits allow
+    TRACKED_COINS = parse_address_list(os.getenv('TRACKED_COINS', 'bitcoin,ethereum'))
+    VS_CURRENCIES = parse_address_list(os.getenv('VS_CURRENCIES', 'usd'))
+    COINGECKO_MAX_IDS = int(os.getenv('COINGECKO_MAX_IDS', '250'))
+    COINGECKO_MAX_URL_LENGTH = int(os.getenv('COINGECKO_MAX_URL_LENGTH', '4000'))
     BLOCKCHAIN_INFO_URL = "https://blockchain.info/rawaddr/"
     ETHERSCAN_URL = "https://api.etherscan.io/api"
     
     # Web3 provider
     WEB3_PROVIDER = f"https://mainnet.infura.io/v3/{INFURA_PROJECT_ID}"
     
+    # Self-hosted nodes: ETHEREUM_PROVIDER accepts http(s)://, ws(s):// or an IPC
+    # socket path (e.g. ~/.ethereum/geth.ipc) and defaults to Infura
+    ETHEREUM_PROVIDER = os.path.expanduser(os.getenv('ETHEREUM_PROVIDER', WEB3_PROVIDER))
+    
+    # Bitcoin source: 'blockchain_info' (public API) or 'bitcoin_core' (JSON-RPC)
+    BITCOIN_BACKEND = os.getenv('BITCOIN_BACKEND', 'blockchain_info')
+    BITCOIN_RPC_URL = os.getenv('BITCOIN_RPC_URL', 'http://127.0.0.1:8332')
+    BITCOIN_RPC_USER = os.getenv('BITCOIN_RPC_USER', '')
+    BITCOIN_RPC_PASSWORD = os.getenv('BITCOIN_RPC_PASSWORD', '')
+    BITCOIN_RPC_WALLET = os.getenv('BITCOIN_RPC_WALLET', '')
+    # 'scan' (scantxoutset, no wallet needed) or 'wallet' (watch-only descriptor wallet)
+    BITCOIN_RPC_MODE = os.getenv('BITCOIN_RPC_MODE', 'scan')
+    
     # Chart colors
     CHART_COLORS = {
         'bitcoin': '#f7931a',
@@ -71,13 +167,69 @@ DEBUG=True
 ETHERSCAN_API_KEY=YourEtherscanAPIKey
 INFURA_PROJECT_ID=9aa3d95b3bc440fa88ea12eaa4456161
 
+# Self-hosted nodes (optional, bypass public APIs)
+# ETHEREUM_PROVIDER=ws://127.0.0.1:8546
+# BITCOIN_BACKEND=bitcoin_core
+# BITCOIN_RPC_URL=http://127.0.0.1:8332
+# BITCOIN_RPC_USER=rpcuser
+# BITCOIN_RPC_PASSWORD=rpcpassword
+
 # Add your real crypto addresses here
 # BITCOIN_ADDRESSES=address1,address2,address3
 # ETHEREUM_ADDRESSES=address1,address2,address3
 
+# Or load large address sets from CSV / JSON / JSON Lines files
+# ADDRESS_FILES=addresses.csv,more_addresses.json
+
+# HD wallets (account xpub / ypub / zpub), scanned up to HD_GAP_LIMIT unused addresses
+# HD_WALLETS=zpub6r...,xpub6C...
+# HD_GAP_LIMIT=20
+
+# Per-user portfolios, selected with ?portfolio=<id>
+# PORTFOLIOS_FILE=portfolios.json
+
 # Dashboard Settings
 UPDATE_INTERVAL=30000
 CHART_DAYS=365
+REFRESH_SHARDS=10
+
+# Coins and currencies to price (CoinGecko ids, comma separated)
+TRACKED_COINS=bitcoin,ethereum
+VS_CURRENCIES=usd
+
+# Local price tick history (memory-mapped, survives restarts)
+TICK_DIR=data/ticks
+TICK_CAPACITY=8640
+
+# JSON encoder: auto (orjson when installed) or json
+JSON_ENGINE=auto
+
+# Persistent response cache (last known prices / balances served at startup)
+RESPONSE_CACHE=True
+RESPONSE_CACHE_PATH=data/cache/responses.sqlite
+CACHE_TTL_PRICES=20
+CACHE_TTL_BALANCES=25
+CACHE_TTL_TRANSACTIONS=300
+
+# Refresh mode: sharded (fixed interval) or activity (back off on dormant addresses)
+REFRESH_MODE=sharded
+REFRESH_MIN_INTERVAL=30
+REFRESH_MAX_INTERVAL=21600
+
+# Ethereum refresh: interval (with the mode above) or block (once per new block)
+ETH_REFRESH_MODE=interval
+
+# Bitcoin refresh: interval (with the mode above) or block (only addresses in new blocks)
+BTC_REFRESH_MODE=interval
+
+# Price / balance alerts
+# ALERT_RULES_FILE=alert_rules.jsonl
+# ALERT_WEBHOOK_URL=http://127.0.0.1:9000/alerts
+
+# Profiling (slowest calls at /admin/profiles, localhost only unless ADMIN_TOKEN is set)
+# PROFILING=True
+# PROFILE_SAMPLE_RATE=0.05
+# ADMIN_TOKEN=change-me
 """
     
     with open('.env', 'w') as f:
@@ -1,46 +1,116 @@
-import requests
-import json
-from web3 import Web3
-from datetime import datetime
-import time
+import threading
+
+from balance_store import BalanceStore
+from config import Config
+from metrics import web3_metrics_middleware
+from node_backends import make_bitcoin_backend, make_web3_provider
+from price_feed import get_price_feed
+from valuation import ValuationEngine
 
 class CryptoTracker:
-    def __init__(self):
-        # Initialize Web3 for Ethereum
-        self.w3 = Web3(Web3.HTTPProvider('https://mainnet.infura.io/v3/9aa3d95b3bc440fa88ea12eaa4456161'))
+    def __init__(self, bitcoin_backend=None, web3_provider=None, cache=None):
+        # Web3 for Ethereum (HTTP, WebSocket or IPC provider), created on first use
+        # because importing web3 alone takes over a second
+        self._web3_provider = web3_provider
+        self._w3 = None
+        self._w3_lock = threading.Lock()
+        
+        # Bitcoin data source (blockchain.info or a Bitcoin Core node)
+        self.bitcoin_backend = bitcoin_backend or make_bitcoin_backend()
         
         # API endpoints
-        self.blockchain_info_url = "https://blockchain.info/rawaddr/"
-        self.etherscan_url = "https://api.etherscan.io/api"
-        self.etherscan_api_key = "YourEtherscanAPIKey"  # Get from https://etherscan.io/apis
+        self.blockchain_info_url = Config.BLOCKCHAIN_INFO_URL
+        self.etherscan_url = Config.ETHERSCAN_URL
+        self.etherscan_api_key = Config.ETHERSCAN_API_KEY  # Get from https://etherscan.io/apis
+        
+        # Latest balance per address as exact integers, filled by refresh_addresses
+        self.balances = {
+            'bitcoin': BalanceStore('bitcoin', decimals=8),
+            'ethereum': BalanceStore('ethereum', decimals=18)
+        }
+        
+        # Address x asset holdings valued against asset x currency prices
+        self.valuation = ValuationEngine(['bitcoin', 'ethereum'], Config.VS_CURRENCIES)
+        
+        # Optional persistent ResponseCache for balances and transaction pages
+        self.cache = cache
+        
+        # Gap-limit scanner for HD wallets, created on first use
+        self._hd_scanner = None
+        
+        # Callables(chain, address, previous, current) run on every stored balance
+        # (amounts in base units, previous None for a new address), e.g. alerts
+        self.balance_listeners = []
         
+        # Batched CoinGecko prices for any coins / currencies
+        self.price_feed = get_price_feed()
+        self.price_table = None
+        
+    @property
+    def w3(self):
+        """Web3 instance, imported and connected lazily"""
+        if self._w3 is None:
+            with self._w3_lock:
+                if self._w3 is None:
+                    from web3 import Web3
+                    
+                    provider = self._web3_provider
+                    if provider is None or isinstance(provider, str):
+                        provider = make_web3_provider(provider)
+                    w3 = Web3(provider)
+                    w3.middleware_onion.add(web3_metrics_middleware, 'metrics')
+                    self._w3 = w3
+        return self._w3
+    
+    @staticmethod
+    def _format_bitcoin_balance(address, data):
+        """Build a balance dict from a backend summary (amounts in satoshis)"""
+        def to_btc(satoshis):
+            return satoshis / 100000000 if satoshis is not None else None
+        
+        return {
+            'address': address,
+            'balance_sat': data['final_balance'],
+            'balance_btc': to_btc(data['final_balance']),  # Convert satoshis to BTC
+            'total_received': to_btc(data.get('total_received')),
+            'total_sent': to_btc(data.get('total_sent')),
+            'n_tx': data.get('n_tx')
+        }
+    
     def get_bitcoin_balance(self, address):
         """Get Bitcoin address balance"""
         try:
-            url = f"{self.blockchain_info_url}{address}"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                balance_btc = data['final_balance'] / 100000000  # Convert satoshis to BTC
-                return {
-                    'address': address,
-                    'balance_btc': balance_btc,
-                    'total_received': data['total_received'] / 100000000,
-                    'total_sent': data['total_sent'] / 100000000,
-                    'n_tx': data['n_tx']
-                }
+            data = self.bitcoin_backend.get_address(address, tx_limit=0)  # summary only
+            if data:
+                return self._format_bitcoin_balance(address, data)
             else:
                 return None
         except Exception as e:
             print(f"Error getting Bitcoin balance for {address}: {e}")
             return None
     
-    def get_ethereum_balance(self, address):
-        """Get Ethereum address balance"""
+    def get_bitcoin_balances(self, addresses):
+        """Get balances for many Bitcoin addresses in batched backend calls"""
+        try:
+            summaries = self.bitcoin_backend.get_addresses(addresses)
+        except Exception as e:
+            print(f"Error getting Bitcoin balances for {len(addresses)} addresses: {e}")
+            return {}
+        
+        return {
+            address: self._format_bitcoin_balance(address, data)
+            for address, data in summaries.items()
+        }
+    
+    def get_ethereum_block_number(self):
+        """Latest Ethereum block number (one eth_blockNumber call)"""
+        return self.w3.eth.block_number
+    
+    def get_ethereum_balance(self, address, block=None):
+        """Get Ethereum address balance, read at ``block`` if given (latest otherwise)"""
         try:
             # Get ETH balance
-            balance_wei = self.w3.eth.get_balance(address)
+            balance_wei = self.w3.eth.get_balance(address, block_identifier=block)
             balance_eth = self.w3.from_wei(balance_wei, 'ether')
             
             # Get ERC-20 token balances (example with USDT)
@@ -57,104 +127,168 @@ class CryptoTracker:
             
             try:
                 contract = self.w3.eth.contract(address=usdt_contract, abi=usdt_abi)
-                usdt_balance = contract.functions.balanceOf(address).call()
+                usdt_balance = contract.functions.balanceOf(address).call(block_identifier=block)
                 usdt_balance_formatted = usdt_balance / 10**6  # USDT has 6 decimals
             except:
                 usdt_balance_formatted = 0
             
-            return {
+            data = {
                 'address': address,
                 'balance_eth': float(balance_eth),
                 'balance_usdt': usdt_balance_formatted,
                 'balance_wei': balance_wei
             }
+            if block is not None:
+                data['block'] = block
+            return data
         except Exception as e:
             print(f"Error getting Ethereum balance for {address}: {e}")
             return None
     
-    def get_crypto_prices(self):
-        """Get current crypto prices from CoinGecko"""
-        try:
-            url = "https://api.coingecko.com/api/v3/simple/price"
-            params = {
-                'ids': 'bitcoin,ethereum',
-                'vs_currencies': 'usd',
-                'include_24hr_change': 'true',
-                'include_market_cap': 'true'
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                return {
-                    'bitcoin': {
-                        'price': data['bitcoin']['usd'],
-                        'change_24h': data['bitcoin']['usd_24h_change'],
-                        'market_cap': data['bitcoin']['usd_market_cap']
-                    },
-                    'ethereum': {
-                        'price': data['ethereum']['usd'],
-                        'change_24h': data['ethereum']['usd_24h_change'],
-                        'market_cap': data['ethereum']['usd_market_cap']
-                    }
-                }
-            else:
-                return None
-        except Exception as e:
-            print(f"Error getting crypto prices: {e}")
+    def get_crypto_prices(self, coin_ids=None, vs_currencies=None):
+        """Get current USD crypto prices from CoinGecko, or None if any coin is missing"""
+        coin_ids = list(coin_ids or Config.TRACKED_COINS)
+        # 'price' is always USD, whatever VS_CURRENCIES lists first
+        vs_currencies = [c.lower() for c in (vs_currencies or Config.VS_CURRENCIES)]
+        vs_currencies = list(dict.fromkeys(['usd'] + vs_currencies))
+        table = self.price_feed.fetch(coin_ids, vs_currencies)
+        if table is None:
+            return None
+        
+        self.price_table = table
+        if any(coin not in table for coin in coin_ids):
             return None
+        return {
+            coin: {
+                'price': quote['price'],
+                'change_24h': quote['change_24h'],
+                'market_cap': quote['market_cap']
+            }
+            for coin, quote in table.to_dict('usd', coin_ids).items()
+        }
     
     def calculate_portfolio_value(self, addresses, prices):
         """Calculate total portfolio value"""
-        total_value = 0
-        portfolio_breakdown = {
-            'bitcoin': {'balance': 0, 'value': 0},
-            'ethereum': {'balance': 0, 'value': 0}
-        }
+        entries = [
+            (chain, addr) for chain in ('bitcoin', 'ethereum')
+            for addr in addresses.get(chain, [])
+        ]
+        self.refresh_addresses(entries)
         
-        # Calculate Bitcoin portfolio
-        for addr in addresses.get('bitcoin', []):
-            btc_data = self.get_bitcoin_balance(addr)
-            if btc_data:
-                portfolio_breakdown['bitcoin']['balance'] += btc_data['balance_btc']
+        # Value the refreshed balances (only changed rows are recomputed)
+        self.sync_valuation(prices)
+        result = self.valuation.summary(addresses=[addr for _, addr in entries])
+        result['prices'] = prices
+        return result
+    
+    def sync_valuation(self, prices=None):
+        """Copy tracked balances and prices into the valuation engine"""
+        for store in self.balances.values():
+            self.valuation.load_store(store)
+        if self.price_table is not None:
+            self.valuation.set_prices(self.price_table.prices_by_coin())
+        if prices:
+            self.valuation.set_prices(prices)
+        self.valuation.revalue()
+        return self.valuation
+    
+    def refresh_addresses(self, entries, block=None):
+        """Refresh balances for a batch of (chain, address) entries
         
-        # Calculate Ethereum portfolio
-        for addr in addresses.get('ethereum', []):
-            eth_data = self.get_ethereum_balance(addr)
-            if eth_data:
-                portfolio_breakdown['ethereum']['balance'] += eth_data['balance_eth']
+        With a response cache, balances cached within the balance TTL (e.g. by
+        another worker process) are used instead of calling upstream. With
+        ``block`` (a block number of the entries' chain), Ethereum balances are
+        read at that block, results are tagged with it and only cached
+        balances tagged with the same block are reused.
+        """
+        cached = {}
+        if self.cache is not None:
+            cached = self.cache.get_many('balances', [address for _, address in entries])
+            if block is not None:
+                cached = {address: entry for address, entry in cached.items()
+                          if entry[0].get('block') == block}
+            entries = [(chain, address) for chain, address in entries if address not in cached]
         
-        # Calculate USD values
-        if prices:
-            portfolio_breakdown['bitcoin']['value'] = (
-                portfolio_breakdown['bitcoin']['balance'] * prices['bitcoin']['price']
-            )
-            portfolio_breakdown['ethereum']['value'] = (
-                portfolio_breakdown['ethereum']['balance'] * prices['ethereum']['price']
-            )
+        bitcoin = [address for chain, address in entries if chain == 'bitcoin']
+        results = self.get_bitcoin_balances(bitcoin) if bitcoin else {}
+        
+        for chain, address in entries:
+            if chain == 'ethereum':
+                data = self.get_ethereum_balance(address, block)
+                if data:
+                    results[address] = data
+        
+        if block is not None:
+            for data in results.values():
+                data.setdefault('block', block)
+        if self.cache is not None and results:
+            self.cache.put_many('balances', results.items())
+        for address, data in results.items():
+            self.store_balance(data)
+        for address, (data, stored) in cached.items():
+            self.store_balance(data, updated=stored)
+            results[address] = data
+        return results
+    
+    def warm_start(self, addresses):
+        """Load the last cached balances of ``addresses`` (stale included) into the stores
+        
+        Returns how many were found, so the dashboard can show real balances
+        before the first refresh reaches them.
+        """
+        if self.cache is None:
+            return 0
+        cached = self.cache.get_many('balances', addresses, allow_stale=True)
+        for data, stored in cached.values():
+            self.store_balance(data, updated=stored)
+        return len(cached)
+    
+    def store_balance(self, data, updated=None):
+        """Record a balance dict in the matching balance store"""
+        if 'balance_sat' in data:
+            chain, amount, n_tx = 'bitcoin', data['balance_sat'], data.get('n_tx')
+        elif 'balance_wei' in data:
+            chain, amount, n_tx = 'ethereum', data['balance_wei'], None
+        else:
+            return
+        
+        store = self.balances[chain]
+        previous = store.get(data['address']) if self.balance_listeners else None
+        store.set(data['address'], amount, n_tx, updated)
+        for listener in self.balance_listeners:
+            try:
+                listener(chain, data['address'], previous, amount)
+            except Exception as e:
+                print(f"Error in balance listener for {data['address']}: {e}")
+    
+    @property
+    def hd_scanner(self):
+        """HDWalletScanner over this tracker's Bitcoin backend"""
+        if self._hd_scanner is None:
+            from hd_wallet import HDWalletScanner
             
-            total_value = (
-                portfolio_breakdown['bitcoin']['value'] + 
-                portfolio_breakdown['ethereum']['value']
-            )
+            self._hd_scanner = HDWalletScanner(self.bitcoin_backend)
+        return self._hd_scanner
+    
+    def scan_hd_wallet(self, extended_key):
+        """Discover the used addresses of an xpub / ypub / zpub (new indexes only)"""
+        from hd_wallet import HDWallet
         
-        return {
-            'total_value': total_value,
-            'breakdown': portfolio_breakdown,
-            'prices': prices
-        }
+        return self.hd_scanner.scan(HDWallet(extended_key))
     
-    def get_address_transactions(self, address, crypto_type='bitcoin'):
+    def get_address_transactions(self, address, crypto_type='bitcoin', limit=10):
         """Get recent transactions for an address"""
+        key = f"{crypto_type}:{address}:{limit}"
+        cached = self.cache.get('transactions', key) if self.cache is not None else None
+        if cached is not None:
+            return cached[0]
+        
         try:
             if crypto_type == 'bitcoin':
-                url = f"{self.blockchain_info_url}{address}"
-                response = requests.get(url, timeout=10)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    return data.get('txs', [])[:10]  # Last 10 transactions
+                txs = self.bitcoin_backend.get_transactions(address, limit=limit)
+                if txs and self.cache is not None:
+                    self.cache.put('transactions', key, txs)
+                return txs
             elif crypto_type == 'ethereum':
                 # For Ethereum, you'd need to use Etherscan API
                 # This is a simplified version
@@ -162,10 +296,18 @@ class CryptoTracker:
                 
         except Exception as e:
             print(f"Error getting transactions for {address}: {e}")
-            return []
+            cached = self.cache.get('transactions', key, allow_stale=True) if self.cache is not None else None
+            return cached[0] if cached else []
 
 # Example usage
 if __name__ == "__main__":
+    import sys
+    
+    # Headless batch mode: python crypto_tracker.py snapshot addresses.csv [options]
+    if len(sys.argv) > 1 and sys.argv[1] == 'snapshot':
+        from batch_snapshot import main
+        sys.exit(main(sys.argv[2:]))
+    
     tracker = CryptoTracker()
     
     # Sample addresses
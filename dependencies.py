@@ -0,0 +1,138 @@
+"""
+Launcher dependency checks
+Compares requirements.txt against installed distribution metadata (without
+importing any package) and only runs pip when something is missing or changed
+"""
+
+from contextlib import contextmanager
+import hashlib
+import re
+import subprocess
+import sys
+import time
+from importlib import metadata
+from pathlib import Path
+
+REQUIREMENTS_FILE = 'requirements.txt'
+STAMP_FILE = '.deps_fingerprint'
+
+REQUIREMENT_RE = re.compile(r'^\s*([A-Za-z0-9][A-Za-z0-9._-]*)\s*(?:\[[^\]]*\])?\s*(.*?)\s*(?:;.*)?$')
+
+
+def parse_requirements(path=REQUIREMENTS_FILE):
+    """Return [(name, specifier)] from a requirements file"""
+    requirements = []
+    for line in Path(path).read_text().splitlines():
+        line = line.split('#', 1)[0].strip()
+        if not line or line.startswith('-'):
+            continue
+        match = REQUIREMENT_RE.match(line)
+        if match:
+            requirements.append((match.group(1), match.group(2)))
+    return requirements
+
+
+def installed_version(name):
+    """Installed version of a distribution, or None"""
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def _version_tuple(version):
+    return tuple(int(part) for part in re.findall(r'\d+', version)[:4])
+
+
+def version_satisfies(version, specifier):
+    """Check a version against a specifier like '==2.3.3' or '>=1.22.4,<2.0'"""
+    if not specifier:
+        return True
+    try:
+        from packaging.specifiers import SpecifierSet
+        return version in SpecifierSet(specifier)
+    except ImportError:
+        pass
+
+    # Minimal fallback for the operators requirements.txt uses
+    installed = _version_tuple(version)
+    checks = {
+        '==': lambda a, b: a == b, '!=': lambda a, b: a != b,
+        '>=': lambda a, b: a >= b, '<=': lambda a, b: a <= b,
+        '>': lambda a, b: a > b, '<': lambda a, b: a < b,
+        '~=': lambda a, b: a >= b
+    }
+    for clause in specifier.split(','):
+        match = re.match(r'\s*(==|!=|>=|<=|~=|>|<)\s*(\S+)', clause)
+        if match and not checks[match.group(1)](installed, _version_tuple(match.group(2))):
+            return False
+    return True
+
+
+def missing_requirements(path=REQUIREMENTS_FILE):
+    """Requirements that are not installed or whose version does not match"""
+    missing = []
+    for name, specifier in parse_requirements(path):
+        version = installed_version(name)
+        if version is None or not version_satisfies(version, specifier):
+            missing.append(f"{name}{specifier}" + (f" (installed {version})" if version else ""))
+    return missing
+
+
+def fingerprint(path=REQUIREMENTS_FILE):
+    """Hash of the requirements file plus the installed version of each requirement"""
+    digest = hashlib.sha256(Path(path).read_bytes())
+    digest.update(sys.executable.encode())
+    for name, _ in parse_requirements(path):
+        digest.update(f"{name}={installed_version(name)}\n".encode())
+    return digest.hexdigest()
+
+
+def ensure_dependencies(path=REQUIREMENTS_FILE, stamp=STAMP_FILE, quiet=False):
+    """Install requirements only if needed
+
+    Returns (ok, status, missing) with status one of 'cached' (fingerprint
+    unchanged), 'satisfied' (already installed), 'installed' or 'failed'.
+    """
+    stamp = Path(stamp)
+    current = fingerprint(path)
+    if stamp.exists() and stamp.read_text().strip() == current:
+        return True, 'cached', []
+
+    missing = missing_requirements(path)
+    if not missing:
+        stamp.write_text(current)
+        return True, 'satisfied', []
+
+    try:
+        output = subprocess.DEVNULL if quiet else None
+        subprocess.check_call([sys.executable, '-m', 'pip', 'install', '-r', str(path)],
+                              stdout=output, stderr=output)
+    except subprocess.CalledProcessError:
+        return False, 'failed', missing
+
+    stamp.write_text(fingerprint(path))
+    return True, 'installed', missing
+
+
+class StartupTimer:
+    """Collects how long each launcher phase takes"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - began))
+
+    def report(self):
+        """Print the timing breakdown"""
+        print("⏱️  Startup timing:")
+        for name, seconds in self.phases:
+            print(f"   {name:<24} {seconds * 1000:8.1f} ms")
+        print(f"   {'total':<24} {(time.perf_counter() - self.start) * 1000:8.1f} ms")
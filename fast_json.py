@@ -0,0 +1,132 @@
+"""
+Fast JSON serialization
+orjson-based encoding for Dash callback responses, the page layout and the
+Flask /api routes. NumPy arrays (numeric and datetime64) are written natively,
+and datetimes, Decimals, pandas objects and Dash components are converted in a
+``default`` hook instead of plotly's recursive clean-up pass. Without orjson,
+or with JSON_ENGINE=json, the stock plotly / Flask encoders are used.
+"""
+
+import datetime
+import decimal
+
+from flask.json.provider import DefaultJSONProvider
+import numpy as np
+
+from config import Config
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+# Same escaping plotly applies so the output can be embedded in HTML
+HTML_SAFE = (('<', '\\u003c'), ('>', '\\u003e'), ('/', '\\u002f'),
+             ('\u2028', '\\u2028'), ('\u2029', '\\u2029'))
+
+# Datetimes go through ``default``: orjson writes pd.Timestamp without its UTC offset
+OPTIONS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS |
+           orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+
+def default(obj):
+    """Convert values orjson does not handle natively"""
+    to_plotly_json = getattr(obj, 'to_plotly_json', None)  # Dash components and plotly figures
+    if to_plotly_json is not None:
+        return to_plotly_json()
+    if isinstance(obj, (datetime.date, datetime.time)):  # before to_numpy: pd.Timestamp has it
+        return obj.isoformat() if obj == obj else None  # pd.NaT != pd.NaT
+    if isinstance(obj, np.ndarray):
+        # Object / string arrays (e.g. dates converted by plotly validators)
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if hasattr(obj, 'to_numpy'):  # pandas Series / Index
+        tz = getattr(obj, 'tz', None) or getattr(getattr(obj, 'dt', None), 'tz', None)
+        if tz is not None:
+            # datetime64 arrays have no time zone, so keep the offsets as strings
+            return [default(value) for value in obj]
+        return obj.to_numpy()
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def engine():
+    """'orjson' or 'json', from JSON_ENGINE ('auto' picks orjson when installed)"""
+    name = Config.JSON_ENGINE
+    if name == 'auto':
+        return 'orjson' if orjson is not None else 'json'
+    if name == 'orjson' and orjson is None:
+        print("JSON_ENGINE=orjson but orjson is not installed, using json")
+        return 'json'
+    return name
+
+
+def dumps_bytes(obj, sort_keys=False):
+    """Compact UTF-8 JSON for ``obj`` (orjson must be installed)"""
+    options = OPTIONS | orjson.OPT_SORT_KEYS if sort_keys else OPTIONS
+    return orjson.dumps(obj, default=default, option=options)
+
+
+def dumps(obj, html_safe=False):
+    """Compact JSON string for ``obj``, escaped for HTML embedding if ``html_safe``"""
+    text = dumps_bytes(obj).decode('utf-8')
+    if html_safe:
+        for unsafe, safe in HTML_SAFE:
+            if unsafe in text:
+                text = text.replace(unsafe, safe)
+    return text
+
+
+def to_json_plotly(plotly_object, pretty=False, engine=None):
+    """Drop-in for plotly.io.json.to_json_plotly, which Dash calls for every response"""
+    if not pretty and engine != 'json':
+        try:
+            return dumps(plotly_object, html_safe=True)
+        except TypeError:  # e.g. integers beyond 64 bits
+            pass
+    return _plotly_to_json(plotly_object, pretty=pretty, engine=engine)
+
+
+_plotly_to_json = None
+
+
+def install_fast_json(server=None):
+    """Serialize Dash responses (and ``server``'s jsonify) with orjson
+
+    Dash looks up ``plotly.io.json.to_json_plotly`` on every response, so
+    replacing it there covers callbacks, the layout and the page config.
+    Returns the engine in use.
+    """
+    global _plotly_to_json
+
+    selected = engine()
+    if selected != 'orjson':
+        return selected
+
+    import plotly.io.json as plotly_json
+
+    if _plotly_to_json is None:
+        _plotly_to_json = plotly_json.to_json_plotly
+        plotly_json.to_json_plotly = to_json_plotly
+    if server is not None:
+        server.json = OrjsonProvider(server)
+    return selected
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider for jsonify and request.get_json backed by orjson"""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs.get('indent') is None:  # pretty-printed debug responses use the default
+            try:
+                return dumps_bytes(obj, kwargs.get('sort_keys', self.sort_keys)).decode('utf-8')
+            except TypeError:  # e.g. integers beyond 64 bits
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
@@ -0,0 +1,387 @@
+"""
+HD wallet tracking
+Derives receive and change addresses from an account-level extended public
+key (xpub / ypub / zpub, BIP44 / 49 / 84) and discovers the used ones with
+batched, parallel lookups that stop at the gap limit. Derived addresses and
+the highest used index per chain are kept on disk, so rescans only probe
+indexes past the last used address.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import hmac
+import json
+import os
+import threading
+
+from config import Config
+
+try:
+    import coincurve  # optional: libsecp256k1 bindings, ~100x faster derivation
+except ImportError:
+    coincurve = None
+
+RECEIVE, CHANGE = 0, 1
+
+# Extended public key version -> (address type, network)
+VERSIONS = {
+    bytes.fromhex('0488b21e'): ('p2pkh', 'mainnet'),        # xpub, BIP44
+    bytes.fromhex('049d7cb2'): ('p2sh-p2wpkh', 'mainnet'),  # ypub, BIP49
+    bytes.fromhex('04b24746'): ('p2wpkh', 'mainnet'),       # zpub, BIP84
+    bytes.fromhex('043587cf'): ('p2pkh', 'testnet'),        # tpub
+    bytes.fromhex('044a5262'): ('p2sh-p2wpkh', 'testnet'),  # upub
+    bytes.fromhex('045f1cf6'): ('p2wpkh', 'testnet'),       # vpub
+}
+
+# network -> (P2PKH version byte, P2SH version byte, bech32 prefix)
+NETWORKS = {
+    'mainnet': (0x00, 0x05, 'bc'),
+    'testnet': (0x6f, 0xc4, 'tb'),
+}
+
+# --- secp256k1 -----------------------------------------------------------------
+
+P = 2 ** 256 - 2 ** 32 - 977
+N = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+G = (0x79BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798,
+     0x483ADA7726A3C4655DA4FBFC0E1108A8FD17B448A68554199C47D08FFB10D4B8)
+
+_G_TABLE = []  # 2**i * G in affine coordinates, for fixed-base multiplication
+_G_LOCK = threading.Lock()
+
+
+def _double(point):
+    x, y, z = point
+    if not y:
+        return 0, 0, 0
+    yy = y * y % P
+    s = 4 * x * yy % P
+    m = 3 * x * x % P
+    x3 = (m * m - 2 * s) % P
+    return x3, (m * (s - x3) - 8 * yy * yy) % P, 2 * y * z % P
+
+
+def _add_affine(point, affine):
+    """Jacobian point + affine point"""
+    x1, y1, z1 = point
+    x2, y2 = affine
+    if not z1:
+        return x2, y2, 1
+    zz = z1 * z1 % P
+    h = (x2 * zz - x1) % P
+    r = (y2 * zz * z1 - y1) % P
+    if not h:
+        return _double(point) if not r else (0, 0, 0)
+    hh = h * h % P
+    hhh = h * hh % P
+    v = x1 * hh % P
+    x3 = (r * r - hhh - 2 * v) % P
+    return x3, (r * (v - x3) - y1 * hhh) % P, z1 * h % P
+
+
+def _to_affine(point):
+    x, y, z = point
+    if not z:
+        raise ValueError("Point at infinity")
+    zi = pow(z, -1, P)
+    zi2 = zi * zi % P
+    return x * zi2 % P, y * zi2 * zi % P
+
+
+def _g_table():
+    if not _G_TABLE:
+        with _G_LOCK:
+            if not _G_TABLE:
+                point, table = (G[0], G[1], 1), []
+                for _ in range(256):
+                    table.append(_to_affine(point))
+                    point = _double(point)
+                _G_TABLE.extend(table)
+    return _G_TABLE
+
+
+def _compress(point):
+    x, y = point
+    return bytes([2 + (y & 1)]) + x.to_bytes(32, 'big')
+
+
+def _decompress(data):
+    x = int.from_bytes(data[1:], 'big')
+    y = pow((x * x * x + 7) % P, (P + 1) // 4, P)
+    if (y & 1) != (data[0] & 1):
+        y = P - y
+    return x, y
+
+
+def tweak_add(public_key, tweak):
+    """Compressed public key of ``public_key + tweak * G``"""
+    if coincurve is not None:
+        return coincurve.PublicKey(public_key).add(tweak.to_bytes(32, 'big')).format()
+    point = (0, 0, 0)
+    for bit, multiple in enumerate(_g_table()):
+        if tweak >> bit & 1:
+            point = _add_affine(point, multiple)
+    return _compress(_to_affine(_add_affine(point, _decompress(public_key))))
+
+
+# --- encodings -------------------------------------------------------------------
+
+BASE58 = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+BECH32 = 'qpzry9x8gf2tvdw0s3jn54khce6mua7l'
+
+
+def _sha256d(data):
+    return hashlib.sha256(hashlib.sha256(data).digest()).digest()
+
+
+def hash160(data):
+    return hashlib.new('ripemd160', hashlib.sha256(data).digest()).digest()
+
+
+def base58check_encode(payload):
+    data = payload + _sha256d(payload)[:4]
+    number = int.from_bytes(data, 'big')
+    encoded = ''
+    while number:
+        number, remainder = divmod(number, 58)
+        encoded = BASE58[remainder] + encoded
+    return '1' * (len(data) - len(data.lstrip(b'\0'))) + encoded
+
+
+def base58check_decode(text):
+    number = 0
+    for char in text:
+        number = number * 58 + BASE58.index(char)
+    data = number.to_bytes((number.bit_length() + 7) // 8, 'big')
+    data = b'\0' * (len(text) - len(text.lstrip('1'))) + data
+    payload, checksum = data[:-4], data[-4:]
+    if _sha256d(payload)[:4] != checksum:
+        raise ValueError("Bad base58 checksum")
+    return payload
+
+
+def _bech32_polymod(values):
+    generators = (0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3)
+    checksum = 1
+    for value in values:
+        top = checksum >> 25
+        checksum = (checksum & 0x1ffffff) << 5 ^ value
+        for i, generator in enumerate(generators):
+            if top >> i & 1:
+                checksum ^= generator
+    return checksum
+
+
+def segwit_address(hrp, version, program):
+    """Bech32 (witness v0) address"""
+    data, accumulator, bits = [version], 0, 0
+    for byte in program:
+        accumulator = accumulator << 8 | byte
+        bits += 8
+        while bits >= 5:
+            bits -= 5
+            data.append(accumulator >> bits & 31)
+    if bits:
+        data.append(accumulator << (5 - bits) & 31)
+    expanded = [ord(c) >> 5 for c in hrp] + [0] + [ord(c) & 31 for c in hrp]
+    polymod = _bech32_polymod(expanded + data + [0] * 6) ^ 1
+    checksum = [polymod >> 5 * (5 - i) & 31 for i in range(6)]
+    return hrp + '1' + ''.join(BECH32[d] for d in data + checksum)
+
+
+# --- wallets -------------------------------------------------------------------
+
+
+class HDWallet:
+    """Address derivation from an account-level extended public key"""
+
+    def __init__(self, extended_key):
+        self.extended_key = extended_key.strip()
+        data = base58check_decode(self.extended_key)
+        if len(data) != 78 or data[:4] not in VERSIONS:
+            raise ValueError("Not an xpub / ypub / zpub extended public key")
+        self.address_type, self.network = VERSIONS[data[:4]]
+        self.chain_code = data[13:45]
+        self.public_key = data[45:78]
+        # Stable id for the state file that does not reveal the key itself
+        self.id = hashlib.sha256(self.extended_key.encode()).hexdigest()[:16]
+        self._chains = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def child(public_key, chain_code, index):
+        """Non-hardened public child key derivation (BIP32 CKDpub)"""
+        digest = hmac.new(chain_code, public_key + index.to_bytes(4, 'big'), hashlib.sha512).digest()
+        tweak = int.from_bytes(digest[:32], 'big')
+        if tweak >= N:
+            raise ValueError(f"Invalid child key at index {index}")
+        return tweak_add(public_key, tweak), digest[32:]
+
+    def chain_key(self, chain):
+        """(public key, chain code) of the receive (0) or change (1) chain"""
+        with self._lock:
+            if chain not in self._chains:
+                self._chains[chain] = self.child(self.public_key, self.chain_code, chain)
+            return self._chains[chain]
+
+    def address(self, chain, index):
+        public_key, chain_code = self.chain_key(chain)
+        key, _ = self.child(public_key, chain_code, index)
+        p2pkh, p2sh, hrp = NETWORKS[self.network]
+        if self.address_type == 'p2wpkh':
+            return segwit_address(hrp, 0, hash160(key))
+        if self.address_type == 'p2sh-p2wpkh':
+            return base58check_encode(bytes([p2sh]) + hash160(b'\x00\x14' + hash160(key)))
+        return base58check_encode(bytes([p2pkh]) + hash160(key))
+
+    def addresses(self, chain, start, count):
+        return [self.address(chain, index) for index in range(start, start + count)]
+
+
+class HDWalletScanner:
+    """Gap-limit discovery of used HD wallet addresses through a Bitcoin backend
+
+    Each round derives the next ``gap_limit`` addresses of every chain still
+    being scanned and looks them up in backend-sized batches on a thread
+    pool. A chain is done once ``gap_limit`` consecutive addresses after its
+    last used one are unused. Per wallet and chain the state file keeps the
+    derived addresses and the highest used index.
+    """
+
+    def __init__(self, backend, gap_limit=None, workers=None, state_path=None):
+        self.backend = backend
+        self.gap_limit = gap_limit or Config.HD_GAP_LIMIT
+        self.workers = workers or Config.HD_SCAN_WORKERS
+        if getattr(backend, 'mode', None) == 'scan':
+            # Bitcoin Core runs one scantxoutset at a time; parallel scans fail
+            self.workers = 1
+        self.state_path = state_path or Config.HD_STATE_PATH
+        self.batch_size = getattr(backend, 'batch_size', 50)
+        self.state = self._load()
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"Error reading HD wallet state {self.state_path}, rescanning from index 0: {e}")
+            return {}
+
+    def _save(self):
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp = self.state_path + '.tmp'
+        with open(temp, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(temp, self.state_path)
+
+    def _chain_state(self, wallet, chain):
+        chains = self.state.setdefault(wallet.id, {})
+        return chains.setdefault(str(chain), {'used': -1, 'addresses': []})
+
+    def known_addresses(self, wallet):
+        """Addresses up to the highest used index of each chain, from the state file only"""
+        addresses = []
+        for chain in (RECEIVE, CHANGE):
+            state = self.state.get(wallet.id, {}).get(str(chain))
+            if state:
+                addresses.extend(state['addresses'][:state['used'] + 1])
+        return addresses
+
+    def _derive(self, wallet, state, chain, end):
+        """Extend the cached derived addresses up to index ``end`` (exclusive)"""
+        cached = state['addresses']
+        if len(cached) < end:
+            cached.extend(wallet.addresses(chain, len(cached), end - len(cached)))
+        return cached
+
+    def _lookup(self, addresses):
+        """Set of used addresses in one batch; raises if any address is missing"""
+        summaries = self.backend.get_addresses(addresses)
+        missing = [address for address in addresses if address not in summaries]
+        if missing:
+            raise RuntimeError(f"no data for {len(missing)} of {len(addresses)} addresses")
+        # scantxoutset only reports a balance (history fields are None), so there an
+        # address counts as used while it holds funds
+        return {address for address, data in summaries.items()
+                if (data.get('n_tx') or 0) > 0 or (data.get('total_received') or 0) > 0
+                or (data.get('final_balance') or 0) > 0}
+
+    def scan(self, wallet):
+        """Probe new indexes of both chains; returns every address up to the last used ones"""
+        with self._lock:
+            states = {chain: self._chain_state(wallet, chain) for chain in (RECEIVE, CHANGE)}
+            cursors = {chain: state['used'] + 1 for chain, state in states.items()}
+            probed = 0
+
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                while cursors:
+                    jobs = []
+                    for chain, start in cursors.items():
+                        derived = self._derive(wallet, states[chain], chain, start + self.gap_limit)
+                        for offset in range(0, self.gap_limit, self.batch_size):
+                            batch = derived[start + offset:start + min(offset + self.batch_size, self.gap_limit)]
+                            jobs.append((chain, start + offset, batch, pool.submit(self._lookup, batch)))
+
+                    failed = False
+                    for chain, first, batch, future in jobs:
+                        try:
+                            used = future.result()
+                        except Exception as e:
+                            print(f"Error scanning HD wallet {wallet.id} chain {chain}: {e}")
+                            failed = True
+                            continue
+                        probed += len(batch)
+                        for index, address in enumerate(batch, first):
+                            if address in used:
+                                states[chain]['used'] = max(states[chain]['used'], index)
+
+                    if failed:
+                        break  # keep what was found; the next rescan retries from the last used index
+                    cursors = {
+                        chain: start + self.gap_limit for chain, start in cursors.items()
+                        if start + self.gap_limit - (states[chain]['used'] + 1) < self.gap_limit
+                    }
+
+            self._save()
+            print(f"HD wallet {wallet.id}: probed {probed} addresses, last used receive "
+                  f"#{states[RECEIVE]['used']}, change #{states[CHANGE]['used']}")
+            return self.known_addresses(wallet)
+
+
+def watch_hd_wallets(scanner, wallets, on_addresses, interval=None, stop_event=None):
+    """Rescan ``wallets`` every ``interval`` seconds in a daemon thread
+
+    ``on_addresses(addresses)`` receives each wallet's tracked addresses after
+    every scan, new ones included.
+    """
+    interval = interval or Config.HD_RESCAN_INTERVAL
+    stop_event = stop_event or threading.Event()
+
+    def run():
+        while not stop_event.is_set():
+            for wallet in wallets:
+                try:
+                    on_addresses(scanner.scan(wallet))
+                except Exception as e:
+                    print(f"Error scanning HD wallet {wallet.id}: {e}")
+            stop_event.wait(interval)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return stop_event
+
+
+def load_wallets(extended_keys=None):
+    """HDWallet objects for the configured extended public keys, skipping invalid ones"""
+    wallets = []
+    for key in Config.HD_WALLETS if extended_keys is None else extended_keys:
+        try:
+            wallets.append(HDWallet(key))
+        except ValueError as e:
+            print(f"Ignoring HD wallet key {key[:12]}...: {e}")
+    return wallets
@@ -0,0 +1,125 @@
+"""
+Incremental JSON reader
+Walks a JSON document chunk by chunk so large files and HTTP bodies never need
+to be held in memory at once
+"""
+
+import codecs
+import json
+
+WHITESPACE = ' \t\n\r'
+
+
+class JSONStreamReader:
+    """Pull-style reader over an iterable of str or bytes chunks"""
+
+    def __init__(self, chunks, min_buffer=64 * 1024):
+        self._chunks = iter(chunks)
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self._min_buffer = min_buffer
+
+    @classmethod
+    def from_file(cls, f, chunk_size=64 * 1024):
+        """Build a reader over an open text or binary file"""
+        return cls(iter(lambda: f.read(chunk_size), f.read(0)))
+
+    def _fill(self):
+        """Append the next chunk to the buffer, returning False at end of input"""
+        if self._eof:
+            return False
+
+        # Drop consumed text so the buffer stays bounded
+        if self._pos > self._min_buffer:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+
+        for chunk in self._chunks:
+            if isinstance(chunk, bytes):
+                chunk = self._utf8.decode(chunk)
+            if chunk:
+                self._buffer += chunk
+                return True
+
+        self._eof = True
+        tail = self._utf8.decode(b'', final=True)
+        if tail:
+            self._buffer += tail
+            return True
+        return False
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it ('' at end)"""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        """Consume the next non-whitespace character, which must be ``char``"""
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} in JSON stream, found {found!r}")
+        self._pos += 1
+
+    def read_value(self):
+        """Decode and return the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+
+            # A number touching the end of the buffer may continue in the next chunk
+            if end == len(self._buffer) and not self._eof and self._fill():
+                continue
+
+            self._pos = end
+            return value
+
+    def iter_array(self):
+        """Yield the items of the JSON array at the current position"""
+        self.expect('[')
+        if self.peek() == ']':
+            self._pos += 1
+            return
+
+        while True:
+            yield self.read_value()
+            char = self.peek()
+            self._pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError(f"Malformed JSON array near {char!r}")
+
+    def iter_object(self):
+        """Yield the keys of the JSON object at the current position
+
+        The caller must consume each key's value (read_value, iter_array, ...)
+        before advancing to the next key.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self._pos += 1
+            return
+
+        while True:
+            key = self.read_value()
+            self.expect(':')
+            yield key
+            char = self.peek()
+            self._pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise ValueError(f"Malformed JSON object near {char!r}")
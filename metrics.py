@@ -0,0 +1,280 @@
+"""
+Prometheus-style metrics
+Counters, histograms and gauges for upstream API calls, caches and Dash
+callbacks, rendered in the Prometheus text format at /metrics. Recording a
+sample is a lock, a dict lookup and a bisect, so it is safe on hot paths.
+"""
+
+from bisect import bisect_left
+import threading
+import time
+
+import requests
+
+PREFIX = 'crypto_dashboard_'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count per label combination"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def get(self, *labels):
+        return self.values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self.values.items())
+        for labels, value in items:
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Gauge(Counter):
+    """Current value per label combination, or computed at scrape time by ``function``
+
+    ``function`` returns either a number or {label tuple: number}.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, help, labelnames=(), function=None):
+        super().__init__(name, help, labelnames)
+        self.function = function
+
+    def set(self, value, *labels):
+        with self._lock:
+            self.values[labels] = value
+
+    def samples(self):
+        if self.function is None:
+            yield from super().samples()
+            return
+        values = self.function()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in values.items():
+            if value is not None:
+                yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Histogram:
+    """Bucketed distribution (plus sum and count) per label combination"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.values = {}  # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self.values.get(labels)
+            if entry is None:
+                entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, list(counts), total, count) for labels, (counts, total, count) in self.values.items()]
+        for labels, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket
+                yield (f"{self.name}_bucket",
+                       _format_labels(self.labelnames, labels, [('le', _format_value(bound))]),
+                       cumulative)
+            yield f"{self.name}_sum", _format_labels(self.labelnames, labels), total
+            yield f"{self.name}_count", _format_labels(self.labelnames, labels), count
+
+
+class MetricsRegistry:
+    """Named collection of metrics rendered together"""
+
+    def __init__(self, prefix=PREFIX):
+        self.prefix = prefix
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        metric.name = self.prefix + metric.name
+        with self._lock:
+            # Re-registering (e.g. a module reloaded by the dev server) keeps the first
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=(), function=None):
+        return self._register(Gauge(name, help, labelnames, function))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            try:
+                for name, labels, value in metric.samples():
+                    lines.append(f"{name}{labels} {_format_value(value)}")
+            except Exception as e:
+                lines.append(f"# error collecting {metric.name}: {e}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+UPSTREAM_REQUESTS = REGISTRY.counter(
+    'upstream_requests_total', "Requests sent to upstream APIs by provider and HTTP status",
+    ('provider', 'status'))
+UPSTREAM_LATENCY = REGISTRY.histogram(
+    'upstream_request_duration_seconds', "Upstream request latency", ('provider',))
+UPSTREAM_ERRORS = REGISTRY.counter(
+    'upstream_errors_total', "Upstream requests that failed (HTTP >= 400, RPC error or exception)",
+    ('provider',))
+UPSTREAM_TIMEOUTS = REGISTRY.counter(
+    'upstream_timeouts_total', "Upstream requests that timed out", ('provider',))
+
+CACHE_REQUESTS = REGISTRY.counter(
+    'cache_requests_total', "Cache lookups by cache and result (hit / miss)", ('cache', 'result'))
+
+CALLBACK_REQUESTS = REGISTRY.counter(
+    'dash_callback_requests_total', "Dash callback requests by output and HTTP status",
+    ('callback', 'status'))
+CALLBACK_LATENCY = REGISTRY.histogram(
+    'dash_callback_duration_seconds', "Dash callback execution time including serialization",
+    ('callback',))
+CALLBACK_PAYLOAD = REGISTRY.histogram(
+    'dash_callback_response_bytes', "Dash callback response payload size", ('callback',),
+    buckets=SIZE_BUCKETS)
+
+
+def _cache_hit_ratio():
+    ratios = {}
+    for (cache, result), count in list(CACHE_REQUESTS.values.items()):
+        hits, total = ratios.get(cache, (0, 0))
+        ratios[cache] = (hits + (count if result == 'hit' else 0), total + count)
+    return {(cache,): hits / total for cache, (hits, total) in ratios.items() if total}
+
+
+REGISTRY.gauge('cache_hit_ratio', "Fraction of cache lookups that were hits", ('cache',),
+               function=_cache_hit_ratio)
+
+
+def record_cache(cache, hit):
+    """Count one cache lookup"""
+    CACHE_REQUESTS.inc(cache, 'hit' if hit else 'miss')
+
+
+def record_upstream(provider, seconds, status=None, error=None):
+    """Record one upstream call: an HTTP status, or the exception it raised"""
+    UPSTREAM_LATENCY.observe(seconds, provider)
+    if error is not None:
+        timed_out = isinstance(error, (requests.Timeout, TimeoutError))
+        UPSTREAM_REQUESTS.inc(provider, 'timeout' if timed_out else 'error')
+        UPSTREAM_ERRORS.inc(provider)
+        if timed_out:
+            UPSTREAM_TIMEOUTS.inc(provider)
+        return
+    UPSTREAM_REQUESTS.inc(provider, str(status))
+    if not isinstance(status, int) or status >= 400:
+        UPSTREAM_ERRORS.inc(provider)
+
+
+class InstrumentedSession(requests.Session):
+    """requests.Session that records every request under a provider name"""
+
+    def __init__(self, provider):
+        super().__init__()
+        self.provider = provider
+
+    def request(self, method, url, *args, **kwargs):
+        began = time.perf_counter()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except Exception as e:
+            record_upstream(self.provider, time.perf_counter() - began, error=e)
+            raise
+        record_upstream(self.provider, time.perf_counter() - began, response.status_code)
+        return response
+
+
+def web3_metrics_middleware(make_request, w3):
+    """Web3 middleware recording JSON-RPC calls under the 'ethereum' provider
+
+    Works for HTTP, WebSocket and IPC providers alike.
+    """
+    def middleware(method, params):
+        began = time.perf_counter()
+        try:
+            response = make_request(method, params)
+        except Exception as e:
+            record_upstream('ethereum', time.perf_counter() - began, error=e)
+            raise
+        failed = isinstance(response, dict) and response.get('error')
+        record_upstream('ethereum', time.perf_counter() - began, 'rpc_error' if failed else 200)
+        return response
+    return middleware
+
+
+def instrument_dash(server, path='/_dash-update-component'):
+    """Time every Dash callback request on a Flask server
+
+    Hooks the Flask request cycle rather than each callback, so callbacks
+    need no changes and the measurement includes JSON serialization.
+    """
+    from flask import g, request
+
+    @server.before_request
+    def _start_timer():
+        if request.path.endswith(path):
+            g._metrics_started = time.perf_counter()
+
+    @server.after_request
+    def _record_callback(response):
+        started = g.pop('_metrics_started', None)
+        if started is None:
+            return response
+        body = request.get_json(silent=True) or {}
+        callback = str(body.get('output', 'unknown'))
+        CALLBACK_LATENCY.observe(time.perf_counter() - started, callback)
+        CALLBACK_REQUESTS.inc(callback, str(response.status_code))
+        size = response.calculate_content_length()
+        if size is not None:
+            CALLBACK_PAYLOAD.observe(size, callback)
+        return response
+
+    return server
@@ -0,0 +1,369 @@
+"""
+Blockchain node backends
+Pluggable sources for Bitcoin address data (public API or a self-hosted
+Bitcoin Core node) and Web3 providers for Ethereum (HTTP, WebSocket or IPC)
+"""
+
+from concurrent.futures import Future
+from decimal import Decimal
+import itertools
+import threading
+
+from config import Config
+from json_stream import JSONStreamReader
+from metrics import InstrumentedSession
+
+SATOSHIS_PER_BTC = 100000000
+# getblock verbosity 3, which adds each input's prevout, needs Bitcoin Core 25+
+PREVOUT_MIN_VERSION = 250000
+
+# rawaddr fields read by the tracker; blockchain.info sends them before 'txs'
+RAWADDR_SUMMARY = ('address', 'n_tx', 'total_received', 'total_sent', 'final_balance')
+
+
+def btc_to_satoshis(amount):
+    """Convert a BTC amount (Decimal from RPC) to integer satoshis"""
+    return int(Decimal(amount) * SATOSHIS_PER_BTC)
+
+
+class BlockchainInfoBackend:
+    """Bitcoin address data from the public blockchain.info API"""
+
+    name = 'blockchain.info'
+
+    def __init__(self, base_url=None, timeout=10, batch_size=50, chunk_size=16 * 1024):
+        self.base_url = base_url or Config.BLOCKCHAIN_INFO_URL
+        # multiaddr, latestblock and rawblock live next to rawaddr on the same host
+        self.root_url = self.base_url.rstrip('/').rsplit('/', 1)[0]
+        self.multiaddr_url = self.root_url + '/multiaddr'
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.session = InstrumentedSession(self.name)
+
+    def get_address(self, address, tx_limit=None):
+        """Return the rawaddr summary (amounts in satoshis) or None
+
+        ``tx_limit`` caps the transactions included under 'txs' (API default
+        50). The body is parsed as it arrives and the connection is dropped as
+        soon as the summary and the first ``tx_limit`` transactions are read,
+        so heavy addresses cost neither the full download nor the full parse.
+        """
+        params = {'limit': tx_limit} if tx_limit is not None else None
+        response = self.session.get(f"{self.base_url}{address}", params=params,
+                                    timeout=self.timeout, stream=True)
+        try:
+            if response.status_code != 200:
+                return None
+            return self.parse_rawaddr(response.iter_content(self.chunk_size), tx_limit)
+        finally:
+            # Releases the connection if the body was read to the end, closes it otherwise
+            response.close()
+
+    @staticmethod
+    def parse_rawaddr(chunks, tx_limit=None):
+        """Read a rawaddr body from byte chunks, stopping after ``tx_limit`` transactions
+
+        Reading stops early only once every RAWADDR_SUMMARY field has been
+        seen; if some follow the transactions the rest of the array is skipped.
+        """
+        reader = JSONStreamReader(chunks)
+        data = {}
+        for key in reader.iter_object():
+            if key != 'txs':
+                data[key] = reader.read_value()
+                continue
+
+            txs = data['txs'] = []
+            items = reader.iter_array()
+            if tx_limit is None or tx_limit > 0:
+                for tx in items:
+                    txs.append(tx)
+                    if tx_limit is not None and len(txs) >= tx_limit:
+                        break
+                else:
+                    continue  # the whole array was wanted and read
+
+            if all(field in data for field in RAWADDR_SUMMARY):
+                return data
+            for _ in items:
+                pass
+        return data
+
+    def get_addresses(self, addresses):
+        """Return {address: summary} for many addresses via batched multiaddr calls"""
+        results = {}
+        addresses = list(addresses)
+        for start in range(0, len(addresses), self.batch_size):
+            batch = addresses[start:start + self.batch_size]
+            response = self.session.get(
+                self.multiaddr_url,
+                params={'active': '|'.join(batch), 'n': 0},
+                timeout=self.timeout
+            )
+            if response.status_code != 200:
+                continue
+            for entry in response.json().get('addresses', []):
+                results[entry['address']] = entry
+        return results
+
+    def get_transactions(self, address, limit=10):
+        """Return up to ``limit`` recent transactions"""
+        data = self.get_address(address, tx_limit=limit)
+        return data.get('txs', [])[:limit] if data else []
+
+    def get_tip(self):
+        """{'hash', 'height'} of the latest block"""
+        response = self.session.get(f"{self.root_url}/latestblock", timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        return {'hash': data['hash'], 'height': data['height']}
+
+    def has_prevouts(self):
+        """Whether get_block sees the addresses a block spends from; rawblock inputs carry prev_out"""
+        return True
+
+    def get_block(self, block_hash):
+        """{'hash', 'prev', 'height', 'addresses'} of a block, parsed as it streams in"""
+        response = self.session.get(f"{self.root_url}/rawblock/{block_hash}",
+                                    timeout=self.timeout, stream=True)
+        try:
+            response.raise_for_status()
+            return self.parse_rawblock(response.iter_content(self.chunk_size))
+        finally:
+            response.close()
+
+    @staticmethod
+    def parse_rawblock(chunks):
+        """Read a rawblock body one transaction at a time, keeping only the addresses it touches"""
+        reader = JSONStreamReader(chunks)
+        block = {'hash': None, 'prev': None, 'height': None, 'addresses': set()}
+        addresses = block['addresses']
+        for key in reader.iter_object():
+            if key != 'tx':
+                value = reader.read_value()
+                if key in ('hash', 'height'):
+                    block[key] = value
+                elif key == 'prev_block':
+                    block['prev'] = value
+                continue
+            for tx in reader.iter_array():
+                for item in tx.get('inputs', ()):
+                    address = (item.get('prev_out') or {}).get('addr')
+                    if address:
+                        addresses.add(address)
+                for item in tx.get('out', ()):
+                    if item.get('addr'):
+                        addresses.add(item['addr'])
+        return block
+
+
+class BitcoinCoreBackend:
+    """Bitcoin address data from a self-hosted Bitcoin Core node over JSON-RPC
+
+    ``mode='scan'`` uses ``scantxoutset`` and works on any node without a
+    wallet, but only knows the current balance. ``mode='wallet'`` queries a
+    (watch-only) descriptor wallet that imported the tracked addresses and also
+    reports received totals and transaction counts.
+    """
+
+    name = 'bitcoin-core'
+
+    def __init__(self, url=None, user=None, password=None, wallet=None, mode=None, timeout=None):
+        self.url = (url or Config.BITCOIN_RPC_URL).rstrip('/')
+        wallet = wallet if wallet is not None else Config.BITCOIN_RPC_WALLET
+        if wallet:
+            self.url = f"{self.url}/wallet/{wallet}"
+        self.mode = (mode or Config.BITCOIN_RPC_MODE).lower()
+        # scantxoutset walks the whole UTXO set, so allow it plenty of time
+        self.timeout = timeout or (300 if self.mode == 'scan' else 30)
+        self.session = InstrumentedSession(self.name)
+        user = user if user is not None else Config.BITCOIN_RPC_USER
+        password = password if password is not None else Config.BITCOIN_RPC_PASSWORD
+        if user:
+            self.session.auth = (user, password or '')
+        self._ids = itertools.count(1)
+        self._prevouts = None
+        # Core runs one scantxoutset at a time; single lookups queue here and
+        # whichever caller gets the scan lock next scans for all of them
+        self._scan_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending = {}
+
+    def _read_reply(self, method, response):
+        """Parse a JSON-RPC response body, rejecting HTTP failures without one"""
+        # Bitcoin Core reports RPC errors with HTTP 500 and a JSON body; other
+        # statuses (401/403 on bad credentials, 404 on a missing wallet) have none
+        if response.status_code not in (200, 500):
+            hint = ''
+            if response.status_code in (401, 403):
+                hint = ' (check BITCOIN_RPC_USER/BITCOIN_RPC_PASSWORD)'
+            raise RuntimeError(f"{method} failed: HTTP {response.status_code}{hint}")
+        try:
+            return response.json(parse_float=Decimal)
+        except ValueError:
+            raise RuntimeError(f"{method} failed: HTTP {response.status_code} with a non-JSON body")
+
+    def call(self, method, *params):
+        """Invoke a JSON-RPC method and return its result"""
+        payload = {'jsonrpc': '1.0', 'id': next(self._ids), 'method': method, 'params': list(params)}
+        response = self.session.post(self.url, json=payload, timeout=self.timeout)
+        data = self._read_reply(method, response)
+        if data.get('error'):
+            raise RuntimeError(f"{method} failed: {data['error'].get('message', data['error'])}")
+        response.raise_for_status()
+        return data['result']
+
+    def call_batch(self, method, params_list, batch_size=1000):
+        """Invoke one method for many parameter lists in JSON-RPC batch requests
+
+        Returns the results in order, None for calls that failed.
+        """
+        results = []
+        for start in range(0, len(params_list), batch_size):
+            chunk = params_list[start:start + batch_size]
+            payload = [{'jsonrpc': '1.0', 'id': next(self._ids), 'method': method, 'params': list(params)}
+                       for params in chunk]
+            response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            replies = {reply.get('id'): reply for reply in self._read_reply(method, response)}
+            for request in payload:
+                reply = replies.get(request['id'], {})
+                results.append(None if reply.get('error') else reply.get('result'))
+        return results
+
+    def get_address(self, address, tx_limit=None):
+        """Return a rawaddr-style summary (amounts in satoshis, no 'txs') or None
+
+        In scan mode every lookup is a full UTXO set scan, so concurrent single
+        lookups are coalesced into one scan; prefer get_addresses for known sets.
+        """
+        if self.mode == 'wallet':
+            return self._wallet_summary(address)
+        with self._pending_lock:
+            future = self._pending.get(address)
+            if future is None:
+                future = self._pending[address] = Future()
+        with self._scan_lock:
+            if not future.done():
+                with self._pending_lock:
+                    batch, self._pending = self._pending, {}
+                try:
+                    summaries = self._scan_summaries(list(batch))
+                except Exception as e:
+                    for waiting in batch.values():
+                        waiting.set_exception(e)
+                else:
+                    for pending, waiting in batch.items():
+                        waiting.set_result(summaries.get(pending))
+        return future.result()
+
+    def get_addresses(self, addresses):
+        """Return {address: summary} for many addresses"""
+        addresses = list(addresses)
+        if not addresses:
+            return {}
+        if self.mode == 'wallet':
+            return {address: self._wallet_summary(address) for address in addresses}
+        with self._scan_lock:
+            return self._scan_summaries(addresses)
+
+    def _scan_summaries(self, addresses):
+        """Balances for many addresses from a single UTXO set scan"""
+        scripts = {}
+        infos = self.call_batch('validateaddress', [[address] for address in addresses])
+        for address, info in zip(addresses, infos):
+            if info and info.get('isvalid'):
+                scripts[info['scriptPubKey']] = address
+
+        results = {
+            address: {'address': address, 'final_balance': 0, 'total_received': None,
+                      'total_sent': None, 'n_tx': None, 'n_unredeemed': 0}
+            for address in scripts.values()
+        }
+        scan = self.call('scantxoutset', 'start', [f"addr({a})" for a in scripts.values()])
+        for utxo in scan.get('unspents', []):
+            address = scripts.get(utxo['scriptPubKey'])
+            if address:
+                results[address]['final_balance'] += btc_to_satoshis(utxo['amount'])
+                results[address]['n_unredeemed'] += 1
+        return results
+
+    def _wallet_summary(self, address):
+        """Balance and history for one address from a descriptor wallet"""
+        utxos = self.call('listunspent', 0, 9999999, [address])
+        balance = sum(btc_to_satoshis(utxo['amount']) for utxo in utxos)
+        received = self.call('listreceivedbyaddress', 0, True, True, address)
+        total_received = btc_to_satoshis(received[0]['amount']) if received else 0
+        n_tx = len(received[0].get('txids', [])) if received else 0
+        return {
+            'address': address,
+            'final_balance': balance,
+            'total_received': total_received,
+            'total_sent': max(total_received - balance, 0),
+            'n_tx': n_tx,
+            'n_unredeemed': len(utxos)
+        }
+
+    def get_transactions(self, address, limit=10):
+        """Return up to ``limit`` recent wallet transactions touching the address"""
+        if self.mode != 'wallet':
+            return []
+        txs = self.call('listtransactions', '*', 1000, 0, True)
+        matching = [tx for tx in reversed(txs) if tx.get('address') == address]
+        return matching[:limit]
+
+    def get_tip(self):
+        """{'hash', 'height'} of the latest block"""
+        info = self.call('getblockchaininfo')
+        return {'hash': info['bestblockhash'], 'height': info['blocks']}
+
+    def has_prevouts(self):
+        """Whether get_block sees the addresses a block spends from (Bitcoin Core 25+)"""
+        if self._prevouts is None:
+            self._prevouts = self.call('getnetworkinfo')['version'] >= PREVOUT_MIN_VERSION
+        return self._prevouts
+
+    def get_block(self, block_hash):
+        """{'hash', 'prev', 'height', 'addresses'} of a block
+
+        Needs verbosity 3 for the inputs' prevouts: without them spends from
+        tracked addresses would be missed, so older nodes are refused.
+        """
+        if not self.has_prevouts():
+            raise RuntimeError("getblock verbosity 3 needs Bitcoin Core 25 or later")
+        block = self.call('getblock', block_hash, 3)
+        addresses = set()
+        for tx in block.get('tx', ()):
+            for vin in tx.get('vin', ()):
+                address = vin.get('prevout', {}).get('scriptPubKey', {}).get('address')
+                if address:
+                    addresses.add(address)
+            for vout in tx.get('vout', ()):
+                address = vout.get('scriptPubKey', {}).get('address')
+                if address:
+                    addresses.add(address)
+        return {'hash': block['hash'], 'prev': block.get('previousblockhash'),
+                'height': block['height'], 'addresses': addresses}
+
+
+def make_bitcoin_backend(kind=None):
+    """Create the configured Bitcoin backend"""
+    kind = (kind or Config.BITCOIN_BACKEND).lower().replace('-', '_')
+    if kind in ('bitcoin_core', 'bitcoind', 'rpc'):
+        return BitcoinCoreBackend()
+    return BlockchainInfoBackend()
+
+
+def make_web3_provider(url=None):
+    """Create a Web3 provider from a URL: http(s)://, ws(s):// or an IPC socket path"""
+    from web3 import Web3
+
+    url = url or Config.ETHEREUM_PROVIDER
+    if url.startswith(('ws://', 'wss://')):
+        return Web3.WebsocketProvider(url)
+    if url.startswith('ipc://'):
+        return Web3.IPCProvider(url[len('ipc://'):])
+    if url.endswith('.ipc'):
+        return Web3.IPCProvider(url)
+    return Web3.HTTPProvider(url)
@@ -0,0 +1,190 @@
+"""
+Multi-tenant portfolios
+Many users' portfolios served from one process. An address shared by several
+portfolios is tracked (and fetched) once, and an address -> portfolio index
+marks only the portfolios holding an address dirty when its balance changes,
+so per-portfolio totals are recomputed only when one of their addresses did.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+import json
+import threading
+
+from address_loader import normalize_chain
+from config import Config
+
+CHAIN_DECIMALS = {'bitcoin': 8, 'ethereum': 18}
+DEFAULT_PORTFOLIO = 'default'
+
+
+class Portfolio:
+    """One user's address set, plus optional off-chain holdings in whole coins"""
+
+    def __init__(self, id, name=None, user=None, addresses=(), holdings=None):
+        self.id = str(id)
+        self.name = name or self.id
+        self.user = user
+        self.addresses = list(dict.fromkeys(addresses))  # (chain, address)
+        self.holdings = {chain: to_base_units(chain, amount)
+                         for chain, amount in (holdings or {}).items() if chain in CHAIN_DECIMALS}
+        self.totals = dict.fromkeys(CHAIN_DECIMALS, 0)  # on-chain totals in base units
+        self.version = 0
+
+    @classmethod
+    def from_dict(cls, data, id=None):
+        addresses = []
+        for item in data.get('addresses', ()):
+            if isinstance(item, str):
+                address, label = item.strip(), None
+            else:
+                address, label = item.get('address', '').strip(), item.get('chain')
+            if address:
+                addresses.append((normalize_chain(label, address), address))
+        portfolio_id = data.get('id', id)
+        if portfolio_id is None:
+            raise ValueError("Portfolio without an id")
+        return cls(portfolio_id, data.get('name'), data.get('user'), addresses,
+                   data.get('holdings'))
+
+    def balances(self):
+        """{chain: balance in whole coins}, on-chain plus off-chain holdings"""
+        return {chain: (self.totals[chain] + self.holdings.get(chain, 0)) / 10 ** decimals
+                for chain, decimals in CHAIN_DECIMALS.items()}
+
+
+def to_base_units(chain, amount):
+    """Whole coins to exact base units (satoshi / wei)"""
+    return int(Decimal(str(amount)) * 10 ** CHAIN_DECIMALS[chain])
+
+
+class PortfolioRegistry:
+    """Portfolios with an address -> portfolio index over their shared address set"""
+
+    def __init__(self, stores):
+        self.stores = stores  # {chain: BalanceStore}, e.g. CryptoTracker.balances
+        self.portfolios = {}
+        self.index = defaultdict(set)  # address -> ids of the portfolios holding it
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.portfolios)
+
+    def __contains__(self, portfolio_id):
+        return portfolio_id in self.portfolios
+
+    def add(self, portfolio):
+        """Add or replace a Portfolio"""
+        with self._lock:
+            old = self.portfolios.get(portfolio.id)
+            if old is not None:
+                self._unindex(old)
+                portfolio.version = old.version + 1
+            self.portfolios[portfolio.id] = portfolio
+            for _, address in portfolio.addresses:
+                self.index[address].add(portfolio.id)
+            self._dirty.add(portfolio.id)
+        return portfolio
+
+    def _unindex(self, portfolio):
+        for _, address in portfolio.addresses:
+            holders = self.index.get(address)
+            if holders is not None:
+                holders.discard(portfolio.id)
+                if not holders:
+                    del self.index[address]
+
+    def remove(self, portfolio_id):
+        with self._lock:
+            portfolio = self.portfolios.pop(portfolio_id, None)
+            if portfolio is not None:
+                self._unindex(portfolio)
+                self._dirty.discard(portfolio_id)
+            return portfolio
+
+    def load_file(self, path):
+        """Load portfolios from JSON: a list of portfolio objects or {id: portfolio}"""
+        with open(path) as f:
+            data = json.load(f)
+        items = data.items() if isinstance(data, dict) else ((None, item) for item in data)
+        added = 0
+        for portfolio_id, item in items:
+            self.add(Portfolio.from_dict(item, portfolio_id))
+            added += 1
+        return added
+
+    def entries(self):
+        """Every (chain, address) of every portfolio, each address once"""
+        with self._lock:
+            seen = {}
+            for portfolio in self.portfolios.values():
+                for chain, address in portfolio.addresses:
+                    seen.setdefault(address, chain)
+        return [(chain, address) for address, chain in seen.items()]
+
+    def holders(self, address):
+        """Ids of the portfolios that include an address"""
+        return set(self.index.get(address, ()))
+
+    def on_balance(self, chain, address, previous, current):
+        """Balance listener: mark the portfolios holding a changed address dirty"""
+        if previous == current:
+            return
+        holders = self.index.get(address)
+        if holders:
+            with self._lock:
+                self._dirty.update(holders)
+
+    def _recompute(self, portfolio):
+        totals = dict.fromkeys(CHAIN_DECIMALS, 0)
+        for chain, address in portfolio.addresses:
+            store = self.stores.get(chain)
+            amount = store.get(address) if store is not None else None
+            if amount:
+                totals[chain] += amount
+        if totals != portfolio.totals:
+            portfolio.totals = totals
+            portfolio.version += 1
+
+    def get(self, portfolio_id):
+        """Portfolio with up-to-date totals, or None if unknown"""
+        with self._lock:
+            portfolio = self.portfolios.get(portfolio_id)
+            if portfolio is not None and portfolio_id in self._dirty:
+                self._recompute(portfolio)
+                self._dirty.discard(portfolio_id)
+            return portfolio
+
+    def summary(self, portfolio_id, prices):
+        """{'total_value', 'breakdown': {chain: {'balance', 'value'}}} at ``prices`` ({chain: price})"""
+        portfolio = self.get(portfolio_id)
+        if portfolio is None:
+            return None
+        breakdown = {}
+        for chain, balance in portfolio.balances().items():
+            price = prices.get(chain)
+            breakdown[chain] = {'balance': balance, 'value': balance * price if price is not None else 0.0}
+        return {
+            'id': portfolio.id,
+            'name': portfolio.name,
+            'version': portfolio.version,
+            'total_value': sum(item['value'] for item in breakdown.values()),
+            'breakdown': breakdown
+        }
+
+
+def build_portfolio_registry(stores):
+    """Registry from PORTFOLIOS_FILE, or one default portfolio of the configured addresses"""
+    registry = PortfolioRegistry(stores)
+    if Config.PORTFOLIOS_FILE:
+        try:
+            added = registry.load_file(Config.PORTFOLIOS_FILE)
+            print(f"Loaded {added} portfolios from {Config.PORTFOLIOS_FILE}")
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            print(f"Error loading portfolios from {Config.PORTFOLIOS_FILE}: {e}")
+    if DEFAULT_PORTFOLIO not in registry:
+        registry.add(Portfolio(DEFAULT_PORTFOLIO, "Portfolio", addresses=(
+            [('bitcoin', address) for address in Config.BITCOIN_ADDRESSES] +
+            [('ethereum', address) for address in Config.ETHEREUM_ADDRESSES])))
+    return registry
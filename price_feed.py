@@ -0,0 +1,198 @@
+"""
+Price feed
+Fetches prices for any number of CoinGecko coin ids and fiat currencies in as
+few simple/price requests as possible and merges them into one price table
+"""
+
+import math
+import time
+
+import numpy as np
+
+from config import Config
+from metrics import InstrumentedSession
+from response_cache import get_response_cache
+
+# simple/price field suffix per table field ('' is the price itself)
+FIELDS = {
+    'price': '',
+    'change_24h': '_24h_change',
+    'market_cap': '_market_cap',
+    'volume_24h': '_24h_vol'
+}
+
+
+class PriceTable:
+    """Prices and market data indexed by coin id and currency
+
+    Each field is a (coin x currency) float array, NaN where CoinGecko had no
+    value.
+    """
+
+    def __init__(self, coins, currencies, timestamp=None):
+        self.coins = list(coins)
+        self.currencies = [c.lower() for c in currencies]
+        self.coin_index = {coin: i for i, coin in enumerate(self.coins)}
+        self.currency_index = {currency: i for i, currency in enumerate(self.currencies)}
+        shape = (len(self.coins), len(self.currencies))
+        self.data = {field: np.full(shape, np.nan) for field in FIELDS}
+        self.timestamp = timestamp or time.time()
+
+    def __contains__(self, coin):
+        row = self.coin_index.get(coin)
+        return row is not None and not np.isnan(self.data['price'][row]).all()
+
+    def update(self, payload):
+        """Merge one simple/price response body into the table"""
+        for coin, values in payload.items():
+            row = self.coin_index.get(coin)
+            if row is None:
+                continue
+            for col, currency in enumerate(self.currencies):
+                for field, suffix in FIELDS.items():
+                    value = values.get(currency + suffix)
+                    if value is not None:
+                        self.data[field][row, col] = value
+
+    def get(self, coin, currency='usd', field='price'):
+        """One value, or None if missing"""
+        row = self.coin_index.get(coin)
+        col = self.currency_index.get(currency.lower())
+        if row is None or col is None:
+            return None
+        value = self.data[field][row, col]
+        return None if math.isnan(value) else float(value)
+
+    def quote(self, coin, currency='usd'):
+        """{'price', 'change_24h', 'market_cap', 'volume_24h'} for one coin"""
+        return {field: self.get(coin, currency, field) for field in FIELDS}
+
+    def to_dict(self, currency='usd', coins=None):
+        """{coin: quote} in the shape get_crypto_data() / get_crypto_prices() return"""
+        return {coin: self.quote(coin, currency) for coin in (coins or self.coins) if coin in self}
+
+    def price_matrix(self, coins=None, currencies=None):
+        """(coin x currency) price array for the valuation engine"""
+        rows = [self.coin_index[c] for c in (coins or self.coins)]
+        cols = [self.currency_index[c.lower()] for c in (currencies or self.currencies)]
+        return self.data['price'][np.ix_(rows, cols)]
+
+    def prices_by_coin(self):
+        """{coin: {currency: price}}"""
+        return {
+            coin: {currency: self.get(coin, currency) for currency in self.currencies}
+            for coin in self.coins if coin in self
+        }
+
+
+class PriceFeed:
+    """Batched CoinGecko simple/price client"""
+
+    def __init__(self, base_url=None, max_ids=None, max_url_length=None, timeout=10, cache=None):
+        self.url = (base_url or Config.COINGECKO_BASE_URL).rstrip('/') + '/simple/price'
+        self.max_ids = max_ids or Config.COINGECKO_MAX_IDS
+        self.max_url_length = max_url_length or Config.COINGECKO_MAX_URL_LENGTH
+        self.timeout = timeout
+        self.cache = cache  # optional ResponseCache for batch responses
+        self.session = InstrumentedSession('coingecko')
+        self.last_success = None  # timestamp of the last fetch that returned prices
+
+    def batches(self, coin_ids, vs_currencies):
+        """Pack coin ids into as few requests as the id count and URL length limits allow"""
+        # Fixed part of the URL: currencies and the include_* flags
+        base = len(self.url) + len(','.join(vs_currencies)) + 150
+        batches, current, length = [], [], base
+        for coin in dict.fromkeys(coin_ids):
+            extra = len(coin) + 3  # comma, URL-encoded as %2C
+            if current and (len(current) >= self.max_ids or length + extra > self.max_url_length):
+                batches.append(current)
+                current, length = [], base
+            current.append(coin)
+            length += extra
+        if current:
+            batches.append(current)
+        return batches
+
+    @staticmethod
+    def cache_key(batch, vs_currencies):
+        return f"{','.join(batch)}|{','.join(vs_currencies)}"
+
+    def fetch(self, coin_ids=None, vs_currencies=None):
+        """Fetch a PriceTable, or None if every request failed
+
+        With a response cache, batches cached within the price TTL are not
+        requested again, and a batch whose request fails falls back to its
+        last cached response. The table timestamp is that of its oldest batch.
+        """
+        coin_ids = list(coin_ids or Config.TRACKED_COINS)
+        vs_currencies = [c.lower() for c in (vs_currencies or Config.VS_CURRENCIES)]
+        table = PriceTable(coin_ids, vs_currencies)
+        oldest = None
+
+        for batch in self.batches(coin_ids, vs_currencies):
+            key = self.cache_key(batch, vs_currencies)
+            cached = self.cache.get('prices', key) if self.cache is not None else None
+            if cached is None:
+                payload = self._request(batch, vs_currencies)
+                if payload is not None:
+                    if self.cache is not None:
+                        self.cache.put('prices', key, payload)
+                    cached = payload, time.time()
+                elif self.cache is not None:
+                    cached = self.cache.get('prices', key, allow_stale=True)
+            if cached is not None:
+                payload, stored = cached
+                table.update(payload)
+                oldest = stored if oldest is None else min(oldest, stored)
+
+        if oldest is None:
+            return None
+        table.timestamp = oldest
+        self.last_success = max(self.last_success or 0, oldest)
+        return table
+
+    def cached_table(self, coin_ids=None, vs_currencies=None):
+        """PriceTable built from cached responses only (stale included), or None"""
+        if self.cache is None:
+            return None
+        coin_ids = list(coin_ids or Config.TRACKED_COINS)
+        vs_currencies = [c.lower() for c in (vs_currencies or Config.VS_CURRENCIES)]
+        table = PriceTable(coin_ids, vs_currencies)
+        keys = [self.cache_key(batch, vs_currencies) for batch in self.batches(coin_ids, vs_currencies)]
+        cached = self.cache.get_many('prices', keys, allow_stale=True)
+        if not cached:
+            return None
+        for payload, _ in cached.values():
+            table.update(payload)
+        table.timestamp = min(stored for _, stored in cached.values())
+        self.last_success = max(self.last_success or 0, table.timestamp)
+        return table
+
+    def _request(self, batch, vs_currencies):
+        """simple/price response body for one batch, or None on failure"""
+        params = {
+            'ids': ','.join(batch),
+            'vs_currencies': ','.join(vs_currencies),
+            'include_24hr_change': 'true',
+            'include_market_cap': 'true',
+            'include_24hr_vol': 'true'
+        }
+        try:
+            response = self.session.get(self.url, params=params, timeout=self.timeout)
+            if response.status_code == 200:
+                return response.json()
+            print(f"Error fetching prices for {len(batch)} coins: HTTP {response.status_code}")
+        except Exception as e:
+            print(f"Error fetching prices for {len(batch)} coins: {e}")
+        return None
+
+
+_default_feed = None
+
+
+def get_price_feed():
+    """Shared PriceFeed instance (keeps one HTTP session alive, uses the response cache)"""
+    global _default_feed
+    if _default_feed is None:
+        _default_feed = PriceFeed(cache=get_response_cache())
+    return _default_feed
@@ -0,0 +1,221 @@
+"""
+Opt-in profiling
+With PROFILING=true every Dash callback and CryptoTracker method is timed,
+a sample of calls is run under cProfile and dumped to rotating .prof files,
+and the slowest calls are listed at /admin/profiles
+"""
+
+from collections import defaultdict
+import cProfile
+import functools
+import heapq
+import inspect
+import ipaddress
+import itertools
+import os
+import random
+import re
+import threading
+import time
+
+from config import Config
+
+
+class CallProfiler:
+    """Times wrapped calls and cProfiles a random sample of them"""
+
+    def __init__(self, directory=None, sample_rate=None, max_files=None, top_n=None):
+        self.directory = directory or Config.PROFILE_DIR
+        self.sample_rate = Config.PROFILE_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.max_files = max_files or Config.PROFILE_MAX_FILES
+        self.top_n = top_n or Config.PROFILE_TOP_N
+        self.slowest = []  # min-heap of (seconds, seq, record) holding the top_n slowest calls
+        self.totals = defaultdict(lambda: [0, 0.0, 0.0])  # name -> [calls, total s, max s]
+        self._seq = itertools.count()
+        self._local = threading.local()  # cProfile cannot nest within a thread
+        self._lock = threading.Lock()
+        self._random = random.Random()
+
+    def wrap(self, func, name=None):
+        """Return ``func`` wrapped with timing and sampled profiling"""
+        name = name or getattr(func, '__qualname__', repr(func))
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profile = None
+            if (self.sample_rate and not getattr(self._local, 'active', False)
+                    and self._random.random() < self.sample_rate):
+                profile = cProfile.Profile()
+                self._local.active = True
+                profile.enable()
+            began = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - began
+                path = None
+                if profile is not None:
+                    profile.disable()
+                    self._local.active = False
+                    path = self._dump(profile, name)
+                self._record(name, elapsed, path)
+
+        wrapper.__profiled__ = True
+        return wrapper
+
+    def _record(self, name, elapsed, path):
+        record = {'name': name, 'seconds': elapsed, 'time': time.time(), 'profile': path}
+        with self._lock:
+            totals = self.totals[name]
+            totals[0] += 1
+            totals[1] += elapsed
+            totals[2] = max(totals[2], elapsed)
+            entry = (elapsed, next(self._seq), record)
+            if len(self.slowest) < self.top_n:
+                heapq.heappush(self.slowest, entry)
+            elif elapsed > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, entry)
+
+    def _dump(self, profile, name):
+        """Write a .prof file and delete the oldest beyond max_files"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            safe = re.sub(r'[^A-Za-z0-9_.-]+', '_', name)[:80]
+            path = os.path.join(self.directory, f"{time.time():.6f}_{safe}.prof")
+            profile.dump_stats(path)
+            self._rotate()
+            return os.path.basename(path)
+        except OSError as e:
+            print(f"Error writing profile for {name}: {e}")
+            return None
+
+    def _rotate(self):
+        files = sorted(f for f in os.listdir(self.directory) if f.endswith('.prof'))
+        for stale in files[:max(0, len(files) - self.max_files)]:
+            try:
+                os.remove(os.path.join(self.directory, stale))
+            except OSError:
+                pass
+
+    def profile_path(self, filename):
+        """Absolute path of a profile file, or None if it does not exist"""
+        if os.path.basename(filename) != filename or not filename.endswith('.prof'):
+            return None
+        path = os.path.join(self.directory, filename)
+        return path if os.path.exists(path) else None
+
+    def summary(self):
+        """(slowest calls, slowest first; per-name [calls, total s, max s] sorted by total)"""
+        with self._lock:
+            slowest = [record for _, _, record in sorted(self.slowest, reverse=True)]
+            totals = sorted(((name, list(values)) for name, values in self.totals.items()),
+                            key=lambda item: item[1][1], reverse=True)
+        return slowest, totals
+
+    def wrap_callbacks(self, app):
+        """Wrap every registered Dash callback"""
+        for entry in app.callback_map.values():
+            func = entry.get('callback')
+            if func is not None and not getattr(func, '__profiled__', False):
+                entry['callback'] = self.wrap(func, f"callback.{func.__name__}")
+        return app
+
+    def wrap_methods(self, obj, prefix=None):
+        """Wrap every method of an object instance (dunder methods excepted)"""
+        prefix = prefix or type(obj).__name__
+        for name, member in inspect.getmembers(type(obj)):
+            if name.startswith('__') or isinstance(member, property) or not callable(member):
+                continue
+            method = getattr(obj, name)
+            if not getattr(method, '__profiled__', False):
+                setattr(obj, name, self.wrap(method, f"{prefix}.{name}"))
+        return obj
+
+
+def render_summary(profiler, token=''):
+    """HTML page listing the slowest calls and per-function totals"""
+    from html import escape
+
+    query = f"?token={escape(token)}" if token else ''
+    slowest, totals = profiler.summary()
+    rows = []
+    for record in slowest:
+        link = ''
+        if record['profile'] and profiler.profile_path(record['profile']):  # may have been rotated out
+            name = escape(record['profile'])
+            link = (f'<a href="/admin/profiles/{name}{query}">.prof</a> '
+                    f'<a href="/admin/profiles/{name}{query}{"&" if query else "?"}format=text">stats</a>')
+        rows.append(f"<tr><td>{escape(record['name'])}</td><td>{record['seconds'] * 1000:.1f}</td>"
+                    f"<td>{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record['time']))}</td>"
+                    f"<td>{link}</td></tr>")
+    total_rows = [f"<tr><td>{escape(name)}</td><td>{calls}</td><td>{total * 1000 / calls:.1f}</td>"
+                  f"<td>{worst * 1000:.1f}</td><td>{total:.2f}</td></tr>"
+                  for name, (calls, total, worst) in totals]
+    return (
+        "<html><head><title>Profiles</title></head><body style='font-family:monospace'>"
+        f"<h2>Slowest {profiler.top_n} calls</h2>"
+        f"<p>Sampling {profiler.sample_rate:.1%} of calls with cProfile into {escape(profiler.directory)}</p>"
+        "<table border=1 cellpadding=4><tr><th>call</th><th>ms</th><th>at</th><th>profile</th></tr>"
+        + ''.join(rows) + "</table>"
+        "<h2>Totals</h2>"
+        "<table border=1 cellpadding=4><tr><th>call</th><th>calls</th><th>avg ms</th><th>max ms</th>"
+        "<th>total s</th></tr>" + ''.join(total_rows) + "</table></body></html>"
+    )
+
+
+def is_loopback(address):
+    """Whether a client address is this machine"""
+    try:
+        return ipaddress.ip_address(address or '').is_loopback
+    except ValueError:
+        return False
+
+
+def install_profiling(app, server, objects=()):
+    """Enable profiling if PROFILING is set: wrap callbacks and objects, add the admin routes
+
+    Call after every callback is registered. Returns the profiler or None.
+    """
+    if not Config.PROFILING:
+        return None
+
+    from flask import Response, abort, request, send_file
+
+    profiler = CallProfiler()
+    profiler.wrap_callbacks(app)
+    for obj in objects:
+        profiler.wrap_methods(obj)
+
+    def check_token():
+        token = request.args.get('token') or request.headers.get('X-Admin-Token', '')
+        if Config.ADMIN_TOKEN:
+            if token != Config.ADMIN_TOKEN:
+                abort(403)
+        elif not is_loopback(request.remote_addr):
+            # No token configured: profiles are only served to this machine
+            abort(403)
+        return token
+
+    @server.route('/admin/profiles')
+    def profile_summary():
+        return render_summary(profiler, check_token())
+
+    @server.route('/admin/profiles/<filename>')
+    def profile_file(filename):
+        check_token()
+        path = profiler.profile_path(filename)
+        if path is None:
+            abort(404)
+        if request.args.get('format') == 'text':
+            import io
+            import pstats
+
+            out = io.StringIO()
+            pstats.Stats(path, stream=out).sort_stats('cumulative').print_stats(40)
+            return Response(out.getvalue(), mimetype='text/plain')
+        return send_file(os.path.abspath(path), as_attachment=True)
+
+    print(f"Profiling enabled: sampling {profiler.sample_rate:.1%} of calls into {profiler.directory}")
+    if not Config.ADMIN_TOKEN:
+        print("ADMIN_TOKEN not set: /admin/profiles only answers requests from localhost")
+    return profiler
@@ -0,0 +1,158 @@
+"""
+Persistent response cache
+Upstream responses (price batches, address balances, transaction pages) kept
+in a local SQLite database in WAL mode. Entries survive restarts, so a fresh
+process can serve the last known data before making a single upstream call,
+and several worker processes can share one file.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from config import Config
+from metrics import record_cache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    stored REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+) WITHOUT ROWID
+"""
+
+# SQLite limits the number of bound parameters per statement
+QUERY_CHUNK = 500
+
+
+class ResponseCache:
+    """JSON values keyed by (kind, key) with a freshness TTL per kind
+
+    Entries are never dropped when their TTL expires: stale values are still
+    returned on request (``allow_stale``) so a failed upstream call or a cold
+    start can fall back to the last known data. Entries older than
+    ``max_age`` are purged when the cache is opened.
+    """
+
+    def __init__(self, path=None, ttls=None, max_age=None):
+        self.path = path or Config.RESPONSE_CACHE_PATH
+        self.ttls = dict(ttls or {
+            'prices': Config.CACHE_TTL_PRICES,
+            'balances': Config.CACHE_TTL_BALANCES,
+            'transactions': Config.CACHE_TTL_TRANSACTIONS
+        })
+        self.max_age = Config.CACHE_MAX_AGE if max_age is None else max_age
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # One connection shared by all threads; the lock serializes access to it
+        self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False,
+                                     isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute(SCHEMA)
+        if self.max_age:
+            self.purge(self.max_age)
+
+    def ttl(self, kind):
+        return self.ttls.get(kind, 0)
+
+    def _fresh(self, kind, stored, now):
+        return now - stored <= self.ttl(kind)
+
+    def get(self, kind, key, allow_stale=False):
+        """(value, stored timestamp), or None if missing or stale"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, stored FROM responses WHERE kind = ? AND key = ?', (kind, key)
+            ).fetchone()
+        fresh = row is not None and self._fresh(kind, row[1], time.time())
+        record_cache(f"response_{kind}", fresh)
+        if row is None or not (fresh or allow_stale):
+            return None
+        return json.loads(row[0]), row[1]
+
+    def get_many(self, kind, keys, allow_stale=False):
+        """{key: (value, stored)} for the cached keys among ``keys``"""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), QUERY_CHUNK):
+                chunk = keys[start:start + QUERY_CHUNK]
+                marks = ','.join('?' * len(chunk))
+                found.update(
+                    (key, (value, stored)) for key, value, stored in self._conn.execute(
+                        f'SELECT key, value, stored FROM responses WHERE kind = ? AND key IN ({marks})',
+                        [kind] + chunk))
+
+        now = time.time()
+        results = {}
+        for key in keys:
+            entry = found.get(key)
+            fresh = entry is not None and self._fresh(kind, entry[1], now)
+            record_cache(f"response_{kind}", fresh)
+            if entry is not None and (fresh or allow_stale):
+                results[key] = (json.loads(entry[0]), entry[1])
+        return results
+
+    def put(self, kind, key, value, stored=None):
+        self.put_many(kind, [(key, value)], stored)
+
+    def put_many(self, kind, items, stored=None):
+        """Store (key, value) pairs in one transaction"""
+        stored = time.time() if stored is None else stored
+        rows = [(kind, key, json.dumps(value), stored) for key, value in items]
+        if not rows:
+            return
+        with self._lock:
+            try:
+                self._conn.execute('BEGIN')
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO responses (kind, key, value, stored) VALUES (?, ?, ?, ?)',
+                    rows)
+                self._conn.execute('COMMIT')
+            except sqlite3.Error as e:
+                if self._conn.in_transaction:
+                    self._conn.execute('ROLLBACK')
+                print(f"Error writing {len(rows)} {kind} entries to the response cache: {e}")
+
+    def purge(self, older_than):
+        """Delete entries stored more than ``older_than`` seconds ago"""
+        with self._lock:
+            return self._conn.execute('DELETE FROM responses WHERE stored < ?',
+                                      (time.time() - older_than,)).rowcount
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Shared ResponseCache, or None if RESPONSE_CACHE is off or the file cannot be opened"""
+    global _default_cache
+    if not Config.RESPONSE_CACHE:
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            try:
+                _default_cache = ResponseCache()
+            except (OSError, sqlite3.Error) as e:
+                print(f"Response cache disabled, cannot open {Config.RESPONSE_CACHE_PATH}: {e}")
+                Config.RESPONSE_CACHE = False
+                return None
+    return _default_cache
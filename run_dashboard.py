@@ -6,37 +6,24 @@ Handles initial setup and launches the dashboard
 
 import os
 import sys
-import subprocess
 from pathlib import Path
 
+from dependencies import StartupTimer, ensure_dependencies
+
 def check_dependencies():
-    """Check if required packages are installed"""
-    required_packages = [
-        'flask', 'dash', 'plotly', 'pandas', 'requests', 
-        'dash-bootstrap-components', 'python-dotenv', 'web3'
-    ]
-    
-    missing_packages = []
-    
-    for package in required_packages:
-        try:
-            __import__(package.replace('-', '_'))
-        except ImportError:
-            missing_packages.append(package)
-    
-    if missing_packages:
-        print("❌ Missing required packages:")
+    """Install required packages only if the requirements fingerprint changed and some are missing"""
+    ok, status, missing_packages = ensure_dependencies()
+    if not ok:
+        print("❌ Failed to install dependencies:")
+        for package in missing_packages:
+            print(f"   - {package}")
+        print("Please run:")
+        print("   pip install -r requirements.txt")
+        return False
+    if status == 'installed':
+        print("✅ Installed missing packages:")
         for package in missing_packages:
             print(f"   - {package}")
-        print("\n📦 Installing dependencies...")
-        
-        try:
-            subprocess.check_call([sys.executable, '-m', 'pip', 'install', '-r', 'requirements.txt'])
-            print("✅ Dependencies installed successfully!")
-        except subprocess.CalledProcessError:
-            print("❌ Failed to install dependencies. Please run:")
-            print("   pip install -r requirements.txt")
-            return False
     
     return True
 
@@ -77,6 +64,7 @@ CHART_DAYS=365
 
 def main():
     """Main startup function"""
+    timer = StartupTimer()
     print("🚀 Crypto Portfolio Dashboard")
     print("=" * 40)
     
@@ -86,11 +74,14 @@ def main():
         return
     
     # Check dependencies
-    if not check_dependencies():
+    with timer.phase("dependency check"):
+        deps_ok = check_dependencies()
+    if not deps_ok:
         return
     
     # Create .env file if needed
-    env_ready = create_env_file()
+    with timer.phase("configuration"):
+        env_ready = create_env_file()
     
     print("\n🎯 Starting Crypto Dashboard...")
     print("📊 Dashboard will be available at: http://localhost:8050")
@@ -100,9 +91,14 @@ def main():
     
     try:
         # Import and run the dashboard
-        from app_enhanced import app, server
+        with timer.phase("import dashboard"):
+            from app_enhanced import app, server, start_background_refresh
         
         if __name__ == '__main__':
+            # The debug reloader re-runs this script in a child process; only report once
+            if os.environ.get('WERKZEUG_RUN_MAIN') != 'true':
+                timer.report()
+            start_background_refresh(debug=True)
             app.run_server(debug=True, host='0.0.0.0', port=8050)
     
     except KeyboardInterrupt:
@@ -0,0 +1,539 @@
+"""
+Refresh schedulers
+Spread balance refreshes for large address sets over the update interval
+"""
+
+import heapq
+import threading
+import time
+import zlib
+
+from address_index import AddressIndex
+from address_loader import iter_addresses
+from config import Config
+
+
+class BaseScheduler:
+    """Address loading shared by the refresh schedulers; subclasses implement ``add``"""
+
+    def load(self, entries):
+        """Track every (chain, address) from an iterable, returning how many were new"""
+        return sum(1 for chain, address in entries if self.add(chain, address))
+
+    def load_file(self, path, chain=None):
+        """Stream addresses from a CSV / JSON / JSON Lines file"""
+        return self.load(iter_addresses(path, chain))
+
+
+class ThreadedScheduler(BaseScheduler):
+    """Scheduler whose ``run(refresh, stop_event)`` loop runs in a background thread"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def join_timeout(self):
+        """Seconds ``stop`` waits for the thread: its longest sleep plus a margin"""
+        return 1
+
+    def start(self, refresh):
+        """Run the scheduler in a background daemon thread"""
+        if self._thread and self._thread.is_alive():
+            return self._thread
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, args=(refresh,), daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        """Stop the background thread"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.join_timeout)
+
+
+class ShardedScheduler(ThreadedScheduler):
+    """Round-robin refresh of address shards across the update interval
+
+    Addresses are assigned to a fixed number of shards by a stable hash, and
+    one shard is refreshed every ``interval / num_shards`` seconds. With 10
+    shards and a 30 s interval every address is still refreshed once per
+    interval, but upstream requests arrive at a steady rate instead of all at
+    once.
+    """
+
+    def __init__(self, num_shards=None, interval_ms=None):
+        self.num_shards = max(1, num_shards or Config.REFRESH_SHARDS)
+        self.interval = (interval_ms or Config.UPDATE_INTERVAL) / 1000.0
+        self.shards = [[] for _ in range(self.num_shards)]
+        self._known = set()
+        self._cursor = 0
+        super().__init__()
+
+    def __len__(self):
+        return len(self._known)
+
+    @property
+    def tick_delay(self):
+        """Seconds between two shard refreshes"""
+        return self.interval / self.num_shards
+
+    def shard_for(self, address):
+        """Stable shard index for an address"""
+        return zlib.crc32(address.encode()) % self.num_shards
+
+    def add(self, chain, address):
+        """Track an address, returning False if it was already tracked"""
+        with self._lock:
+            if address in self._known:
+                return False
+            self._known.add(address)
+            self.shards[self.shard_for(address)].append((chain, address))
+            return True
+
+    def entries(self):
+        """Every tracked (chain, address)"""
+        with self._lock:
+            return [entry for shard in self.shards for entry in shard]
+
+    def next_shard(self):
+        """Return (index, entries) of the next shard due for refresh"""
+        with self._lock:
+            index = self._cursor
+            self._cursor = (self._cursor + 1) % self.num_shards
+            return index, list(self.shards[index])
+
+    def run(self, refresh, stop_event=None):
+        """Call ``refresh(entries)`` for one shard per tick until stopped"""
+        stop_event = stop_event or self._stop
+        next_tick = time.monotonic()
+
+        while not stop_event.is_set():
+            index, entries = self.next_shard()
+            if entries:
+                try:
+                    refresh(entries)
+                except Exception as e:
+                    print(f"Error refreshing shard {index}: {e}")
+
+            next_tick += self.tick_delay
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                # Running behind: carry on from now rather than bursting to catch up
+                next_tick = time.monotonic()
+                delay = 0
+            stop_event.wait(delay)
+
+    @property
+    def join_timeout(self):
+        return self.tick_delay + 1
+
+
+class ActivityScheduler(ThreadedScheduler):
+    """Priority refresh that polls active addresses often and backs off on dormant ones
+
+    Each address carries its own refresh interval. When a refresh shows the
+    address changed (new transactions or a different balance) the interval
+    drops back to ``min_interval``; otherwise it grows by ``backoff`` and is
+    kept at least ``idle_fraction`` of the time since the last change, capped
+    at ``max_interval``. Addresses are kept in a heap ordered by due time.
+    """
+
+    def __init__(self, min_interval=None, max_interval=None, backoff=None,
+                 idle_fraction=0.1, batch_size=50, interval_ms=None):
+        self.min_interval = min_interval or Config.REFRESH_MIN_INTERVAL
+        self.max_interval = max(max_interval or Config.REFRESH_MAX_INTERVAL, self.min_interval)
+        self.backoff = backoff or Config.REFRESH_BACKOFF
+        self.idle_fraction = idle_fraction
+        self.batch_size = batch_size
+        # Initial refreshes are spread over one update interval
+        self.spread = (interval_ms or Config.UPDATE_INTERVAL) / 1000.0
+        # address -> [chain, interval, signature, last_change]
+        self.state = {}
+        self._heap = []
+        super().__init__()
+
+    def __len__(self):
+        return len(self.state)
+
+    def add(self, chain, address, now=None):
+        """Track an address, returning False if it was already tracked"""
+        now = time.time() if now is None else now
+        with self._lock:
+            if address in self.state:
+                return False
+            self.state[address] = [chain, self.min_interval, None, None]
+            offset = (zlib.crc32(address.encode()) % 1000) / 1000.0 * self.spread
+            heapq.heappush(self._heap, (now + offset, address))
+            return True
+
+    def load(self, entries):
+        """Track every (chain, address) from an iterable, returning how many were new"""
+        now = time.time()
+        return sum(1 for chain, address in entries if self.add(chain, address, now))
+
+    def entries(self):
+        """Every tracked (chain, address)"""
+        with self._lock:
+            return [(state[0], address) for address, state in self.state.items()]
+
+    @staticmethod
+    def signature(data):
+        """Values whose change marks an address as active"""
+        return (data.get('n_tx'), data.get('balance_wei'), data.get('balance_btc'))
+
+    def observe(self, address, data, now=None):
+        """Record a refresh result and schedule the address's next refresh"""
+        now = time.time() if now is None else now
+        with self._lock:
+            state = self.state.get(address)
+            if state is None:
+                return None
+
+            chain, interval, previous, last_change = state
+            if data is not None:
+                current = self.signature(data)
+                if previous is None or current != previous:
+                    interval = self.min_interval
+                    last_change = now
+                else:
+                    interval = interval * self.backoff
+                    if last_change is not None:
+                        interval = max(interval, (now - last_change) * self.idle_fraction)
+                interval = min(max(interval, self.min_interval), self.max_interval)
+                previous = current
+
+            self.state[address] = [chain, interval, previous, last_change]
+            heapq.heappush(self._heap, (now + interval, address))
+            return interval
+
+    def pop_due(self, now=None, limit=None):
+        """Remove and return up to ``limit`` (chain, address) entries that are due"""
+        now = time.time() if now is None else now
+        limit = limit or self.batch_size
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and len(due) < limit:
+                _, address = heapq.heappop(self._heap)
+                due.append((self.state[address][0], address))
+        return due
+
+    def next_due(self):
+        """Timestamp of the earliest scheduled refresh, or None"""
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def estimated_calls_per_hour(self):
+        """Upstream balance lookups per hour at the current intervals"""
+        with self._lock:
+            return sum(3600.0 / state[1] for state in self.state.values())
+
+    def run(self, refresh, stop_event=None):
+        """Refresh due addresses as they come up until stopped
+
+        ``refresh(entries)`` should return a dict of address -> balance data;
+        addresses missing from it are retried at their current interval.
+        """
+        stop_event = stop_event or self._stop
+
+        while not stop_event.is_set():
+            entries = self.pop_due()
+            if entries:
+                try:
+                    results = refresh(entries) or {}
+                except Exception as e:
+                    print(f"Error refreshing {len(entries)} addresses: {e}")
+                    results = {}
+                now = time.time()
+                for _, address in entries:
+                    self.observe(address, results.get(address), now)
+                continue
+
+            due = self.next_due()
+            delay = self.min_interval if due is None else due - time.time()
+            stop_event.wait(min(max(delay, 0), self.min_interval))
+
+    @property
+    def join_timeout(self):
+        return self.min_interval + 1
+
+
+class BlockScheduler(ThreadedScheduler):
+    """Refresh of every tracked address once per new block, pinned to that block
+
+    The head block number is polled every ``poll_interval`` seconds (one
+    cheap eth_blockNumber call). Nothing is refreshed between blocks; when
+    the head advances, all addresses are read at exactly that block number,
+    so each block gives one consistent batch. Blocks that land while a batch
+    is still running are coalesced into the next one.
+    """
+
+    def __init__(self, head, poll_interval=None, batch_size=100):
+        self.head = head  # callable returning the latest block number
+        self.poll_interval = poll_interval or Config.ETH_BLOCK_POLL_INTERVAL
+        self.batch_size = batch_size
+        self.addresses = {}  # address -> chain, in insertion order
+        self.block = None    # last block refreshed
+        super().__init__()
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def add(self, chain, address):
+        """Track an address, returning False if it was already tracked"""
+        with self._lock:
+            if address in self.addresses:
+                return False
+            self.addresses[address] = chain
+            return True
+
+    def entries(self):
+        """Every tracked (chain, address)"""
+        with self._lock:
+            return [(chain, address) for address, chain in self.addresses.items()]
+
+    def poll(self):
+        """Latest block number, or None if the node could not be reached"""
+        try:
+            return self.head()
+        except Exception as e:
+            print(f"Error polling the latest block: {e}")
+            return None
+
+    def refresh_block(self, refresh, block, stop_event=None):
+        """Refresh every address at ``block`` in batches"""
+        entries = self.entries()
+        for start in range(0, len(entries), self.batch_size):
+            if stop_event is not None and stop_event.is_set():
+                return
+            batch = entries[start:start + self.batch_size]
+            try:
+                refresh(batch, block=block)
+            except Exception as e:
+                print(f"Error refreshing {len(batch)} addresses at block {block}: {e}")
+        self.block = block
+
+    def run(self, refresh, stop_event=None):
+        """Refresh on every new head until stopped
+
+        ``refresh(entries, block=number)`` should read balances at ``block``.
+        """
+        stop_event = stop_event or self._stop
+
+        while not stop_event.is_set():
+            block = self.poll()
+            if block is not None and (self.block is None or block > self.block):
+                self.refresh_block(refresh, block, stop_event)
+                continue  # the head may have moved on while the batch ran
+            stop_event.wait(self.poll_interval)
+
+    @property
+    def join_timeout(self):
+        return self.poll_interval + 1
+
+
+class BitcoinBlockScheduler(ThreadedScheduler):
+    """Refresh of only the Bitcoin addresses touched by each new block
+
+    Every new block is downloaded once and each address it pays or spends
+    from is tested against an AddressIndex of the tracked addresses; only
+    matches are refreshed, so the cost scales with block size rather than
+    with the number of tracked addresses. Newly added addresses are refreshed
+    once on the next poll (all of them on the first). If the last scanned
+    block is not among the latest ``max_blocks`` (a long outage or a deep
+    reorg), every address is refreshed instead.
+    """
+
+    def __init__(self, backend, poll_interval=None, max_blocks=None, batch_size=100):
+        self.backend = backend  # needs get_tip() and get_block(hash)
+        self.poll_interval = poll_interval or Config.BTC_BLOCK_POLL_INTERVAL
+        self.max_blocks = max_blocks or Config.BTC_SCAN_MAX_BLOCKS
+        self.batch_size = batch_size
+        self.index = AddressIndex()
+        self.tip = None      # hash of the last scanned block
+        self.height = None
+        self._pending = []   # added since the last scan
+        super().__init__()
+
+    def __len__(self):
+        return len(self.index)
+
+    def add(self, chain, address):
+        """Track an address, returning False if it was already tracked"""
+        if not self.index.add(address):
+            return False
+        with self._lock:
+            self._pending.append(address)
+        return True
+
+    def load(self, entries):
+        """Track every (chain, address) from an iterable, returning how many were new"""
+        added = 0
+        batch = []
+        for _, address in entries:
+            batch.append(address)
+            if len(batch) >= 10000:
+                added += self._add_many(batch)
+                batch = []
+        return added + self._add_many(batch)
+
+    def _add_many(self, addresses):
+        new = self.index.add_many(addresses)
+        with self._lock:
+            self._pending.extend(new)
+        return len(new)
+
+    def entries(self):
+        """Every tracked (chain, address)"""
+        return [('bitcoin', address) for address in self.index]
+
+    def touched_since(self, tip):
+        """Tracked addresses touched by the blocks after the last scanned one, up to ``tip``
+
+        Returns None if the last scanned block is not within ``max_blocks`` or
+        is no longer on the chain leading to ``tip`` (a reorg below it).
+        """
+        if tip['height'] - self.height > self.max_blocks:
+            return None
+        touched = set()
+        block_hash, height = tip['hash'], tip['height']
+        # Walk back only to the last scanned height; the hash there must match
+        while height > self.height:
+            block = self.backend.get_block(block_hash)
+            touched |= block['addresses']
+            block_hash, height = block['prev'], height - 1
+        return self.index.match(touched) if block_hash == self.tip else None
+
+    def scan(self, refresh):
+        """Refresh the addresses touched since the last scan plus new ones; returns how many"""
+        tip = self.backend.get_tip()
+        with self._lock:
+            pending, self._pending = self._pending, []
+        try:
+            if self.tip is None or tip['hash'] == self.tip:
+                touched = []
+            else:
+                touched = self.touched_since(tip)
+                if touched is None:
+                    print(f"Last scanned block not within {self.max_blocks} blocks of "
+                          f"{tip['height']}, refreshing every address")
+                    touched = list(self.index)
+        except Exception:
+            with self._lock:
+                self._pending[:0] = pending
+            raise
+
+        addresses = list(dict.fromkeys(pending + touched))
+        failed = []
+        for start in range(0, len(addresses), self.batch_size):
+            batch = addresses[start:start + self.batch_size]
+            try:
+                results = refresh([('bitcoin', address) for address in batch], block=tip['height']) or {}
+            except Exception as e:
+                print(f"Error refreshing {len(batch)} addresses at block {tip['height']}: {e}")
+                results = {}
+            failed += [address for address in batch if address not in results]
+        with self._lock:
+            # Retried on the next poll rather than waiting for their next transaction
+            self._pending[:0] = failed
+        self.tip, self.height = tip['hash'], tip['height']
+        return len(addresses) - len(failed)
+
+    def run(self, refresh, stop_event=None):
+        """Scan each new block until stopped"""
+        stop_event = stop_event or self._stop
+
+        while not stop_event.is_set():
+            try:
+                self.scan(refresh)
+            except Exception as e:
+                print(f"Error scanning Bitcoin blocks: {e}")
+            stop_event.wait(self.poll_interval)
+
+    @property
+    def join_timeout(self):
+        return self.poll_interval + 1
+
+
+class ChainScheduler(BaseScheduler):
+    """Routes each address to the scheduler of its chain"""
+
+    def __init__(self, schedulers):
+        self.schedulers = schedulers  # chain -> scheduler
+
+    def _distinct(self):
+        return list({id(scheduler): scheduler for scheduler in self.schedulers.values()}.values())
+
+    def __len__(self):
+        return sum(len(scheduler) for scheduler in self._distinct())
+
+    def add(self, chain, address):
+        return self.schedulers[chain].add(chain, address)
+
+    def entries(self):
+        """Every tracked (chain, address)"""
+        return [entry for scheduler in self._distinct() for entry in scheduler.entries()]
+
+    def start(self, refresh):
+        return [scheduler.start(refresh) for scheduler in self._distinct()]
+
+    def stop(self):
+        for scheduler in self._distinct():
+            scheduler.stop()
+
+
+def build_refresh_scheduler(portfolios=None, block_source=None, bitcoin_backend=None):
+    """Create the configured refresh scheduler over the configured addresses and address files
+
+    With a PortfolioRegistry, every portfolio address is tracked too; an address
+    shared by several portfolios is still refreshed once per interval. With
+    ETH_REFRESH_MODE=block, Ethereum addresses are refreshed on each new block
+    reported by ``block_source`` (a callable returning the head block number).
+    With BTC_REFRESH_MODE=block, Bitcoin addresses are refreshed when a new
+    block from ``bitcoin_backend`` touches them, provided the backend reports
+    the addresses blocks spend from (Bitcoin Core 25+ or blockchain.info).
+    """
+    if Config.REFRESH_MODE == 'activity':
+        scheduler = ActivityScheduler()
+    else:
+        scheduler = ShardedScheduler()
+    schedulers = {'bitcoin': scheduler, 'ethereum': scheduler}
+    if Config.ETH_REFRESH_MODE == 'block' and block_source is not None:
+        schedulers['ethereum'] = BlockScheduler(block_source)
+    if Config.BTC_REFRESH_MODE == 'block' and bitcoin_backend is not None:
+        try:
+            prevouts = bitcoin_backend.has_prevouts()
+        except (OSError, RuntimeError, ValueError) as e:
+            print(f"Error checking {bitcoin_backend.name} for block refreshes: {e}")
+            prevouts = False
+        if prevouts:
+            schedulers['bitcoin'] = BitcoinBlockScheduler(bitcoin_backend)
+        else:
+            print(f"BTC_REFRESH_MODE=block needs blocks with input prevouts, which "
+                  f"{bitcoin_backend.name} does not provide; refreshing Bitcoin on the interval")
+    if any(chain_scheduler is not scheduler for chain_scheduler in schedulers.values()):
+        scheduler = ChainScheduler(schedulers)
+    scheduler.load(('bitcoin', address) for address in Config.BITCOIN_ADDRESSES)
+    scheduler.load(('ethereum', address) for address in Config.ETHEREUM_ADDRESSES)
+    if portfolios is not None:
+        scheduler.load(portfolios.entries())
+
+    if Config.HD_WALLETS:
+        # Addresses already discovered by earlier scans; new ones are added by the rescans
+        from hd_wallet import HDWalletScanner, load_wallets
+
+        scanner = HDWalletScanner(backend=None)
+        for wallet in load_wallets():
+            scheduler.load(('bitcoin', address) for address in scanner.known_addresses(wallet))
+
+    for path in Config.ADDRESS_FILES:
+        try:
+            added = scheduler.load_file(path)
+            print(f"Loaded {added} addresses from {path}")
+        except (OSError, ValueError) as e:
+            print(f"Error loading address file {path}: {e}")
+
+    return scheduler
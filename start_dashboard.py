@@ -6,11 +6,12 @@ Handles everything from installation to launching the dashboard
 
 import os
 import sys
-import subprocess
 import time
 import webbrowser
 from pathlib import Path
 
+from dependencies import StartupTimer, ensure_dependencies
+
 def print_banner():
     """Print startup banner"""
     print("=" * 60)
@@ -31,16 +32,18 @@ def check_python_version():
     return True
 
 def install_dependencies():
-    """Install required dependencies"""
-    print("\n📦 Installing dependencies...")
-    try:
-        subprocess.check_call([sys.executable, '-m', 'pip', 'install', '-r', 'requirements.txt'], 
-                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        print("✅ Dependencies installed successfully!")
-        return True
-    except subprocess.CalledProcessError:
+    """Install required dependencies, skipping pip when nothing changed"""
+    print("\n📦 Checking dependencies...")
+    ok, status, missing = ensure_dependencies(quiet=True)
+    
+    if not ok:
         print("❌ Failed to install dependencies")
         return False
+    if status == 'installed':
+        print(f"✅ Installed {len(missing)} missing or outdated packages")
+    else:
+        print("✅ Dependencies up to date")
+    return True
 
 def create_env_file():
     """Create .env file if it doesn't exist"""
@@ -88,8 +91,9 @@ def check_port_available(port=8050):
     except OSError:
         return False
 
-def start_dashboard():
+def start_dashboard(timer=None):
     """Start the crypto dashboard"""
+    timer = timer or StartupTimer()
     print("\n🎯 Starting Crypto Dashboard...")
     print("📊 Dashboard will be available at: http://localhost:8050")
     print("🔄 Auto-refresh every 30 seconds")
@@ -104,7 +108,8 @@ def start_dashboard():
     
     try:
         # Import and run the dashboard
-        from app_enhanced import app, server
+        with timer.phase("import dashboard"):
+            from app_enhanced import app, server, start_background_refresh
         
         # Open browser after a short delay
         def open_browser():
@@ -122,6 +127,8 @@ def start_dashboard():
         browser_thread.start()
         
         # Start the dashboard
+        start_background_refresh()
+        timer.report()
         app.run_server(debug=False, host='0.0.0.0', port=8050)
         
     except KeyboardInterrupt:
@@ -136,6 +143,7 @@ def start_dashboard():
 
 def main():
     """Main startup function"""
+    timer = StartupTimer()
     print_banner()
     
     # Check if we're in the right directory
@@ -149,15 +157,18 @@ def main():
         return
     
     # Install dependencies
-    if not install_dependencies():
+    with timer.phase("dependency check"):
+        deps_ok = install_dependencies()
+    if not deps_ok:
         print("❌ Failed to install dependencies")
         return
     
     # Create configuration file
-    env_ready = create_env_file()
+    with timer.phase("configuration"):
+        env_ready = create_env_file()
     
     # Start dashboard
-    if start_dashboard():
+    if start_dashboard(timer):
         print("✅ Dashboard started successfully!")
     else:
         print("❌ Failed to start dashboard")
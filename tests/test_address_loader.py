@@ -0,0 +1,21 @@
+"""Tests for the address file loaders"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from address_loader import iter_csv_addresses  # noqa: E402
+
+
+def test_csv_header_after_comments(tmp_path):
+    path = tmp_path / 'addresses.csv'
+    path.write_text("# exported addresses\n\nlabel,chain,address\ncold,btc,bc1qcold\nhot,eth,0xhot\n")
+    assert list(iter_csv_addresses(str(path))) == [('bitcoin', 'bc1qcold'), ('ethereum', '0xhot')]
+
+
+def test_csv_without_header(tmp_path):
+    path = tmp_path / 'addresses.csv'
+    path.write_text("# one address per line\nbc1qcold\n0xhot\naddress\n")
+    assert list(iter_csv_addresses(str(path))) == [
+        ('bitcoin', 'bc1qcold'), ('ethereum', '0xhot'), ('bitcoin', 'address')]
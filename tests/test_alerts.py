@@ -0,0 +1,98 @@
+"""Alert rule indexes, the in-process alert queue and one-shot rules"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alerts import AlertEngine, QueueSink, Rule, ThresholdIndex  # noqa: E402
+from price_feed import PriceTable  # noqa: E402
+
+
+class ListSink:
+    """Sink that only collects what it is sent"""
+
+    name = 'list'
+
+    def __init__(self):
+        self.alerts = []
+
+    def send(self, alerts):
+        self.alerts.extend(alerts)
+
+
+def price_rule(id, direction, threshold, **kwargs):
+    return Rule(id, 'price', direction, 'bitcoin', threshold, **kwargs)
+
+
+def table(price):
+    prices = PriceTable(['bitcoin'], ['usd'])
+    prices.update({'bitcoin': {'usd': price}})
+    return prices
+
+
+def test_threshold_index_crossings():
+    index = ThresholdIndex()
+    above = price_rule('a', 'above', 100)
+    below = price_rule('b', 'below', 90)
+    cross = price_rule('c', 'cross', 95)
+    for rule in (above, below, cross):
+        index.add(rule, rule.threshold)
+    assert len(index) == 4  # 'cross' sits on both sides
+
+    assert index.crossed(80, 100) == [cross, above]   # (previous, current] going up
+    assert index.crossed(100, 101) == []
+    assert index.crossed(100, 90) == [below, cross]   # [current, previous) going down
+    assert index.crossed(95, 95) == []
+
+    index.remove(cross, cross.threshold)
+    assert index.crossed(80, 100) == [above]
+    assert index.crossed(100, 90) == [below]
+
+
+def test_threshold_index_add_many_keeps_order():
+    index = ThresholdIndex()
+    rules = [price_rule(str(t), 'above', t) for t in (30, 10, 20)]
+    index.add_many([(rule, rule.threshold) for rule in rules])
+    assert [rule.threshold for rule in index.crossed(0, 25)] == [10, 20]
+
+
+def test_queue_since_filters_by_sequence_and_user():
+    queue = QueueSink(maxsize=3)
+    queue.send([{'user': 'alice', 'i': 1}, {'user': 'bob', 'i': 2}, {'user': None, 'i': 3}])
+    assert [alert['seq'] for alert in queue.since(user='alice')] == [1]
+    assert [alert['i'] for alert in queue.since(user=None)] == [3]
+
+    queue.send([{'user': 'alice', 'i': 4}])  # drops the oldest
+    assert [alert['seq'] for alert in queue.since(user='alice')] == [4]
+    assert queue.since(4, user='alice') == []
+    assert queue.since(user='alice') == queue.since(user='alice')  # reading does not consume
+
+
+def test_once_rules_fire_once():
+    queue = QueueSink()
+    engine = AlertEngine([ListSink(), queue])  # the queue need not be the first sink
+    assert engine.queue is queue
+    engine.add_rule(price_rule('once', 'above', 100, once=True))
+    engine.add_rule(price_rule('always', 'above', 100))
+
+    engine.on_prices(table(90.0))
+    fired = engine.on_prices(table(110.0))
+    assert sorted(alert['rule'] for alert in fired) == ['always', 'once']
+    assert 'once' not in engine.rules
+
+    engine.on_prices(table(90.0))
+    assert [alert['rule'] for alert in engine.on_prices(table(110.0))] == ['always']
+    assert len(queue.since()) == 3
+
+
+def test_alerts_endpoint_without_queue():
+    import app_enhanced
+
+    engine = app_enhanced.alert_engine
+    app_enhanced.alert_engine = AlertEngine([ListSink()])
+    try:
+        response = app_enhanced.server.test_client().get('/api/alerts?user=alice')
+    finally:
+        app_enhanced.alert_engine = engine
+    assert response.status_code == 404
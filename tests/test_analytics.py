@@ -0,0 +1,27 @@
+"""Tests for the streaming market analytics"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import AssetAnalytics  # noqa: E402
+
+
+def test_drawdown_is_measured_over_the_rolling_window():
+    analytics = AssetAnalytics(window=3)
+    for ts, price in enumerate([100, 50, 60, 70, 80, 72]):
+        analytics.update(price, ts)
+
+    # The 100 -> 50 crash has left the window of the last four prices
+    snapshot = analytics.snapshot()
+    assert snapshot['max_drawdown_pct'] == pytest.approx(10.0)
+    assert snapshot['drawdown_pct'] == pytest.approx(10.0)
+
+
+def test_drawdown_waits_for_the_first_tick():
+    snapshot = AssetAnalytics().snapshot()
+    assert snapshot['drawdown_pct'] is None
+    assert snapshot['max_drawdown_pct'] is None
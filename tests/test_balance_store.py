@@ -0,0 +1,54 @@
+"""BalanceStore writes racing with array growth"""
+
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from balance_store import BalanceStore  # noqa: E402
+
+
+def test_concurrent_writes_survive_growth():
+    store = BalanceStore('bitcoin', decimals=8, capacity=2)
+
+    def set_each(worker):
+        for i in range(2000):
+            store.set(f"single-{worker}-{i}", i)
+
+    def set_batches(worker):
+        for batch in range(20):
+            store.set_many([f"batch-{worker}-{batch}-{i}" for i in range(100)], range(100))
+
+    threads = ([threading.Thread(target=set_each, args=(w,)) for w in range(4)] +
+               [threading.Thread(target=set_batches, args=(w,)) for w in range(4)])
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(store) == 16000
+    assert store.total() == 4 * sum(range(2000)) + 4 * 20 * sum(range(100))
+
+
+
+
+class RacingStore(BalanceStore):
+    """Adds a row from another thread whenever balances are read"""
+
+    def amounts(self, rows=None):
+        writer = threading.Thread(target=self.set, args=(f"late-{len(self._addresses)}", 1))
+        writer.start()
+        writer.join(timeout=0.2)  # blocked until the reader is done if the read holds the lock
+        return super().amounts(rows)
+
+
+def test_address_table_builds_while_rows_are_added():
+    from address_table import AddressTableSource
+
+    store = RacingStore('bitcoin', decimals=8)
+    store.set_many([f"addr-{i}" for i in range(10)], range(10))
+    source = AddressTableSource({'bitcoin': store})
+    frame = source.frame({'bitcoin': 50000.0})
+    assert len(frame) == 10
+    assert list(frame['address']) == [f"addr-{i}" for i in range(10)]
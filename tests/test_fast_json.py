@@ -0,0 +1,31 @@
+"""fast_json output against the stock plotly encoder"""
+
+import datetime
+import os
+import sys
+
+import pandas as pd
+import plotly.io.json as plotly_json
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fast_json  # noqa: E402
+
+pytestmark = pytest.mark.skipif(fast_json.orjson is None, reason="orjson not installed")
+
+
+def test_datetimes_match_stock_output():
+    utc = pd.Timestamp('2024-01-01 10:00', tz='UTC')
+    value = {
+        'timestamp': utc,
+        'naive': pd.Timestamp('2024-01-01 10:00'),
+        'datetime': datetime.datetime(2024, 1, 1, 10, tzinfo=datetime.timezone.utc),
+        'date': datetime.date(2024, 1, 1),
+        'index': pd.date_range('2024-01-01', periods=2, freq='h', tz='Europe/Berlin'),
+        'naive_index': pd.date_range('2024-01-01', periods=2, freq='h'),
+        'series': pd.Series([utc, pd.NaT]),
+    }
+    expected = plotly_json.to_json_plotly(value, engine='json')
+    assert fast_json.dumps(value) == expected
+    assert '"timestamp":"2024-01-01T10:00:00+00:00"' in expected
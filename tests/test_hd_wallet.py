@@ -0,0 +1,57 @@
+"""HD wallet derivation (BIP44 / BIP49 / BIP84 vectors) and gap-limit scanning"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hd_wallet import CHANGE, RECEIVE, HDWallet, HDWalletScanner  # noqa: E402
+
+# Account keys of the "abandon abandon ... about" test mnemonic
+BIP84_ZPUB = ('zpub6rFR7y4Q2AijBEqTUquhVz398htDFrtymD9xYYfG1m4wAcvPhXNfE3EfH1r1ADqtfSdVCToUG868'
+              'RvUUkgDKf31mGDtKsAYz2oz2AGutZYs')
+BIP44_XPUB = ('xpub6BosfCnifzxcFwrSzQiqu2DBVTshkCXacvNsWGYJVVhhawA7d4R5WSWGFNbi8Aw6ZRc1brxMyWMz'
+              'G3DSSSSoekkudhUd9yLb6qx39T9nMdj')
+BIP49_YPUB = ('ypub6Ww3ibxVfGzLrAH1PNcjyAWenMTbbAosGNB6VvmSEgytSER9azLDWCxoJwW7Ke7icmizBMXrzBx9'
+              '979FfaHxHcrArf3zbeJJJUZPf663zsP')
+
+
+def test_bip84_vectors():
+    wallet = HDWallet(BIP84_ZPUB)
+    assert wallet.address(RECEIVE, 0) == 'bc1qcr8te4kr609gcawutmrza0j4xv80jy8z306fyu'
+    assert wallet.address(RECEIVE, 1) == 'bc1qnjg0jd8228aq7egyzacy8cys3knf9xvrerkf9g'
+    assert wallet.address(CHANGE, 0) == 'bc1q8c6fshw2dlwun7ekn9qwf37cu2rn755upcp6el'
+
+
+def test_bip44_vector():
+    assert HDWallet(BIP44_XPUB).address(RECEIVE, 0) == '1LqBGSKuX5yYUonjxT5qGfpUsXKYYWeabA'
+
+
+def test_bip49_vector():
+    assert HDWallet(BIP49_YPUB).address(RECEIVE, 0) == '37VucYSaXLCAsxYyAPfbSi9eh4iEcbShgf'
+
+
+class ScanModeBackend:
+    """Bitcoin Core scantxoutset-style summaries: balances only, no history fields"""
+
+    mode = 'scan'
+    batch_size = 50
+
+    def __init__(self, funded):
+        self.funded = set(funded)
+
+    def get_addresses(self, addresses):
+        return {address: {'address': address, 'final_balance': 1000 if address in self.funded else 0,
+                          'total_received': None, 'total_sent': None, 'n_tx': None}
+                for address in addresses}
+
+
+def test_scan_mode_finds_funded_addresses(tmp_path):
+    wallet = HDWallet(BIP84_ZPUB)
+    funded = [wallet.address(RECEIVE, 0), wallet.address(RECEIVE, 15)]
+    scanner = HDWalletScanner(ScanModeBackend(funded), gap_limit=20, workers=4,
+                              state_path=str(tmp_path / 'hd.json'))
+    assert scanner.workers == 1
+    addresses = scanner.scan(wallet)
+    assert scanner.state[wallet.id][str(RECEIVE)]['used'] == 15
+    assert addresses == wallet.addresses(RECEIVE, 0, 16)
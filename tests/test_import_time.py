@@ -0,0 +1,20 @@
+"""Dashboard import-time budget, measured in a fresh interpreter"""
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.run_benchmarks import IMPORT_BUDGET_S  # noqa: E402
+
+
+def test_app_enhanced_import_within_budget():
+    code = "import time; t = time.perf_counter(); import app_enhanced; print(time.perf_counter() - t)"
+    timings = []
+    for _ in range(3):  # best of three, as in the benchmark suite
+        output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True,
+                                text=True, check=True)
+        timings.append(float(output.stdout.strip().splitlines()[-1]))
+    assert min(timings) <= IMPORT_BUDGET_S, f"import took {min(timings):.2f}s (budget {IMPORT_BUDGET_S}s)"
@@ -0,0 +1,156 @@
+"""Bitcoin Core backend against a mocked JSON-RPC endpoint"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from node_backends import BitcoinCoreBackend  # noqa: E402
+
+
+def make_backend(version=250000):
+    backend = BitcoinCoreBackend(url='http://127.0.0.1:8332', mode='scan')
+    calls = []
+
+    def call(method, *params):
+        calls.append((method, params))
+        if method == 'getnetworkinfo':
+            return {'version': version}
+        if method == 'getblock':
+            return {'hash': params[0], 'height': 1, 'previousblockhash': '00', 'tx': [{
+                'vin': [{'prevout': {'scriptPubKey': {'address': 'bc1qspent'}}}],
+                'vout': [{'scriptPubKey': {'address': 'bc1qpaid'}}]}]}
+        raise AssertionError(method)
+
+    backend.call = call
+    return backend, calls
+
+
+def test_get_block_reports_spent_and_paid_addresses():
+    backend, calls = make_backend()
+    assert backend.get_block('ab')['addresses'] == {'bc1qspent', 'bc1qpaid'}
+    assert ('getblock', ('ab', 3)) in calls
+
+
+def test_get_block_refuses_nodes_without_prevouts():
+    backend, calls = make_backend(version=240000)
+    assert not backend.has_prevouts()
+    with pytest.raises(RuntimeError):
+        backend.get_block('ab')
+    assert [method for method, _ in calls] == ['getnetworkinfo']
+
+
+class RPCHandler(BaseHTTPRequestHandler):
+    """Bitcoin Core stand-in: validateaddress and scantxoutset, recording each POST"""
+
+    requests = []
+    funded = {'bc1qfunded': 0.5}
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.requests.append(body)
+        replies = [self.rpc(item) for item in body] if isinstance(body, list) else self.rpc(body)
+        data = json.dumps(replies).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def rpc(self, request):
+        method, params = request['method'], request['params']
+        if method == 'validateaddress':
+            result = {'isvalid': params[0].startswith('bc1q')}
+            if result['isvalid']:
+                result['scriptPubKey'] = f"script-{params[0]}"
+        elif method == 'scantxoutset':
+            result = {'unspents': [
+                {'scriptPubKey': f"script-{address}", 'amount': amount}
+                for address, amount in self.funded.items() if f"addr({address})" in params[1]]}
+        else:
+            return {'id': request['id'], 'result': None, 'error': {'message': f"unknown {method}"}}
+        return {'id': request['id'], 'result': result, 'error': None}
+
+
+@pytest.fixture
+def rpc_server():
+    RPCHandler.requests = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RPCHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_scan_validates_addresses_in_one_batch(rpc_server):
+    backend = BitcoinCoreBackend(url=rpc_server, user='', wallet='', mode='scan')
+    addresses = ['bc1qfunded', 'bc1qempty', 'not-an-address']
+    summaries = backend.get_addresses(addresses)
+
+    validate, scan = RPCHandler.requests
+    assert [item['method'] for item in validate] == ['validateaddress'] * 3
+    assert scan['method'] == 'scantxoutset'
+    assert summaries['bc1qfunded']['final_balance'] == 50000000
+    assert summaries['bc1qempty']['final_balance'] == 0
+    assert 'not-an-address' not in summaries
+
+
+def test_concurrent_single_lookups_share_one_scan(rpc_server):
+    backend = BitcoinCoreBackend(url=rpc_server, user='', wallet='', mode='scan')
+    addresses = ['bc1qfunded', 'bc1qempty', 'bc1qother']
+    results = {}
+
+    def lookup(address):
+        results[address] = backend.get_address(address)
+
+    # Hold the scan lock as a running scan would until every lookup is queued
+    with backend._scan_lock:
+        threads = [threading.Thread(target=lookup, args=(address,)) for address in addresses]
+        for thread in threads:
+            thread.start()
+        while len(backend._pending) < len(addresses):
+            time.sleep(0.01)
+    for thread in threads:
+        thread.join(timeout=5)
+
+    scans = [body for body in RPCHandler.requests
+             if isinstance(body, dict) and body['method'] == 'scantxoutset']
+    assert len(scans) == 1
+    assert results['bc1qfunded']['final_balance'] == 50000000
+    assert results['bc1qother']['final_balance'] == 0
+
+
+class UnauthorizedHandler(BaseHTTPRequestHandler):
+    """Bitcoin Core answering bad credentials: 401 with an empty body"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(401)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+def test_call_reports_rejected_credentials():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), UnauthorizedHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        backend = BitcoinCoreBackend(url=f"http://127.0.0.1:{server.server_address[1]}",
+                                     user='wrong', password='wrong', wallet='', mode='scan')
+        with pytest.raises(RuntimeError, match='HTTP 401.*BITCOIN_RPC_USER'):
+            backend.call('getblockchaininfo')
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,53 @@
+"""Tests for the block-driven Bitcoin refresh scheduler"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import BitcoinBlockScheduler  # noqa: E402
+
+
+class ChainBackend:
+    """Blocks b0..bN, each paying one address, recording every get_block"""
+
+    def __init__(self, hashes):
+        self.blocks = {h: {'hash': h, 'prev': hashes[i - 1] if i else None, 'height': i,
+                           'addresses': {f"addr-{h}"}} for i, h in enumerate(hashes)}
+        self.hashes = hashes
+        self.fetched = []
+
+    def get_tip(self):
+        return {'hash': self.hashes[-1], 'height': len(self.hashes) - 1}
+
+    def get_block(self, block_hash):
+        self.fetched.append(block_hash)
+        return self.blocks[block_hash]
+
+
+def make_scheduler(backend, tip, height, max_blocks=10):
+    scheduler = BitcoinBlockScheduler(backend, poll_interval=1, max_blocks=max_blocks)
+    scheduler._add_many([f"addr-{h}" for h in backend.hashes])
+    scheduler.tip, scheduler.height = tip, height
+    return scheduler
+
+
+def test_touched_since_walks_back_to_the_last_scanned_block():
+    backend = ChainBackend(['b0', 'b1', 'b2', 'b3', 'b4'])
+    scheduler = make_scheduler(backend, 'b2', 2)
+    assert sorted(scheduler.touched_since(backend.get_tip())) == ['addr-b3', 'addr-b4']
+    assert backend.fetched == ['b4', 'b3']
+
+
+def test_touched_since_stops_at_the_scanned_height_after_a_reorg():
+    backend = ChainBackend(['b0', 'b1', 'c2', 'c3', 'c4', 'c5'])
+    scheduler = make_scheduler(backend, 'b2', 2)
+    assert scheduler.touched_since(backend.get_tip()) is None
+    assert backend.fetched == ['c5', 'c4', 'c3']
+
+
+def test_touched_since_gives_up_without_fetching_beyond_max_blocks():
+    backend = ChainBackend([f"b{i}" for i in range(20)])
+    scheduler = make_scheduler(backend, 'b2', 2, max_blocks=5)
+    assert scheduler.touched_since(backend.get_tip()) is None
+    assert backend.fetched == []
@@ -0,0 +1,30 @@
+"""ValuationEngine fed from a BalanceStore's changed rows"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from balance_store import BalanceStore  # noqa: E402
+from valuation import ValuationEngine  # noqa: E402
+
+
+def test_load_store_copies_only_changed_rows():
+    store = BalanceStore('bitcoin', decimals=8)
+    engine = ValuationEngine(['bitcoin', 'ethereum'], ['usd'])
+    engine.set_prices({'bitcoin': {'usd': 100.0}})
+    store.set_many([f"a{i}" for i in range(1, 101)], [i * 10 ** 6 for i in range(1, 101)])
+
+    engine.load_store(store)
+    assert engine.revalue() == 100
+
+    store.set('a5', 7)
+    store.set('a6', 6 * 10 ** 6)  # unchanged
+    engine.load_store(store)
+    assert engine.revalue() == 1
+    assert engine.summary()['total_value'] == pytest.approx(store.amounts().sum() * 100)
+
+    engine.load_store(store)
+    assert engine.revalue() == 0
@@ -0,0 +1,187 @@
+"""
+Intraday tick ring buffer
+Fixed-size, memory-mapped ring of timestamped price ticks per asset. Survives
+restarts and can be read by any number of processes without copying.
+"""
+
+import os
+import time
+
+import numpy as np
+
+from config import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are not serialized across processes
+    fcntl = None
+
+MAGIC = 0x4B43495450595243  # "CRYPTICK"
+HEADER_FIELDS = 8            # magic, capacity, count, reserved...
+HEADER_BYTES = HEADER_FIELDS * 8
+
+TICK_DTYPE = np.dtype([
+    ('ts', np.float64),      # unix timestamp
+    ('price', np.float64),
+    ('volume', np.float64)   # 24h volume reported with the tick (NaN if unknown)
+])
+
+
+class TickRingBuffer:
+    """Ring of ticks in one memory-mapped file
+
+    Slot ``count % capacity`` is written, then ``count`` is bumped in the
+    header, so appends are O(1) and readers always see whole ticks. Only one
+    process should append at a time (appends take an flock where available).
+    """
+
+    def __init__(self, path, capacity=None, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        capacity = capacity or Config.TICK_CAPACITY
+
+        if not os.path.exists(path):
+            if readonly:
+                raise FileNotFoundError(path)
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with open(path, 'wb') as f:
+                header = np.zeros(HEADER_FIELDS, dtype=np.int64)
+                header[0], header[1] = MAGIC, capacity
+                f.write(header.tobytes())
+                f.truncate(HEADER_BYTES + capacity * TICK_DTYPE.itemsize)
+
+        self._mm = np.memmap(path, dtype=np.uint8, mode='r' if readonly else 'r+')
+        self._header = self._mm[:HEADER_BYTES].view(np.int64)
+        if self._header[0] != MAGIC:
+            raise ValueError(f"{path} is not a tick buffer")
+        self.capacity = int(self._header[1])
+        self._ticks = self._mm[HEADER_BYTES:HEADER_BYTES + self.capacity * TICK_DTYPE.itemsize].view(TICK_DTYPE)
+
+    @property
+    def count(self):
+        """Total ticks ever appended"""
+        return int(self._header[2])
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, price, volume=np.nan, ts=None, min_spacing=0):
+        """Append a tick, skipping it if the last one is newer than ``min_spacing`` seconds"""
+        if self.readonly:
+            raise PermissionError("tick buffer opened read-only")
+        ts = time.time() if ts is None else ts
+
+        with open(self.path, 'rb') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            count = self.count
+            if count and ts - self._ticks[(count - 1) % self.capacity]['ts'] < min_spacing:
+                return False
+            self._ticks[count % self.capacity] = (ts, price, volume)
+            self._header[2] = count + 1
+        return True
+
+    def flush(self):
+        """Write dirty pages back to disk"""
+        self._mm.flush()
+
+    def segments(self):
+        """Oldest-first views (no copies) covering the buffered ticks"""
+        count = self.count
+        if count <= self.capacity:
+            return [self._ticks[:count]]
+        head = count % self.capacity
+        return [self._ticks[head:], self._ticks[:head]]
+
+    def window(self, start=None, end=None):
+        """Ticks with start <= ts < end, oldest first
+
+        A view when the window does not wrap around the end of the ring,
+        otherwise one concatenated copy.
+        """
+        parts = []
+        for segment in self.segments():
+            ts = segment['ts']
+            lo = 0 if start is None else np.searchsorted(ts, start, side='left')
+            hi = len(ts) if end is None else np.searchsorted(ts, end, side='left')
+            if hi > lo:
+                parts.append(segment[lo:hi])
+        if not parts:
+            return self._ticks[:0]
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def last(self, seconds, now=None):
+        """Ticks from the last ``seconds`` seconds"""
+        now = time.time() if now is None else now
+        return self.window(start=now - seconds)
+
+    def latest(self):
+        """Most recent tick, or None"""
+        count = self.count
+        return self._ticks[(count - 1) % self.capacity].copy() if count else None
+
+    def stats(self, seconds=86400, now=None):
+        """Change, range and volume over the last ``seconds`` seconds from local ticks"""
+        ticks = self.last(seconds, now)
+        if len(ticks) == 0:
+            return None
+        prices = ticks['price']
+        first, last = float(prices[0]), float(prices[-1])
+        volumes = ticks['volume'][~np.isnan(ticks['volume'])]
+        return {
+            'ticks': len(ticks),
+            'first': first,
+            'last': last,
+            'change_pct': (last - first) / first * 100 if first else None,
+            'high': float(prices.max()),
+            'low': float(prices.min()),
+            'volume': float(volumes[-1]) if len(volumes) else None,
+            'since': float(ticks['ts'][0])
+        }
+
+
+class TickStore:
+    """One tick ring buffer per asset under a directory"""
+
+    def __init__(self, directory=None, capacity=None, readonly=False, min_spacing=None):
+        self.directory = directory or Config.TICK_DIR
+        self.capacity = capacity or Config.TICK_CAPACITY
+        self.readonly = readonly
+        self.min_spacing = Config.TICK_MIN_SPACING if min_spacing is None else min_spacing
+        self.buffers = {}
+
+    def buffer(self, asset):
+        """Ring buffer for an asset (None if read-only and not recorded yet)"""
+        if asset not in self.buffers:
+            path = os.path.join(self.directory, f"{asset}.ticks")
+            try:
+                self.buffers[asset] = TickRingBuffer(path, self.capacity, self.readonly)
+            except FileNotFoundError:
+                return None
+        return self.buffers[asset]
+
+    def record(self, crypto_data, ts=None):
+        """Append one tick per asset from a get_crypto_data() snapshot"""
+        if not crypto_data:
+            return
+        ts = time.time() if ts is None else ts
+        for asset, quote in crypto_data.items():
+            if quote.get('price') is None:
+                continue
+            volume = quote.get('volume_24h')
+            self.buffer(asset).append(
+                quote['price'],
+                np.nan if volume is None else volume,
+                ts=ts,
+                min_spacing=self.min_spacing
+            )
+
+    def last(self, asset, seconds=86400):
+        """Recent ticks for an asset (empty if none)"""
+        buffer = self.buffer(asset)
+        return buffer.last(seconds) if buffer else np.empty(0, dtype=TICK_DTYPE)
+
+    def stats(self, asset, seconds=86400):
+        """Local window stats for an asset, or None"""
+        buffer = self.buffer(asset)
+        return buffer.stats(seconds) if buffer else None
@@ -0,0 +1,183 @@
+"""
+Portfolio valuation engine
+Values an (address x asset) holdings matrix against an (asset x currency)
+price matrix with NumPy, revaluing only the rows whose holdings changed
+"""
+
+import threading
+
+import numpy as np
+
+
+class ValuationEngine:
+    """Per-address, per-asset and total portfolio values in every currency
+
+    ``holdings @ prices`` gives every address's value in every currency in one
+    matrix product. Between price changes only rows whose holdings changed are
+    recomputed, and per-asset totals are maintained incrementally.
+    """
+
+    def __init__(self, assets, currencies, capacity=1024):
+        self.assets = list(assets)
+        self.currencies = [c.lower() for c in currencies]
+        self.asset_index = {asset: i for i, asset in enumerate(self.assets)}
+        self.currency_index = {currency: i for i, currency in enumerate(self.currencies)}
+        self.address_index = {}
+        self.addresses = []
+
+        n_assets, n_currencies = len(self.assets), len(self.currencies)
+        self.holdings = np.zeros((capacity, n_assets))
+        self.prices = np.zeros((n_assets, n_currencies))
+        self.address_values = np.zeros((capacity, n_currencies))
+        self.asset_totals = np.zeros(n_assets)
+
+        self._dirty = set()
+        self._prices_changed = False
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def _grow(self, needed):
+        """Grow the holdings / value matrices geometrically"""
+        capacity = len(self.holdings)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        holdings = np.zeros((capacity, len(self.assets)))
+        holdings[:len(self.holdings)] = self.holdings
+        values = np.zeros((capacity, len(self.currencies)))
+        values[:len(self.address_values)] = self.address_values
+        self.holdings, self.address_values = holdings, values
+
+    def row_for(self, address):
+        """Row of an address, adding it if new"""
+        row = self.address_index.get(address)
+        if row is None:
+            row = len(self.addresses)
+            self._grow(row + 1)
+            self.address_index[address] = row
+            self.addresses.append(address)
+        return row
+
+    def set_holding(self, address, asset, amount):
+        """Set one address's holding of an asset (in whole coins)"""
+        with self._lock:
+            row = self.row_for(address)
+            col = self.asset_index[asset]
+            delta = amount - self.holdings[row, col]
+            if delta:
+                self.holdings[row, col] = amount
+                self.asset_totals[col] += delta
+                self._dirty.add(row)
+
+    def set_holdings(self, asset, addresses, amounts):
+        """Set one asset's holdings for many distinct addresses at once"""
+        with self._lock:
+            rows = np.fromiter((self.row_for(a) for a in addresses), dtype=np.int64)
+            col = self.asset_index[asset]
+            amounts = np.asarray(amounts, dtype=np.float64)
+            delta = amounts - self.holdings[rows, col]
+            changed = delta != 0
+            if changed.any():
+                self.holdings[rows, col] = amounts
+                self.asset_totals[col] += delta[changed].sum()
+                self._dirty.update(rows[changed].tolist())
+
+    def load_store(self, store):
+        """Copy the balances a BalanceStore changed since the last load into the holdings matrix
+
+        The store's changed rows are consumed, so one engine should load a store.
+        """
+        addresses, amounts = store.take_dirty()
+        if addresses:
+            self.set_holdings(store.asset, addresses, amounts)
+
+    def set_price(self, asset, currency, price):
+        """Set the price of one asset in one currency"""
+        with self._lock:
+            i, j = self.asset_index[asset], self.currency_index[currency.lower()]
+            if self.prices[i, j] != price:
+                self.prices[i, j] = price
+                self._prices_changed = True
+
+    def set_prices(self, prices):
+        """Set prices from {asset: {currency: price}}
+
+        Also accepts the tracker's {asset: {'price': price, ...}} shape, with
+        the price in USD.
+        """
+        for asset, quote in (prices or {}).items():
+            if asset not in self.asset_index:
+                continue
+            if quote.get('price') is not None and 'usd' in self.currency_index:
+                self.set_price(asset, 'usd', quote['price'])
+            for currency, price in quote.items():
+                if currency in self.currency_index and price is not None:
+                    self.set_price(asset, currency, price)
+
+    def revalue(self):
+        """Bring per-address values up to date, returning how many rows were recomputed"""
+        with self._lock:
+            n = len(self)
+            if self._prices_changed:
+                self.address_values[:n] = self.holdings[:n] @ self.prices
+                # Full pass anyway, so also drop any float drift in the totals
+                self.asset_totals = self.holdings[:n].sum(axis=0)
+                recomputed = n
+            elif self._dirty:
+                rows = np.fromiter(self._dirty, dtype=np.int64)
+                self.address_values[rows] = self.holdings[rows] @ self.prices
+                recomputed = len(rows)
+            else:
+                recomputed = 0
+            self._dirty.clear()
+            self._prices_changed = False
+            return recomputed
+
+    def asset_values(self):
+        """(asset x currency) matrix of total value held per asset"""
+        with self._lock:
+            return self.asset_totals[:, None] * self.prices
+
+    def total_values(self):
+        """{currency: total portfolio value}"""
+        totals = self.asset_values().sum(axis=0)
+        return dict(zip(self.currencies, totals.tolist()))
+
+    def value_of(self, address):
+        """{currency: value} for one address"""
+        self.revalue()
+        row = self.address_index.get(address)
+        if row is None:
+            return None
+        return dict(zip(self.currencies, self.address_values[row].tolist()))
+
+    def per_address(self, currency='usd'):
+        """Value of every address in one currency (row order)"""
+        self.revalue()
+        return self.address_values[:len(self), self.currency_index[currency.lower()]]
+
+    def summary(self, currency=None, addresses=None):
+        """Portfolio breakdown in the tracker's calculate_portfolio_value shape
+
+        Values are in ``currency`` (default: the first currency); with
+        ``addresses`` only those rows are included.
+        """
+        self.revalue()
+        col = self.currency_index[(currency or self.currencies[0]).lower()]
+        if addresses is None:
+            totals = self.asset_totals
+        else:
+            rows = [self.address_index[a] for a in addresses if a in self.address_index]
+            totals = self.holdings[rows].sum(axis=0)
+        values = totals * self.prices[:, col]
+        breakdown = {
+            asset: {'balance': float(totals[i]), 'value': float(values[i])}
+            for i, asset in enumerate(self.assets)
+        }
+        return {
+            'total_value': float(values.sum()),
+            'breakdown': breakdown
+        }